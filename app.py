@@ -1,11 +1,37 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import altair as alt
 from textwrap import wrap
-import os
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+import logging
 import re # Imported for cleaning filenames
+import uuid
+from openenow.data import COMPARISON_CSV, DORADO_CSV, file_signatures, load_comparison_frame, start_preload
+from openenow.export import EXPORT_CACHE_MB, EXPORT_FORMATS, available_formats, export_bytes, export_file_name
+from openenow.charts import (
+    GEO_COMPARISON_LAYOUTS, chart_spec, comparison_chart, comparison_long_form, county_map_chart, error_analysis_chart,
+    estimate_chart, geo_comparison_chart, get_sector_colors
+)
+from openenow.comparison_table import COMPARISON_SOURCES, ComparisonTable, load_comparison_table_frame
+from openenow.cube import TOP_CONTRIBUTORS
+from openenow.geo import load_county_geometry
+from openenow.images import derivative_bytes, logo_derivative, map_path, missing_maps, state_map_derivatives, state_map_html
+from openenow.memory import cache_entry_bytes, object_bytes
+from openenow.precompute import comparison_view, error_analysis_view, estimate_view, open_view_store, view_group
+from openenow.profiling import NULL_PROFILE, RerunProfile, profiling_requested
+from openenow.queries import (
+    MAX_COMPARED_GEOS, MAX_COMPARED_SECTORS, comparison_extract, default_comparison_years, default_estimate_years,
+    estimate_extract, geo_comparison_extract, geography_label, query_comparison, query_county_map, query_error_analysis, query_estimates, query_geo_comparison,
+    shows_top_contributors
+)
+from openenow.refresh import EstimateStore
+from openenow.result_cache import ResultCache, normalize_key
+from openenow.sectors import SECTOR_DESCRIPTIONS
+from openenow.shared import load_shared_frame
+
+# Load statistics from the openenow package are reported on the console.
+package_logger = logging.getLogger("openenow")
+if not package_logger.handlers:
+    package_logger.addHandler(logging.StreamHandler())
+    package_logger.setLevel(logging.INFO)
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -13,85 +39,164 @@ st.set_page_config(
     layout="wide"
 )
 
+# --- Opt-in profiling: set OPENENOW_PROFILE=1 or open the page with ?profile=1 ---
+profile = RerunProfile() if profiling_requested(st.query_params) else NULL_PROFILE
+
 # --- Data Loading and Caching ---
-@st.cache_data
+# Each dataset is loaded the first time a mode needs it and then shared by every
+# session in the process; the returned frames must not be modified. With
+# OPENENOW_SHARED_DIR set, the frames are also shared with the other server
+# processes on the host through memory-mapped files (see openenow.shared).
+@st.cache_resource
 def load_comparison_data():
     """
-    Loads, cleans, and prepares the comparison dataset from enow_version_comparisons.csv.
-    This data is used for the "Compare to original ENOW" mode.
+    Loads, cleans, and prepares the comparison dataset from enow_version_comparisons.csv,
+    with the DORADO values from DORADO_combined_sectors.csv joined onto its state-level
+    sector rows once here rather than on each rerun.
+    This data is used for the "Compare to original ENOW" and "Error Analysis" modes.
     """
     try:
-        df = pd.read_csv("enow_version_comparisons.csv")
-
-        # RENAME COLUMNS FOR CONSISTENCY
-        rename_dict = {
-            "Open_establishments": "Open_Establishments",
-            "Open_employment": "Open_Employment",
-            "Open_wages": "Open_Wages",
-            "Open_GDP": "Open_GDP",
-            "Open_RealGDP": "Open_RealGDP",
-            "oldENOW_establishments": "oldENOW_Establishments",
-            "oldENOW_employment": "oldENOW_Employment",
-            "oldENOW_wages": "oldENOW_Wages",
-            "oldENOW_GDP": "oldENOW_GDP",
-            "oldENOW_RealGDP": "oldENOW_RealGDP",
-            "noimpute_establishments": "noimpute_Establishments",
-            "noimpute_employment": "noimpute_Employment",
-            "noimpute_wages": "noimpute_Wages",
-            "noimpute_GDP": "noimpute_GDP",
-            "noimpute_RealGDP": "noimpute_RealGDP"
-        }
-        df.rename(columns=rename_dict, inplace=True)
-
-        # CONVERT METRIC COLUMNS TO NUMERIC
-        metric_cols_to_convert = [
-            'Open_Establishments', 'Open_Employment', 'Open_Wages', 'Open_GDP', 'Open_RealGDP',
-            'oldENOW_Establishments', 'oldENOW_Employment', 'oldENOW_Wages', 'oldENOW_GDP', 'oldENOW_RealGDP',
-            'noimpute_Establishments', 'noimpute_Employment', 'noimpute_Wages', 'noimpute_GDP', 'noimpute_RealGDP'
-        ]
-        for col in metric_cols_to_convert:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        return df
+        return load_shared_frame("comparison", load_comparison_frame, depends_on=(COMPARISON_CSV, DORADO_CSV))
     except FileNotFoundError:
         return None
 
-@st.cache_data
-def load_open_enow_data():
+@st.cache_resource
+def load_comparison_table():
     """
-    Loads, cleans, and prepares the new Open ENOW dataset from openENOWinput.csv.
-    This data is used for the "State Estimates", "County Estimates", and "Regional Estimates" modes.
+    Loads the precomputed yearly totals and error terms behind "Compare to original ENOW"
+    (see openenow.comparison_table), building and storing them first if
+    enow_version_comparisons.csv has changed. Shared by all sessions.
     """
     try:
-        df = pd.read_csv("openENOWinput.csv")
-        rename_dict = {
-            "geoType": "GeoScale", "geoName": "GeoName", "state": "StateAbbrv",
-            "year": "Year", "enowSector": "OceanSector", "establishments": "Open_Establishments",
-            "employment": "Open_Employment", "wages": "Open_Wages", "real_wages": "Open_RealWages",
-            "gdp": "Open_GDP", "rgdp": "Open_RealGDP"
-        }
-        df.rename(columns=rename_dict, inplace=True)
-        # Keep original geoType for county filtering if it exists
-        df_original = pd.read_csv("openENOWinput.csv")
-        if 'geoType' in df_original.columns:
-            df['geoType'] = df_original['geoType']
-        if 'stateName' in df_original.columns:
-            df['stateName'] = df_original['stateName']
-
-        metric_cols_to_convert = [
-            'Open_Establishments', 'Open_Employment', 'Open_Wages', 'Open_RealWages', 'Open_GDP', 'Open_RealGDP'
-        ]
-        for col in metric_cols_to_convert:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        return df
+        return ComparisonTable(load_shared_frame(
+            "comparison_table", load_comparison_table_frame, depends_on=(COMPARISON_CSV, DORADO_CSV)
+        ))
     except FileNotFoundError:
         return None
 
-# Load both potential data sources
-comparison_data = load_comparison_data()
-open_enow_data = load_open_enow_data()
+@st.cache_resource
+def get_result_cache():
+    """
+    Query results shared by all sessions, keyed on the normalized selection.
+    Sized and expired through OPENENOW_RESULT_CACHE_MB and OPENENOW_RESULT_CACHE_TTL.
+    """
+    return ResultCache()
+
+result_cache = get_result_cache()
+
+@st.cache_resource
+def get_export_cache():
+    """
+    Download files shared by all sessions, keyed on the selection and format.
+    Bounded by OPENENOW_EXPORT_CACHE_MB; larger files are written per click (see openenow.export).
+    """
+    return ResultCache(max_bytes=EXPORT_CACHE_MB * 2**20)
+
+@st.cache_resource
+def get_estimate_store():
+    """
+    Holds the Open ENOW estimates from openENOWinput.csv, with the partition index and
+    aggregate cube the "State Estimates", "County Estimates" and "Regional Estimates"
+    modes read from, shared by all sessions. The file is parsed once, with categorical
+    dimension columns and downcast metrics, and later starts read the parsed frame from
+    the columnar cache. New years dropped into OPENENOW_UPDATES_DIR, or a replaced
+    openENOWinput.csv, are merged in the background and swapped in without a restart
+    (see openenow.refresh); cached results of older versions are then dropped.
+    """
+    return EstimateStore(on_swap=lambda data: get_result_cache().clear())
+
+def render_chart(chart_key, build_chart, *args, **kwargs):
+    """
+    Shows the chart from build_chart(*args, **kwargs). Its serialized spec is kept
+    in the result cache under chart_key, so an unchanged view is not rebuilt.
+    """
+    def build_spec():
+        chart = profile.time("chart_build", build_chart, *args, **kwargs)
+        return profile.time("chart_spec", chart_spec, chart)
+    spec = result_cache.get_or_compute(normalize_key("chart", *chart_key), build_spec)
+    profile.time("chart_render", st.vega_lite_chart, spec.to_dict(), use_container_width=True)
+
+@st.cache_resource
+def get_view_store():
+    """
+    Query results precomputed by `python -m openenow.precompute`, or None if
+    none are built; read only for views whose input files are unchanged.
+    """
+    return open_view_store()
+
+def query_view(cache_key, view_key, sources, compute):
+    """
+    Returns the result of a selection from the result cache, else from the
+    precomputed views when they were built from the files in sources, else
+    from compute().
+    """
+    def load():
+        store = get_view_store()
+        if store is not None and store.serves(view_group(view_key), sources):
+            result = profile.time("precomputed_view", store.get, view_key)
+            if result is not None:
+                return result
+        return compute()
+    return result_cache.get_or_compute(cache_key, load)
+
+def load_estimate_data():
+    """Loads openENOWinput.csv and builds the estimate modes' index and cube."""
+    return get_estimate_store().current()
+
+def load_compare_data():
+    """Loads the comparison dataset and the Compare table."""
+    load_comparison_data()
+    load_comparison_table()
+
+@st.cache_resource
+def start_background_preload():
+    """
+    Starts loading the datasets named in OPENENOW_PRELOAD ("estimates",
+    "comparison" or "all") in a background thread, once per process, so the
+    first visitor to each mode does not wait for them.
+    """
+    return start_preload({"estimates": load_estimate_data, "comparison": load_compare_data})
+
+start_background_preload()
+
+# --- Images: resized once per process, served content-hashed from static/derived (see openenow.images) ---
+@st.cache_resource
+def sidebar_logo():
+    """The logo at its display width, or the original file if the derivative cannot be written."""
+    try:
+        return derivative_bytes(logo_derivative().path)
+    except OSError as exc:
+        package_logger.warning("Could not build the logo derivative: %s", exc)
+        return "open_ENOW_logo.png"
+
+@st.cache_resource
+def warn_missing_state_maps(state_names):
+    """Logs, once per process, the states in the data that have no map."""
+    missing = missing_maps(state_names)
+    if missing:
+        package_logger.warning("No state map for: %s", ", ".join(missing))
+    return missing
+
+def show_state_map(state):
+    """Shows a state's map from its resized derivatives, falling back to the original image."""
+    try:
+        derivatives = state_map_derivatives(state)
+    except OSError as exc:
+        package_logger.warning("Could not build map derivatives for %s: %s", state, exc)
+        derivatives = {}
+    if derivatives is None:
+        st.warning(f"Map for {state} not found.")
+    elif not derivatives:
+        st.image(map_path(state), use_container_width=True)
+    elif st.get_option("server.enableStaticServing"):
+        st.markdown(state_map_html(state, derivatives), unsafe_allow_html=True)
+    else:
+        st.image(derivative_bytes(derivatives["jpeg"][-1].path), use_container_width=True)
+
+@st.cache_resource
+def county_geometry():
+    """The county map's topology URL and FIPS index (see openenow.geo), read once per process; None if not built."""
+    return load_county_geometry()
 
 # --- Helper Functions ---
 def format_value(x, metric):
@@ -103,106 +208,38 @@ def format_value(x, metric):
     else:
         return f"{x:,.0f}"
 
-def get_sector_colors(n):
-    """Provides a list of distinct, colorblind-friendly colors."""
-    base_colors = [
-        "#332288", "#117733", "#44AA99", "#88CCEE", "#DDCC77",
-        "#CC6677", "#AA4499", "#882255", "#E69F00", "#56B4E9",
-        "#009E73", "#F0E442"
-    ]
-    return base_colors[:n] if n <= len(base_colors) else alt.themes.get().schemes['tableau20'][:n]
-
-# --- Function to convert DataFrame to CSV ---
-@st.cache_data
-def convert_df_to_csv(df):
+# --- Downloads: written on click, in the chosen format (see openenow.export) ---
+def export_download_button(label, widget_key, file_stem, table_key, build_table, extract_key, build_extract, index=False):
     """
-    Converts a Pandas DataFrame to a CSV string, encoded in UTF-8.
+    Shows a download button with a format picker and a "Full filtered extract" switch,
+    which swaps the displayed table (build_table()) for every row behind the chart
+    (build_extract()). Nothing is written until the button is clicked; the file is then
+    kept in the export cache under the table or extract key.
     """
-    return df.to_csv(index=False).encode('utf-8')
+    export_cache = get_export_cache()
+    format_col, extract_col = st.columns(2)
+    export_format = format_col.selectbox("Download format:", available_formats(), key=f"{widget_key}_format")
+    full_extract = extract_col.checkbox(
+        "Full filtered extract", key=f"{widget_key}_extract",
+        help="Download every input row behind the chart instead of the table shown."
+    )
+    if full_extract:
+        cache_key, build_frame, write_index, file_stem = extract_key, build_extract, False, f"{file_stem}_extract"
+    else:
+        cache_key, build_frame, write_index = table_key, build_table, index
+
+    def data():
+        return export_cache.get_or_compute(
+            normalize_key("export", *cache_key, export_format),
+            lambda: export_bytes(build_frame(), export_format, index=write_index)
+        )
+    st.download_button(
+        label=label, data=data, file_name=export_file_name(file_stem, export_format),
+        mime=EXPORT_FORMATS[export_format].mime, key=widget_key,
+    )
 
 
 # --- Data Dictionaries for Expanders ---
-SECTOR_DESCRIPTIONS = {
-    "Living Resources": {
-        "description": "The Living Resources sector includes industries engaged in the harvesting, processing, or selling of marine life. This encompasses commercial fishing, aquaculture (such as fish hatcheries and shellfish farming), seafood processing and packaging, and wholesale or retail seafood markets.",
-        "table": pd.DataFrame([
-            {"NAICS Code": "11251", "Years": "All years", "Description": "Fish Hatcheries and Aquaculture"},
-            {"NAICS Code": "11411", "Years": "All years", "Description": "Fishing"},
-            {"NAICS Code": "311710", "Years": "2012 - present", "Description": "Seafood Product Preparation and Packaging"},
-            {"NAICS Code": "424460", "Years": "All years", "Description": "Fish and Seafood Merchant Wholesalers"},
-            {"NAICS Code": "445250", "Years": "2022 - present", "Description": "Fish and Seafood Retailers"},
-            {"NAICS Code": "311711", "Years": "2001 - 2011", "Description": "Seafood Canning"},
-            {"NAICS Code": "311712", "Years": "2001 - 2011", "Description": "Fresh and Frozen Seafood Processing"},
-            {"NAICS Code": "445220", "Years": "2001 - 2021", "Description": "Fish and Seafood Markets"},
-        ])
-    },
-    "Marine Construction": {
-        "description": "The Marine Construction sector is composed of establishments involved in heavy and civil engineering construction that is related to the marine environment, such as dredging, pier construction, and beach nourishment.",
-        "table": pd.DataFrame([
-            {"NAICS Code": "237990", "Years": "All years", "Description": "Other Heavy and Civil Engineering Construction"}
-        ])
-    },
-    "Marine Transportation": {
-        "description": "The Marine Transportation sector includes industries that provide transportation for freight and passengers on the deep sea, coastal waters, or the Great Lakes. It also covers support activities essential for water transport, such as port and harbor operations, marine cargo handling, and navigational services. The manufacturing of search and navigation equipment and warehousing services are also included in this sector.",
-        "table": pd.DataFrame([
-            {"NAICS Code": "334511", "Years": "All years", "Description": "Search, Detection, Navigation, Guidance, Aeronautical, and Nautical System and Instrument Manufacturing"},
-            {"NAICS Code": "48311", "Years": "All years", "Description": "Marine Freight and Passenger Transport"},
-            {"NAICS Code": "4883", "Years": "All years", "Description": "Marine Transportation Services"},
-            {"NAICS Code": "4931", "Years": "All years", "Description": "Warehousing"},
-        ])
-    },
-    "Offshore Mineral Resources": {
-        "description": "The Offshore Mineral Resources sector consists of industries involved in the exploration and extraction of minerals from the seafloor. This includes the extraction of crude petroleum and natural gas, the mining of sand and gravel, and support activities such as drilling and geophysical exploration.",
-        "table": pd.DataFrame([
-            {"NAICS Code": "211120", "Years": "2017 - present", "Description": "Crude Petroleum Extraction"},
-            {"NAICS Code": "211130", "Years": "2017 - present", "Description": "Natural Gas Extraction"},
-            {"NAICS Code": "212321", "Years": "All years", "Description": "Construction Sand and Gravel Mining"},
-            {"NAICS Code": "212322", "Years": "All years", "Description": "Industrial Sand Mining"},
-            {"NAICS Code": "213111", "Years": "All years", "Description": "Drilling Oil and Gas Wells"},
-            {"NAICS Code": "213112", "Years": "All years", "Description": "Support Activities for Oil and Gas Operations"},
-            {"NAICS Code": "541360", "Years": "All years", "Description": "Geophysical Surveying and Mapping Services"},
-            {"NAICS Code": "211111", "Years": "2001 - 2016", "Description": "Crude Petroleum and Natural Gas Extraction"},
-            {"NAICS Code": "211112", "Years": "2001 - 2016", "Description": "Natural Gas Liquid Extraction"},
-        ])
-    },
-    "Ship and Boat Building": {
-        "description": "The Ship and Boat Building sector is composed of establishments that build, repair, and maintain ships and recreational boats.",
-        "table": pd.DataFrame([
-            {"NAICS Code": "33661", "Years": "All years", "Description": "Ship and Boat Building"}
-        ])
-    },
-    "Tourism and Recreation": {
-        "description": "The Tourism and Recreation sector comprises a diverse group of industries that provide goods and services to people enjoying coastal recreation. This includes businesses such as full-service and limited-service restaurants, hotels and motels, marinas, boat dealers, and charter fishing operations. It also includes scenic water tours, sporting goods manufacturers, recreational instruction, and attractions like aquaria and nature parks.",
-        "table": pd.DataFrame([
-            {"NAICS Code": "339920", "Years": "All years", "Description": "Sporting and Athletic Goods Manufacturing"},
-            {"NAICS Code": "441222", "Years": "All years", "Description": "Boat Dealers"},
-            {"NAICS Code": "487210", "Years": "All years", "Description": "Scenic and Sightseeing Transportation, Water"},
-            {"NAICS Code": "487990", "Years": "All years", "Description": "Scenic and Sightseeing Transportation, Other"},
-            {"NAICS Code": "532284", "Years": "2017 - present", "Description": "Recreational Goods Rental"},
-            {"NAICS Code": "611620", "Years": "All years", "Description": "Sports and Recreation Instruction"},
-            {"NAICS Code": "712130", "Years": "All years", "Description": "Zoos and Botanical Gardens"},
-            {"NAICS Code": "712190", "Years": "All years", "Description": "Nature Parks and Other Similar Institutions"},
-            {"NAICS Code": "713110", "Years": "All years", "Description": "Amusement and Theme Parks"},
-            {"NAICS Code": "713930", "Years": "All years", "Description": "Marinas"},
-            {"NAICS Code": "713990", "Years": "All years", "Description": "All Other Amusement and Recreation Industries"},
-            {"NAICS Code": "721110", "Years": "All years", "Description": "Hotels (except Casino Hotels) and Motels"},
-            {"NAICS Code": "721191", "Years": "All years", "Description": "Bed-and-Breakfast Inns"},
-            {"NAICS Code": "721199", "Years": "All years", "Description": "All Other Traveler Accommodation"},
-            {"NAICS Code": "721211", "Years": "All years", "Description": "RV (Recreational Vehicle) Parks and Campgrounds"},
-            {"NAICS Code": "721214", "Years": "All years", "Description": "Recreational and Vacation Camps (except Campgrounds)"},
-            {"NAICS Code": "722410", "Years": "All years", "Description": "Drinking Places (Alcoholic Beverages)"},
-            {"NAICS Code": "722511", "Years": "2012 - present", "Description": "Full-Service Restaurants"},
-            {"NAICS Code": "722513", "Years": "2012 - present", "Description": "Limited-Service Restaurants"},
-            {"NAICS Code": "722514", "Years": "2012 - present", "Description": "Cafeterias, Grill Buffets, and Buffets"},
-            {"NAICS Code": "722515", "Years": "2012 - present", "Description": "Snack and Nonalcoholic Beverage Bars"},
-            {"NAICS Code": "532292", "Years": "2001 - 2016", "Description": "Recreational Goods Rental"},
-            {"NAICS Code": "722110", "Years": "2001 - 2011", "Description": "Full-Service Restaurants"},
-            {"NAICS Code": "722211", "Years": "2001 - 2011", "Description": "Limited-Service Restaurants"},
-            {"NAICS Code": "722212", "Years": "2001 - 2011", "Description": "Cafeterias, Grill Buffets, and Buffets"},
-            {"NAICS Code": "722213", "Years": "2001 - 2011", "Description": "Snack and Nonalcoholic Beverage Bars"},
-        ])
-    }
-}
 METRIC_DESCRIPTIONS = {
     "Employment": "Employment estimates in Open ENOW are based on the sum of annual average employment reported in the Quarterly Census of Employment and Wages (QCEW) for a given set of NAICS codes and set of coastal counties. For example, Open ENOW estimates employment in the Louisiana Marine Transportation Sector based on reported annual average employment in four NAICS codes (334511, 48311, 4883, and 4931) in 18 Louisiana parishes on or near the coastline. To address gaps in public county-level QCEW data, Open ENOW imputes missing values based on data from other years or broader economic sectors.",
     "Wages (not inflation-adjusted)": "Open ENOW estimates wages paid to workers based on the sum of total wages and salary paid to workers reported in the Quarterly Census of Employment and Wages (QCEW) for a given set of NAICS codes and set of coastal counties. For example, Open ENOW estimates wages in the Louisiana Marine Transportation Sector based on reported wages and salary in four NAICS codes (334511, 48311, 4883, and 4931) in 18 Louisiana parishes on or near the coastline. To address gaps in public county-level QCEW data, Open ENOW imputes missing values based on data from other years or broader economic sectors.",
@@ -223,7 +260,7 @@ METRIC_MAP = {
     "Real GDP": "RealGDP"
 }
 
-st.sidebar.image("open_ENOW_logo.png", width=200)
+st.sidebar.image(sidebar_logo(), width=200)
 
 # --- START: CODE FOR POP-UP WINDOW ---
 popover = st.sidebar.popover("What is Open ENOW?")
@@ -248,6 +285,7 @@ button_map = {
     "States": "State Estimates from Public QCEW Data",
     "Counties": "County Estimates from Public QCEW Data",
     "Regions": "Regional Estimates from Public QCEW Data",
+    "Side by Side": "Compare Geographies from Public QCEW Data",
     "Compare": "Compare to original ENOW",
     "Error Analysis": "Error Analysis"
 }
@@ -296,9 +334,13 @@ with row1_cols[1]:
     is_selected = st.session_state.plot_mode == button_map["Counties"]
     st.button("Counties", on_click=update_mode, args=("Counties",), use_container_width=True, type="primary" if is_selected else "secondary")
 
-# Place the third button on its own line
-is_selected = st.session_state.plot_mode == button_map["States"]
-st.sidebar.button("States", on_click=update_mode, args=("States",), use_container_width=True, type="primary" if is_selected else "secondary")
+row2_cols = st.sidebar.columns(2)
+with row2_cols[0]:
+    is_selected = st.session_state.plot_mode == button_map["States"]
+    st.button("States", on_click=update_mode, args=("States",), use_container_width=True, type="primary" if is_selected else "secondary")
+with row2_cols[1]:
+    is_selected = st.session_state.plot_mode == button_map["Side by Side"]
+    st.button("Side by Side", on_click=update_mode, args=("Side by Side",), use_container_width=True, type="primary" if is_selected else "secondary", help="Compare several geographies and sectors")
 
 st.sidebar.header("Reviewer Displays (Temporary)")
 rev_cols = st.sidebar.columns(2)
@@ -314,6 +356,7 @@ with rev_cols[1]:
 st.sidebar.divider() 
 
 plot_mode = st.session_state.plot_mode
+profile.note(mode=plot_mode)
 
 
 # --- Select Active DataFrame and Set Filters based on Mode ---
@@ -329,41 +372,36 @@ selected_state = None
 geo_filter_type = None
 all_geo_label = None
 selected_geo = None
-active_df_geo_filtered = pd.DataFrame()
 
 
 if plot_mode in estimate_modes:
-    active_df = open_enow_data
-    if active_df is None:
+    get_estimate_store().check()
+    estimate_data = profile.time("load_estimate_data", load_estimate_data)
+    if estimate_data is None:
         st.error("❌ **Data not found!** Please make sure `openENOWinput.csv` is in the same directory as the app.")
         st.stop()
+    estimate_index, estimate_cube = estimate_data.index, estimate_data.cube
 
     if plot_mode == "State Estimates from Public QCEW Data":
-        # --- MODIFICATION: Filter ONLY by GeoScale initially to keep all aggregation levels ---
-        active_df_geo_filtered = active_df[active_df['GeoScale'] == 'State'].copy()
         geo_label = "Select State:"
         all_geo_label = "All Coastal States"
         geo_filter_type = 'State'
-        geo_names = active_df_geo_filtered["GeoName"].dropna().unique()
-        unique_geos = [all_geo_label] + sorted(geo_names)
+        unique_geos = [all_geo_label] + estimate_index.geos_by_scale.get('State', [])
         selected_geo = st.sidebar.selectbox(geo_label, unique_geos)
+        warn_missing_state_maps(tuple(estimate_index.geos_by_scale.get('State', [])))
 
     elif plot_mode == "County Estimates from Public QCEW Data":
-        # Filter for County-level data
-        active_df_geo_filtered = active_df[(active_df['geoType'] == 'County')].copy()
         geo_filter_type = 'County'
         all_geo_label = None 
 
         state_label = "Select State:"
-        if 'stateName' in active_df_geo_filtered.columns:
-            state_names = sorted(active_df_geo_filtered['stateName'].dropna().unique())
+        if 'stateName' in estimate_index.frame.columns:
+            state_names = sorted(estimate_index.counties_by_state)
             selected_state = st.sidebar.selectbox(state_label, state_names)
 
             county_label = "Select County:"
             if selected_state:
-                county_names = sorted(
-                    active_df_geo_filtered[active_df_geo_filtered['stateName'] == selected_state]['GeoName'].dropna().unique()
-                )
+                county_names = estimate_index.counties_by_state.get(selected_state, [])
                 selected_county_name = st.sidebar.selectbox(county_label, county_names)
             else:
                 selected_county_name = st.sidebar.selectbox(county_label, [])
@@ -374,17 +412,15 @@ if plot_mode in estimate_modes:
             selected_county_name = None
 
     else: # Regional Estimates from Public QCEW Data
-        active_df_geo_filtered = active_df[active_df['GeoScale'] == 'Region'].copy()
         geo_label = "Select Region:"
         all_geo_label = "All Regions"
         geo_filter_type = 'Region'
-        geo_names = active_df_geo_filtered["GeoName"].dropna().unique()
-        unique_geos = [all_geo_label] + sorted(geo_names)
+        unique_geos = [all_geo_label] + estimate_index.geos_by_scale.get('Region', [])
         selected_geo = st.sidebar.selectbox(geo_label, unique_geos)
     
     # --- DYNAMIC FILTERS FOR ESTIMATE MODES ---
-    ocean_sectors = active_df["OceanSector"].dropna().unique()
-    unique_sectors = ["All Marine Sectors"] + sorted(ocean_sectors)
+    ocean_sectors = estimate_index.sectors
+    unique_sectors = ["All Marine Sectors"] + ocean_sectors
     selected_sector = st.sidebar.selectbox("Select Sector:", unique_sectors)
 
     # --- START: NEW "Select Industry" Dropdown ---
@@ -394,11 +430,7 @@ if plot_mode in estimate_modes:
             selected_industry = st.sidebar.selectbox("Select Industry:", ["All Marine Industries"], disabled=True)
         else:
             # Get the list of industries for the selected sector
-            industry_df = active_df[
-                (active_df['aggregation'] == 'Industry') &
-                (active_df['OceanSector'] == selected_sector)
-            ]
-            industry_list = ["All Marine Industries"] + sorted(industry_df['enowIndustry'].dropna().unique())
+            industry_list = ["All Marine Industries"] + estimate_index.industries_by_sector.get(selected_sector, [])
             selected_industry = st.sidebar.selectbox("Select Industry:", industry_list)
     # --- END: NEW "Select Industry" Dropdown ---
 
@@ -411,18 +443,28 @@ if plot_mode in estimate_modes:
     selected_display_metric = st.sidebar.selectbox("Select Metric:", metric_choices)
     selected_metric_internal = METRIC_MAP[selected_display_metric]
 
-    min_year, max_year = int(active_df["Year"].min()), int(active_df["Year"].max())
-    default_end_year = max_year
-    default_start_year = max(min_year, max_year - 9)
-    default_range = (default_start_year, default_end_year)
+    min_year, max_year = estimate_index.year_bounds
     year_range = st.sidebar.slider(
         "Select Year Range:",
         min_value=min_year,
         max_value=max_year,
-        value=default_range,
+        value=default_estimate_years(estimate_index.year_bounds),
         step=1
     )
 
+    # --- Top-contributor options for one sector across all states or regions ---
+    top_n, stable_top = TOP_CONTRIBUTORS, False
+    if selected_geo == all_geo_label and shows_top_contributors(geo_filter_type, None, selected_sector, selected_industry):
+        scale_plural = f"{geo_filter_type}s"
+        geo_count = len(estimate_index.geos_by_scale.get(geo_filter_type, []))
+        top_n = st.sidebar.slider(
+            f"{scale_plural} Shown:", min_value=1, max_value=max(2, min(10, geo_count)), value=TOP_CONTRIBUTORS, step=1
+        )
+        stable_top = st.sidebar.checkbox(
+            f"Same {scale_plural.lower()} in every year", value=False,
+            help=f"Show the {scale_plural.lower()} with the largest total over the selected years, rather than each year's largest."
+        )
+
     # --- DYNAMIC TITLE FOR ESTIMATE MODES ---
     title_econ_part = "All Marine Sectors" # Default
     if selected_industry != "All Marine Industries":
@@ -443,43 +485,36 @@ if plot_mode in estimate_modes:
     is_gdp_metric = selected_display_metric in ["GDP (nominal)", "Real GDP"]
     if is_gdp_metric:
         gdp_col_to_check = f"Open_{selected_metric_internal}"
-        if not active_df.empty:
-            gdp_is_missing_for_max_year = active_df.loc[active_df['Year'] == max_year, gdp_col_to_check].isnull().all()
+        if not estimate_index.frame.empty:
+            gdp_is_missing_for_max_year = estimate_index.rows_for_years(max_year, max_year)[gdp_col_to_check].isnull().all()
             if gdp_is_missing_for_max_year:
                 st.info(f"💡 GDP estimates are not yet available for {max_year}.")
     
-    base_filtered_df = active_df_geo_filtered[
-        (active_df_geo_filtered["Year"] >= year_range[0]) &
-        (active_df_geo_filtered["Year"] <= year_range[1])
-    ]
+    # --- Query: geography, then sector OR industry, then the year range ---
     if plot_mode == "County Estimates from Public QCEW Data":
-        if selected_county_name and selected_state:
-            base_filtered_df = base_filtered_df[
-                (base_filtered_df["GeoName"] == selected_county_name) &
-                (base_filtered_df["stateName"] == selected_state)
-            ]
-        else:
-            base_filtered_df = pd.DataFrame()
-    elif all_geo_label and selected_geo == all_geo_label:
-        pass # No geographic filter needed
+        state_key, geo_key = selected_state, selected_county_name
+        has_geo_selection = bool(selected_county_name and selected_state)
     else:
-        base_filtered_df = base_filtered_df[base_filtered_df["GeoName"] == selected_geo]
-    
-    # --- MODIFICATION: Economic filtering based on sector OR industry ---
-    if selected_industry != "All Marine Industries":
-        base_filtered_df = base_filtered_df[
-            (base_filtered_df['aggregation'] == 'Industry') &
-            (base_filtered_df['enowIndustry'] == selected_industry)
-        ]
-    elif selected_sector != "All Marine Sectors":
-         base_filtered_df = base_filtered_df[
-            (base_filtered_df['aggregation'] == 'Sector') &
-            (base_filtered_df["OceanSector"] == selected_sector)
-        ]
-    else: # All sectors selected
-        # Ensure we only plot sector-level data when "All Marine Sectors" is chosen
-        base_filtered_df = base_filtered_df[base_filtered_df['aggregation'] == 'Sector']
-    # --- END MODIFICATION ---
+        state_key = None
+        geo_key = None if (all_geo_label and selected_geo == all_geo_label) else selected_geo
+        has_geo_selection = True
+
+    estimate_result = None
+    if has_geo_selection:
+        estimate_view_key = estimate_view(
+            geo_filter_type, state_key, geo_key, selected_sector, selected_industry, selected_metric_internal,
+            year_range, top_n, stable_top
+        )
+        estimate_key = normalize_key(estimate_data.version, *estimate_view_key)
+        estimate_result = query_view(estimate_key, estimate_view_key, estimate_data.sources, lambda: query_estimates(
+            estimate_cube, geo_filter_type, geo_key, selected_sector, selected_industry,
+            selected_metric_internal, year_range, state=state_key, top_n=top_n, stable_top=stable_top, profile=profile
+        ))
+    profile.note(
+        geo=selected_geo, state=state_key, county=selected_county_name, sector=selected_sector,
+        industry=selected_industry, metric=selected_metric_internal, year_range=year_range, top_n=top_n,
+        stable_top=stable_top
+    )
 
     y_label_map = {
         "GDP (nominal)": "GDP ($ millions)", "Real GDP": "Real GDP ($ millions, 2017)",
@@ -488,16 +523,12 @@ if plot_mode in estimate_modes:
     }
     y_label = y_label_map.get(selected_display_metric, selected_display_metric)
     is_currency = selected_display_metric in ["GDP (nominal)", "Real GDP", "Wages (not inflation-adjusted)", "Real Wages"]
-    tooltip_format = '$,.0f' if is_currency else ',.0f'
-    
-    open_metric_col = f"Open_{selected_metric_internal}"
     
     summary_message = ""
     change_message = ""
-    if not base_filtered_df.empty:
-        latest_year = year_range[1]
-        latest_year_data = base_filtered_df[base_filtered_df['Year'] == latest_year]
-        latest_value = latest_year_data[open_metric_col].sum()
+    if estimate_result is not None and estimate_result.latest_value is not None:
+        latest_year = estimate_result.latest_year
+        latest_value = estimate_result.latest_value
 
         if pd.notna(latest_value) and latest_value > 0:
             formatted_value = format_value(latest_value, selected_display_metric)
@@ -519,119 +550,109 @@ if plot_mode in estimate_modes:
             }
             summary_message = summary_text_templates.get(selected_display_metric, "")
 
-            start_year = year_range[0]
-            start_year_data = base_filtered_df[base_filtered_df['Year'] == start_year]
-            start_value = start_year_data[open_metric_col].sum()
-
-            if pd.notna(start_value) and start_value > 0 and start_year != latest_year:
-                percent_change = ((latest_value - start_value) / start_value) * 100
+            percent_change = estimate_result.percent_change
+            if percent_change is not None:
                 change_direction = "increase" if percent_change >= 0 else "decrease"
-                change_message = f"<i>This represents a {abs(percent_change):.0f}% {change_direction} since {start_year}.</i>"
+                change_message = f"<i>This represents a {abs(percent_change):.0f}% {change_direction} since {estimate_result.start_year}.</i>"
 
     # --- Charting Logic Starts ---
-    chart_data_to_download = pd.DataFrame() 
-
-    # --- MODIFICATION: Condition for stacked bar chart is now more specific ---
-    show_stacked_by_sector = (selected_sector == "All Marine Sectors" and selected_industry == "All Marine Industries")
-    
-    if show_stacked_by_sector:
-        plot_df = base_filtered_df[["Year", "OceanSector", open_metric_col]].copy()
-        plot_df.rename(columns={open_metric_col: "Estimate_value"}, inplace=True)
-        plot_df.dropna(subset=["Estimate_value"], inplace=True)
-        
-        chart_data_to_download = plot_df.copy()
-
-        if is_currency:
-            plot_df["Estimate_value"] /= 1e6
-        if not plot_df.empty:
-            chart = alt.Chart(plot_df).mark_bar().encode(
-                x=alt.X('Year:O', title='Year'),
-                y=alt.Y('sum(Estimate_value):Q', title=y_label, stack='zero', axis=alt.Axis(tickCount=8)),
-                color=alt.Color('OceanSector:N', scale=alt.Scale(domain=sorted_sector_names, range=colors_list), legend=alt.Legend(title="Sectors")),
-                tooltip=[alt.Tooltip('Year:O', title='Year'), alt.Tooltip('OceanSector:N', title='Sector'), alt.Tooltip('sum(Estimate_value):Q', title=selected_display_metric, format=tooltip_format)]
-            ).properties(height=600).configure_axis(labelFontSize=14, titleFontSize=16).configure_legend(symbolLimit=len(sorted_sector_names))
-            st.altair_chart(chart, use_container_width=True)
-        else:
-            st.warning("No data available for the selected filters.")
+    if estimate_result is not None and not estimate_result.chart_df.empty:
+        render_chart(
+            (estimate_key, selected_display_metric, is_currency),
+            estimate_chart, estimate_result, sorted_sector_names, geo_filter_type, selected_display_metric, y_label,
+            currency=is_currency, bar_color=sector_color_map.get(selected_sector, "#808080")
+        )
     else:
-        # This block now handles single sector, single industry, and "All Geos" cases
-        if all_geo_label and selected_geo == all_geo_label and selected_industry == "All Marine Industries":
-            source_df = base_filtered_df[['Year', 'GeoName', open_metric_col]].copy()
-            source_df.dropna(subset=[open_metric_col], inplace=True)
-            if not source_df.empty and source_df[open_metric_col].sum() > 0:
-                source_df['rank'] = source_df.groupby('Year')[open_metric_col].rank(method='first', ascending=False)
-                other_geo_text = f"All Other {geo_filter_type}s"
-                source_df['GeoContribution'] = np.where(source_df['rank'] <= 3, source_df['GeoName'], other_geo_text)
-                plot_df_geos = source_df.groupby(['Year', 'GeoContribution'])[open_metric_col].sum().reset_index()
-                plot_df_geos.rename(columns={open_metric_col: "Estimate_value"}, inplace=True)
-                chart_data_to_download = plot_df_geos.copy()
-                if is_currency:
-                    plot_df_geos["Estimate_value"] /= 1e6
-                unique_contributors = sorted([c for c in plot_df_geos['GeoContribution'].unique() if c != other_geo_text])
-                sort_order = unique_contributors + [other_geo_text]
-                color_range = get_sector_colors(len(unique_contributors)) + ["#A5AAAF"]
-                chart = alt.Chart(plot_df_geos).mark_bar().encode(
-                    x=alt.X('Year:O', title='Year'),
-                    y=alt.Y('Estimate_value:Q', title=y_label, stack='zero', axis=alt.Axis(tickCount=8)),
-                    color=alt.Color('GeoContribution:N', legend=alt.Legend(title=f"{geo_filter_type} Contribution", orient="right"), sort=sort_order, scale=alt.Scale(domain=sort_order, range=color_range)),
-                    tooltip=[alt.Tooltip('Year:O', title='Year'), alt.Tooltip('GeoContribution:N', title='Contribution'), alt.Tooltip('Estimate_value:Q', title=selected_display_metric, format=tooltip_format)]
-                ).properties(height=600).configure_axis(labelFontSize=14, titleFontSize=16).configure_legend(symbolLimit=31)
-                st.altair_chart(chart, use_container_width=True)
-            else:
-                st.warning("No data available for the selected filters.")
-        else: # This is the default case for a single bar chart (for a sector or an industry)
-            bar_df = base_filtered_df.groupby("Year")[open_metric_col].sum().reset_index()
-            bar_df.rename(columns={open_metric_col: 'Estimate_value'}, inplace=True)
-            chart_data_to_download = bar_df.copy()
-            if not bar_df.empty:
-                if is_currency:
-                    bar_df["Estimate_value"] /= 1e6
-                sector_color = sector_color_map.get(selected_sector, "#808080")
-                chart = alt.Chart(bar_df).mark_bar(color=sector_color).encode(
-                    x=alt.X('Year:O', title='Year'),
-                    y=alt.Y('Estimate_value:Q', title=y_label, stack='zero', axis=alt.Axis(tickCount=8)),
-                    tooltip=[alt.Tooltip('Year:O', title='Year'), alt.Tooltip('Estimate_value:Q', title=selected_display_metric, format=tooltip_format)]
-                ).properties(height=600).configure_axis(labelFontSize=14, titleFontSize=16)
-                st.altair_chart(chart, use_container_width=True)
-            else:
-                st.warning("No data available for the selected filters.")
+        st.warning("No data available for the selected filters.")
 
     if summary_message:
         st.markdown(f"<p style='font-size: 24px; text-align: center; font-weight: normal;'>{summary_message}</p>", unsafe_allow_html=True)
     if change_message:
         st.markdown(f"<p style='font-size: 18px; text-align: center;'>{change_message}</p>", unsafe_allow_html=True)
-    
-    if not chart_data_to_download.empty:
+
+    # --- Analytics strip: growth, and share and rank among states or regions ---
+    growth_df = estimate_result.growth_df if estimate_result is not None else None
+    if summary_message and growth_df is not None and not growth_df.empty:
+        latest_year = estimate_result.latest_year
+        latest_rows = growth_df[growth_df["Year"] == latest_year]
+        latest_growth = latest_rows.iloc[0] if not latest_rows.empty else None
+
+        def latest_figure(column, template):
+            if latest_growth is None or column not in latest_growth or pd.isna(latest_growth[column]):
+                return "N/A"
+            return template.format(latest_growth[column])
+
+        cagr = estimate_result.cagr
+        strip = [
+            (f"Annual Growth {estimate_result.start_year}–{latest_year}", "N/A" if cagr is None else f"{cagr:+.1f}%"),
+            (f"Change from {latest_year - 1}", latest_figure("YoY change (%)", "{:+.1f}%")),
+        ]
+        if "Share" in growth_df.columns:
+            rank = latest_figure("Rank", "{:.0f}")
+            strip += [
+                (f"Share of {all_geo_label}, {latest_year}", latest_figure("Share", "{:.1f}%")),
+                (f"Rank Among {geo_filter_type}s, {latest_year}",
+                 rank if rank == "N/A" else f"{rank} of {latest_figure('Peers', '{:.0f}')}"),
+            ]
+        for strip_column, (label, value) in zip(st.columns(len(strip)), strip):
+            strip_column.metric(label, value)
+
+        with st.expander("Growth by Year"):
+            growth_table = growth_df.rename(columns={"Estimate_value": selected_display_metric}).set_index("Year")
+            st.dataframe(
+                growth_table.style.format({
+                    selected_display_metric: "{:,.0f}", "YoY change (%)": "{:+.1f}", "Share": "{:.1f}%",
+                    "Rank": "{:.0f}", "Peers": "{:.0f}",
+                }, subset=list(growth_table.columns), na_rep="N/A"),
+                use_container_width=True
+            )
+
+    if estimate_result is not None and estimate_result.table_df is not None:
         with st.expander("View as a Table"):
-            table_df = None
-            if 'OceanSector' in chart_data_to_download.columns:
-                table_df = chart_data_to_download.pivot_table(index='OceanSector', columns='Year', values='Estimate_value')
-                table_df.index.name = "Sector"
-            elif 'GeoContribution' in chart_data_to_download.columns:
-                table_df = chart_data_to_download.pivot_table(index='GeoContribution', columns='Year', values='Estimate_value')
-                table_df.index.name = "Geography"
+            table_df = estimate_result.table_df
+            st.dataframe(table_df.style.format("{:,.0f}", na_rep="N/A"), use_container_width=True)
+            safe_geo = re.sub(r'[^a-zA-Z0-9]', '_', str(selected_geo))
+            safe_econ = re.sub(r'[^a-zA-Z0-9]', '_', str(title_econ_part))
+            export_download_button(
+                "📥 Download Table Data", "estimate_download",
+                f"OpenENOW_{safe_geo}_{safe_econ}_{year_range[0]}_{year_range[1]}",
+                estimate_key, lambda: table_df,
+                normalize_key(
+                    "estimate_extract", estimate_data.version, geo_filter_type, state_key, geo_key,
+                    selected_sector, selected_industry, year_range
+                ),
+                lambda: estimate_extract(
+                    estimate_index, geo_filter_type, geo_key, selected_sector, selected_industry, year_range,
+                    state=state_key
+                ),
+                index=True,
+            )
+
+    # --- Map of every coastal county for the selected sector, metric and years ---
+    if plot_mode == "County Estimates from Public QCEW Data":
+        with st.expander("Map of Coastal Counties", expanded=True):
+            geometry = county_geometry()
+            if geometry is None:
+                st.info("💡 The county map has not been built yet; see \"County map\" in the README.")
             else:
-                # Determine index name for single entity table
-                table_index_name = selected_sector
-                if selected_industry != "All Marine Industries":
-                    table_index_name = selected_industry
-                table_df = chart_data_to_download.set_index('Year').rename(columns={'Estimate_value': table_index_name}).T
-                table_df.index.name = "Industry" if selected_industry != "All Marine Industries" else "Sector"
-
-
-            if table_df is not None:
-                st.dataframe(table_df.style.format("{:,.0f}", na_rep="N/A"), use_container_width=True)
-                csv_table_data = table_df.to_csv().encode('utf-8')
-                safe_geo = re.sub(r'[^a-zA-Z0-9]', '_', str(selected_geo))
-                safe_econ = re.sub(r'[^a-zA-Z0-9]', '_', str(title_econ_part))
-                file_name = f"OpenENOW_{safe_geo}_{safe_econ}_{year_range[0]}_{year_range[1]}.csv"
-                st.download_button(
-                   label="📥 Download Table Data as CSV",
-                   data=csv_table_data,
-                   file_name=file_name,
-                   mime='text/csv',
+                county_map_key = normalize_key(
+                    "county_map", estimate_data.version, geometry.url, selected_sector, selected_metric_internal,
+                    year_range
                 )
-                
+                county_values = result_cache.get_or_compute(county_map_key, lambda: query_county_map(
+                    estimate_cube, geometry.fips, selected_sector, selected_metric_internal, year_range, profile=profile
+                ))
+                if county_values.empty:
+                    st.warning("No county data available for the selected filters.")
+                else:
+                    selected_fips = geometry.fips.get((selected_state, selected_county_name))
+                    render_chart(
+                        (county_map_key, selected_display_metric, is_currency, selected_fips),
+                        county_map_chart, county_values, geometry.url, geometry.object_name, selected_display_metric,
+                        y_label, year_range, currency=is_currency, selected_fips=selected_fips
+                    )
+                    st.caption("Move the Year slider under the map to step through the years.")
+
     # --- START: MODIFIED EXPANDER FOR GEOGRAPHY (WITH STATE MAPS) ---
     expander_title = "Coastal Geographies in Open ENOW"
     if plot_mode == "State Estimates from Public QCEW Data" and selected_geo != "All Coastal States":
@@ -647,11 +668,7 @@ if plot_mode in estimate_modes:
                     # Display the map and legend for a single selected state
                     map_col, legend_col = st.columns([2, 1])
                     with map_col:
-                        map_filename = f"ENOW state maps/Map_{selected_geo.replace(' ', '_')}.jpg"
-                        if os.path.exists(map_filename):
-                            st.image(map_filename, use_container_width=True)
-                        else:
-                            st.warning(f"Map for {selected_geo} not found.")
+                        show_state_map(selected_geo)
                     with legend_col:
                         st.markdown("Open ENOW estimates marine economy establishments, employment, wages and GDP for the coastal portion of each state.")
                         legend_html = """
@@ -709,15 +726,124 @@ if plot_mode in estimate_modes:
     with st.expander(metric_expander_title):
         st.write(METRIC_DESCRIPTIONS.get(selected_display_metric, "No description available."))
 
+elif plot_mode == "Compare Geographies from Public QCEW Data":
+    get_estimate_store().check()
+    estimate_data = profile.time("load_estimate_data", load_estimate_data)
+    if estimate_data is None:
+        st.error("❌ **Data not found!** Please make sure `openENOWinput.csv` is in the same directory as the app.")
+        st.stop()
+    estimate_index, estimate_cube = estimate_data.index, estimate_data.cube
+
+    scale_plurals = {"State": "States", "County": "Counties", "Region": "Regions"}
+    compare_scale = st.sidebar.radio("Geographic Scale:", list(scale_plurals), index=0, horizontal=True)
+    # Geographies are (state, geo) pairs; state names only qualify counties.
+    if compare_scale == "County":
+        geo_options = [
+            (state, county) for state in sorted(estimate_index.counties_by_state)
+            for county in estimate_index.counties_by_state[state]
+        ]
+    else:
+        geo_options = [(None, geo) for geo in estimate_index.geos_by_scale.get(compare_scale, [])]
+    selected_geos = st.sidebar.multiselect(
+        f"Select {scale_plurals[compare_scale]}:", geo_options,
+        default=geo_options[:2], format_func=lambda pair: geography_label(*pair),
+        max_selections=MAX_COMPARED_GEOS, key=f"geo_compare_{compare_scale}",
+        help=f"Up to {MAX_COMPARED_GEOS}."
+    )
+    selected_sectors = st.sidebar.multiselect(
+        "Select Sectors:", ["All Marine Sectors"] + estimate_index.sectors, default=["All Marine Sectors"],
+        max_selections=MAX_COMPARED_SECTORS, key="geo_compare_sectors", help=f"Up to {MAX_COMPARED_SECTORS}."
+    )
+    selected_display_metric = st.sidebar.selectbox("Select Metric:", list(METRIC_MAP.keys()))
+    selected_metric_internal = METRIC_MAP[selected_display_metric]
+    min_year, max_year = estimate_index.year_bounds
+    year_range = st.sidebar.slider(
+        "Select Year Range:", min_value=min_year, max_value=max_year,
+        value=default_estimate_years(estimate_index.year_bounds), step=1
+    )
+    selected_layout = st.sidebar.radio("Layout:", GEO_COMPARISON_LAYOUTS, index=0, horizontal=True)
+
+    st.title(f"{selected_display_metric}: Comparing {scale_plurals[compare_scale]}")
+    if not selected_geos or not selected_sectors:
+        st.info(f"Select at least one {compare_scale.lower()} and one sector to compare.")
+        st.stop()
+
+    y_label_map = {
+        "GDP (nominal)": "GDP ($ millions)", "Real GDP": "Real GDP ($ millions, 2017)",
+        "Wages (not inflation-adjusted)": "Wages ($ millions)", "Real Wages": "Real Wages ($ millions, 2024)",
+        "Employment": "Employment (Number of Jobs)", "Establishments": "Establishments (Count)"
+    }
+    y_label = y_label_map.get(selected_display_metric, selected_display_metric)
+    is_currency = selected_display_metric in ["GDP (nominal)", "Real GDP", "Wages (not inflation-adjusted)", "Real Wages"]
+
+    geo_compare_key = normalize_key(
+        "geo_compare", estimate_data.version, compare_scale, selected_geos, selected_sectors,
+        selected_metric_internal, year_range
+    )
+    geo_comparison = result_cache.get_or_compute(geo_compare_key, lambda: query_geo_comparison(
+        estimate_cube, compare_scale, selected_geos, selected_sectors, selected_metric_internal, year_range,
+        profile=profile
+    ))
+    profile.note(
+        scale=compare_scale, geos=selected_geos, sectors=selected_sectors, metric=selected_metric_internal,
+        year_range=year_range, layout=selected_layout
+    )
+
+    if geo_comparison.chart_df.empty:
+        st.warning("No data available for the selected filters.")
+    else:
+        render_chart(
+            (geo_compare_key, selected_display_metric, selected_layout, is_currency),
+            geo_comparison_chart, geo_comparison.chart_df, selected_display_metric, y_label,
+            layout=selected_layout, currency=is_currency
+        )
+        charted = set(zip(geo_comparison.chart_df["Geography"], geo_comparison.chart_df["Sector"]))
+        missing = [
+            f"{geography_label(*geo)} ({sector})" for geo in selected_geos for sector in selected_sectors
+            if (geography_label(*geo), sector) not in charted
+        ]
+        if missing:
+            st.info(f"💡 No {selected_display_metric} estimates for: {', '.join(missing)}.")
+
+        with st.expander("View as a Table"):
+            compare_table = geo_comparison.table_df
+            st.dataframe(compare_table.style.format("{:,.0f}", na_rep="N/A"), use_container_width=True)
+            export_download_button(
+                "📥 Download Table Data", "geo_compare_download",
+                f"OpenENOW_{compare_scale}_comparison_{year_range[0]}_{year_range[1]}",
+                geo_compare_key, lambda: compare_table,
+                normalize_key(
+                    "geo_compare_extract", estimate_data.version, compare_scale, selected_geos, selected_sectors,
+                    year_range
+                ),
+                lambda: geo_comparison_extract(
+                    estimate_index, compare_scale, selected_geos, selected_sectors, year_range
+                ),
+                index=True,
+            )
+
+    with st.expander(f"{selected_display_metric} in Open ENOW"):
+        st.write(METRIC_DESCRIPTIONS.get(selected_display_metric, "No description available."))
+
 elif plot_mode == "Error Analysis":
-    active_df = comparison_data
+    active_df = profile.time("load_comparison_data", load_comparison_data)
     if active_df is None:
         st.error("❌ **Data not found!** Please make sure `enow_version_comparisons.csv` is in the same directory.")
         st.stop()
 
-    st.title("Error Analysis: Open ENOW vs. Original ENOW")
+    # Series measured against original ENOW; DORADO only where its file was found.
+    estimate_names = {"Open": "Open ENOW", "DORADO": "DORADO"}
+    if active_df["DORADO_Employment"].isna().all():
+        estimate_names.pop("DORADO")
 
     st.sidebar.header("Plot Configuration")
+    selected_estimate = st.sidebar.radio(
+        "Estimate:", list(estimate_names), format_func=estimate_names.get, index=0, horizontal=True
+    )
+    estimate_name = estimate_names[selected_estimate]
+    estimate_label = COMPARISON_SOURCES[selected_estimate]
+    st.title(f"Error Analysis: {estimate_name} vs. Original ENOW")
+
     selected_agg = st.sidebar.radio("Aggregation Level:", ("Sector", "Industry"), index=0)
     selected_geoscale = st.sidebar.radio("Geographic Scale:", ("State", "County"), index=0)
     y_axis_choice = st.sidebar.selectbox("Y-Axis (Error Metric):", ("Mean Percent Difference", "Mean Absolute Error", "Root Mean Squared Error"), index=0)
@@ -746,130 +872,70 @@ elif plot_mode == "Error Analysis":
         st.warning("Please select at least one 'Group By' option.")
         st.stop()
         
-    filtered_df = active_df[
-        (active_df['aggregation'] == selected_agg) &
-        (active_df['GeoScale'] == selected_geoscale) &
-        (active_df['Year'] >= year_range[0]) &
-        (active_df['Year'] <= year_range[1])
-    ].copy()
-
-    if selected_state_name != "All Coastal States":
-        filtered_df = filtered_df[filtered_df['state'] == selected_state_abbr]
-
-    if selected_sector_filter != "All Marine Sectors":
-        filtered_df = filtered_df[filtered_df['OceanSector'] == selected_sector_filter]
+    if selected_estimate == "DORADO" and (selected_agg, selected_geoscale) != ("Sector", "State"):
+        st.info("ℹ️ DORADO values are available for state-level sectors only.")
 
     x_metric_map = {"Employment": "Employment", "Wages": "Wages", "GDP": "GDP"}
     metric_suffix = x_metric_map[x_axis_choice]
-    open_col = f"Open_{metric_suffix}"
-    enow_col = f"oldENOW_{metric_suffix}"
 
-    results = []
-    grouping_cols = grouping_vars + ['GeoName']
-    
-    for name, group_df in filtered_df.groupby(grouping_cols):
-        group_df = group_df.dropna(subset=[enow_col, open_col])
-        if group_df.empty: continue
+    state_filter = None if selected_state_name == "All Coastal States" else selected_state_abbr
+    analysis_key = error_analysis_view(
+        selected_agg, selected_geoscale, grouping_vars, metric_suffix, year_range,
+        state_filter, selected_sector_filter, y_axis_choice, exclude_outliers, selected_estimate
+    )
+    analysis = query_view(analysis_key, analysis_key, file_signatures((COMPARISON_CSV, DORADO_CSV)), lambda: query_error_analysis(
+        active_df, selected_agg, selected_geoscale, grouping_vars, metric_suffix, year_range,
+        state_abbr=state_filter, sector=selected_sector_filter, y_axis=y_axis_choice,
+        exclude_outliers=exclude_outliers, estimate=selected_estimate, profile=profile
+    ))
+    profile.note(
+        aggregation=selected_agg, geoscale=selected_geoscale, grouping=grouping_vars, metric=metric_suffix,
+        y_axis=y_axis_choice, year_range=year_range, state=selected_state_name, sector=selected_sector_filter,
+        exclude_outliers=exclude_outliers, estimate=selected_estimate
+    )
+    results_df = analysis.results_df
 
-        valid_enow = group_df[group_df[enow_col] != 0]
-        mpd = 100 * (valid_enow[open_col] - valid_enow[enow_col]) / valid_enow[enow_col]
-        
-        result_row = {
-            'X_Value': (group_df[enow_col].mean() + group_df[open_col].mean()) / 2,
-            'Original ENOW Value': group_df[enow_col].mean(),
-            'Open ENOW Estimate': group_df[open_col].mean(),
-            'Mean Percent Difference': mpd.mean() if not mpd.empty else np.nan,
-            'Mean Absolute Error': mean_absolute_error(group_df[enow_col], group_df[open_col]),
-            'Root Mean Squared Error': np.sqrt(mean_squared_error(group_df[enow_col], group_df[open_col]))
-        }
-        
-        for i, col in enumerate(grouping_vars):
-            result_row[col] = name[i]
-        result_row['GeoName'] = name[len(grouping_vars)]
-        
-        results.append(result_row)
-        
-    if results:
-        results_df = pd.DataFrame(results)
-        results_df['Y_Value'] = results_df[y_axis_choice]
-        results_df = results_df.dropna(subset=['Y_Value', 'X_Value'])
-        results_df = results_df[results_df['X_Value'] > 0]
-
-        if exclude_outliers and not results_df.empty:
-            Q1 = results_df['Y_Value'].quantile(0.25)
-            Q3 = results_df['Y_Value'].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            original_rows = len(results_df)
-            results_df = results_df[
-                (results_df['Y_Value'] >= lower_bound) & (results_df['Y_Value'] <= upper_bound)
-            ]
-            removed_rows = original_rows - len(results_df)
-            if removed_rows > 0:
-                st.info(f"ℹ️ Excluded {removed_rows} outlier(s) based on the interquartile range of the Y-axis values.")
+    if not results_df.empty:
+        if analysis.outliers_removed > 0:
+            st.info(f"ℹ️ Excluded {analysis.outliers_removed} outlier(s) based on the interquartile range of the Y-axis values.")
 
-        results_df['Group'] = results_df[grouping_vars].astype(str).agg(' - '.join, axis=1)
-        
         st.subheader(f"Plot of {y_axis_choice} vs. Average {x_axis_choice}")
 
-        tooltip_format = '$,.0f' if x_axis_choice in ["Wages", "GDP"] else ',.0f'
-        tooltip_list = [
-            alt.Tooltip('Group:N', title='Group'),
-            alt.Tooltip('GeoName:N', title='Geography'),
-            alt.Tooltip('X_Value:Q', title=f'Mean {x_axis_choice}', format=',.0f'),
-            alt.Tooltip('Y_Value:Q', title=y_axis_choice, format='.2f'),
-            alt.Tooltip('Original ENOW Value:Q', title='Original ENOW Value', format=tooltip_format),
-            alt.Tooltip('Open ENOW Estimate:Q', title='Open ENOW Estimate', format=tooltip_format)
-        ]
-
-        base_chart = alt.Chart(results_df).encode(
-             x=alt.X('X_Value:Q', 
-                     scale=alt.Scale(type="log"), 
-                     title=f'Mean of Original and Open ENOW {x_axis_choice} (Log Scale)'),
-             y=alt.Y('Y_Value:Q', title=y_axis_choice)
+        render_chart(
+            (analysis_key, x_axis_choice),
+            error_analysis_chart, results_df, x_axis_choice, y_axis_choice, currency=x_axis_choice in ["Wages", "GDP"],
+            estimate_label=estimate_label, estimate_name=estimate_name
         )
-
-        scatter_points = base_chart.mark_circle(size=100, opacity=0.8).encode(
-            color=alt.Color('Group:N', legend=alt.Legend(title="Group")),
-            tooltip=tooltip_list
-        ).interactive()
-
-        trend_line = scatter_points.transform_regression(
-            'X_Value', 'Y_Value', groupby=['Group'], order=2
-        ).mark_line()
-
-        chart = (scatter_points + trend_line).properties(height=700)
-
-        st.altair_chart(chart, use_container_width=True)
         
         st.subheader("Summary Statistics by Group")
         
-        summary_cols = grouping_vars + ['GeoName', 'Original ENOW Value', 'Open ENOW Estimate', 'Mean Percent Difference', 'Mean Absolute Error', 'Root Mean Squared Error']
-        summary_table = results_df[summary_cols].copy()
-        
-        summary_table['Mean Percent Difference'] = summary_table['Mean Percent Difference'].map(
-            lambda x: f'{x:,.2f}%' if pd.notna(x) else 'N/A'
-        )
-        
-        value_and_error_cols = ['Original ENOW Value', 'Open ENOW Estimate', 'Mean Absolute Error', 'Root Mean Squared Error']
-        for col in value_and_error_cols:
-            if x_axis_choice in ["Wages", "GDP"]:
-                 summary_table[col] = summary_table[col].apply(lambda x: f"${x:,.0f}" if pd.notna(x) else 'N/A')
-            else:
-                 summary_table[col] = summary_table[col].apply(lambda x: f"{x:,.0f}" if pd.notna(x) else 'N/A')
+        with profile.stage("summary_table", rows_in=len(results_df)) as summary_stage:
+            summary_cols = grouping_vars + ['GeoName', 'Original ENOW Value', estimate_label, 'Mean Percent Difference', 'Mean Absolute Error', 'Root Mean Squared Error']
+            summary_table = results_df[summary_cols].copy()
+
+            summary_table['Mean Percent Difference'] = summary_table['Mean Percent Difference'].map(
+                lambda x: f'{x:,.2f}%' if pd.notna(x) else 'N/A'
+            )
+
+            value_and_error_cols = ['Original ENOW Value', estimate_label, 'Mean Absolute Error', 'Root Mean Squared Error']
+            for col in value_and_error_cols:
+                if x_axis_choice in ["Wages", "GDP"]:
+                     summary_table[col] = summary_table[col].apply(lambda x: f"${x:,.0f}" if pd.notna(x) else 'N/A')
+                else:
+                     summary_table[col] = summary_table[col].apply(lambda x: f"{x:,.0f}" if pd.notna(x) else 'N/A')
+            summary_stage.rows_out = len(summary_table)
 
-        st.dataframe(summary_table.sort_values(by=grouping_vars), use_container_width=True)
+        st.dataframe(summary_table.sort_values(by=grouping_vars, kind="stable"), use_container_width=True)
 
     else:
         st.warning("No data available for the selected filters. Please broaden your criteria.")
 
 else: # "Compare to original ENOW"
-    active_df = comparison_data
+    active_df = profile.time("load_comparison_data", load_comparison_data)
     if active_df is None:
         st.error("❌ **Data not found!** Please make sure `enow_version_comparisons.csv` is in the same directory.")
         st.stop()
+    comparison_table = profile.time("load_comparison_table", load_comparison_table)
 
     state_df = active_df[active_df['GeoScale'] == 'State']
     state_names = ["All Coastal States"] + sorted(state_df["GeoName"].dropna().unique())
@@ -882,7 +948,7 @@ else: # "Compare to original ENOW"
         selected_county = "All Coastal Counties"
         st.sidebar.selectbox("Select County:", [selected_county], disabled=True)
     else:
-        county_list = ["All Coastal Counties"] + sorted(active_df[(active_df['GeoScale'] == 'County') & (active_df['state'] == selected_state_abbr)]['GeoName'].unique())
+        county_list = ["All Coastal Counties"] + comparison_table.counties_by_state.get(selected_state_abbr, [])
         def on_county_change():
             st.session_state.compare_industry = "All Marine Industries"
         selected_county = st.sidebar.selectbox("Select County:", county_list, key='compare_county', on_change=on_county_change)
@@ -905,7 +971,7 @@ else: # "Compare to original ENOW"
 
     min_year, max_year = int(active_df["Year"].min()), int(active_df["Year"].max())
     year_range = st.sidebar.slider(
-        "Select Year Range:", min_year, max_year, (max(min_year, 2012), min(max_year, 2021)), 1
+        "Select Year Range:", min_year, max_year, default_comparison_years((min_year, max_year)), 1
     )
 
     geo_title_part = selected_state_name
@@ -920,129 +986,100 @@ else: # "Compare to original ENOW"
         econ_title_part = "the Marine Economy"
     st.title(f"{selected_display_metric} in {econ_title_part} in {geo_title_part}")
     
-    base_filtered_df = active_df[
-        (active_df["Year"] >= year_range[0]) & (active_df["Year"] <= year_range[1])
-    ].copy()
-
-    if selected_county != "All Coastal Counties":
-        base_filtered_df = base_filtered_df[
-            (base_filtered_df['GeoScale'] == 'County') & 
-            (base_filtered_df['GeoName'] == selected_county)
-        ]
-    else:
-        base_filtered_df = base_filtered_df[base_filtered_df['GeoScale'] == 'State']
-        if selected_state_name != "All Coastal States":
-            base_filtered_df = base_filtered_df[base_filtered_df['GeoName'] == selected_state_name]
-
-    if selected_industry != "All Marine Industries":
-        base_filtered_df = base_filtered_df[
-            (base_filtered_df['aggregation'] == 'Industry') &
-            (base_filtered_df['OceanIndustry'] == selected_industry)
-        ]
-    else:
-        base_filtered_df = base_filtered_df[base_filtered_df['aggregation'] == 'Sector']
-        if selected_sector != "All Marine Sectors":
-            base_filtered_df = base_filtered_df[base_filtered_df['OceanSector'] == selected_sector]
-
     y_label_map = {"GDP (nominal)": "GDP ($ millions)", "Real GDP": "Real GDP ($ millions, 2017)", "Wages (not inflation-adjusted)": "Wages ($ millions)", "Employment": "Employment (Number of Jobs)", "Establishments": "Establishments (Count)"}
     y_label = y_label_map.get(selected_display_metric, selected_display_metric)
     is_currency = selected_display_metric in ["GDP (nominal)", "Real GDP", "Wages (not inflation-adjusted)"]
-    tooltip_format = '$,.0f' if is_currency else ',.0f'
 
-    open_metric_col = f"Open_{selected_metric_internal}"
-    enow_metric_col = f"oldENOW_{selected_metric_internal}"
-    noimpute_metric_col = f"noimpute_{selected_metric_internal}"
-    
-    required_cols = ["Year", enow_metric_col, open_metric_col, noimpute_metric_col]
-    if not all(col in base_filtered_df.columns for col in required_cols):
+    comparison_key = comparison_view(
+        selected_state_name, selected_county, selected_sector, selected_industry, selected_metric_internal, year_range
+    )
+    comparison = query_view(comparison_key, comparison_key, file_signatures((COMPARISON_CSV, DORADO_CSV)), lambda: query_comparison(
+        comparison_table, selected_state_name, selected_county, selected_sector, selected_industry,
+        selected_metric_internal, year_range, state_abbr=selected_state_abbr, profile=profile
+    ))
+    profile.note(
+        state=selected_state_name, county=selected_county, sector=selected_sector, industry=selected_industry,
+        metric=selected_metric_internal, year_range=year_range
+    )
+    if comparison is None:
         st.warning("One or more data columns required for the chart are missing.")
         st.stop()
 
-    plot_df = base_filtered_df[required_cols].copy()
-    plot_df.rename(columns={
-        enow_metric_col: "Original ENOW",
-        open_metric_col: "Open ENOW Estimate",
-        noimpute_metric_col: "Public QCEW data, no imputed values"
-    }, inplace=True)
-    
-    if is_currency:
-        plot_df.iloc[:, 1:] /= 1e6
+    # Currency metrics are shown in millions of dollars
+    unit_scale = 1e6 if is_currency else 1
+    compare_df = comparison.compare_df
+    if unit_scale != 1:
+        compare_df = compare_df.assign(**{col: compare_df[col] / unit_scale for col in compare_df.columns[1:]})
 
-    compare_df = plot_df.groupby("Year").sum(min_count=1).reset_index()
-    
-    cols_to_check = ["Original ENOW", "Open ENOW Estimate", "Public QCEW data, no imputed values"]
-    for col in cols_to_check:
-        if col in compare_df.columns:
-            compare_df[col] = compare_df[col].replace({0: np.nan})
-
-    long_form_df = compare_df.melt('Year', var_name='Source', value_name='Value')
-    long_form_df.dropna(subset=['Value'], inplace=True)
+    long_form_df = comparison_long_form(compare_df)
 
     if not long_form_df.empty:
-        base = alt.Chart(long_form_df).encode(
-            x=alt.X('Year:O', title='Year'),
-            y=alt.Y('Value:Q', title=y_label, scale=alt.Scale(zero=True)),
-            color=alt.Color('Source:N',
-                            scale=alt.Scale(
-                                domain=['Original ENOW', 'Open ENOW Estimate', 'Public QCEW data, no imputed values'],
-                                range=['#D55E00', '#0072B2', '#117733']
-                            ),
-                            legend=alt.Legend(title="Data Source", orient="bottom")),
-            tooltip=[
-                alt.Tooltip('Year:O', title='Year'), alt.Tooltip('Source:N', title='Source'),
-                alt.Tooltip('Value:Q', title=selected_display_metric, format=tooltip_format)
-            ]
+        render_chart(
+            (comparison_key, selected_display_metric, is_currency),
+            comparison_chart, long_form_df, selected_display_metric, y_label, currency=is_currency
         )
-        line = base.mark_line()
-        points = base.mark_point(size=80, filled=True)
-        chart = (line + points).properties(height=500).configure_axis(labelFontSize=14, titleFontSize=16).interactive()
-        st.altair_chart(chart, use_container_width=True)
 
         st.divider()
-        csv_data_compare = convert_df_to_csv(compare_df)
-        file_name_compare = "Comparison_data.csv"
-        st.download_button(
-           label="📥 Download Comparison Data as CSV",
-           data=csv_data_compare,
-           file_name=file_name_compare,
-           mime='text/csv',
+        export_download_button(
+            "📥 Download Comparison Data", "compare_download", "Comparison_data",
+            comparison_key, lambda: compare_df,
+            normalize_key(
+                "comparison_extract", selected_state_name, selected_county, selected_sector, selected_industry,
+                year_range, selected_state_abbr
+            ),
+            lambda: comparison_extract(
+                active_df, selected_state_name, selected_county, selected_sector, selected_industry,
+                year_range, state_abbr=selected_state_abbr
+            ),
         )
         
         st.subheader("Summary Statistics")
-        valid_compare_open = compare_df.dropna(subset=["Original ENOW", "Open ENOW Estimate"])
-        if not valid_compare_open.empty:
-            mae_open = mean_absolute_error(valid_compare_open["Original ENOW"], valid_compare_open["Open ENOW Estimate"])
-            rmse_open = np.sqrt(mean_squared_error(valid_compare_open["Original ENOW"], valid_compare_open["Open ENOW Estimate"]))
-            diff_open = valid_compare_open["Open ENOW Estimate"] - valid_compare_open["Original ENOW"]
-            pct_diff_open = (100 * diff_open / valid_compare_open["Original ENOW"]).replace([np.inf, -np.inf], np.nan)
-            
-            st.markdown("##### Open ENOW Estimate (with imputed values)")
-            summary_text_open = f"""
-- **Mean Absolute Error:** {format_value(mae_open, selected_display_metric)}
-- **Root Mean Squared Error:** {format_value(rmse_open, selected_display_metric)}
-- **Mean Percent Difference:** {pct_diff_open.mean():.2f}%
-"""
-            st.markdown(summary_text_open)
-        else:
-            st.markdown("##### Open ENOW Estimate (with imputed values)")
-            st.warning("Not enough overlapping data to calculate statistics.")
-            
-        valid_compare_noimpute = compare_df.dropna(subset=["Original ENOW", "Public QCEW data, no imputed values"])
-        if not valid_compare_noimpute.empty:
-            mae_noimpute = mean_absolute_error(valid_compare_noimpute["Original ENOW"], valid_compare_noimpute["Public QCEW data, no imputed values"])
-            rmse_noimpute = np.sqrt(mean_squared_error(valid_compare_noimpute["Original ENOW"], valid_compare_noimpute["Public QCEW data, no imputed values"]))
-            diff_noimpute = valid_compare_noimpute["Public QCEW data, no imputed values"] - valid_compare_noimpute["Original ENOW"]
-            pct_diff_noimpute = (100 * diff_noimpute / valid_compare_noimpute["Original ENOW"]).replace([np.inf, -np.inf], np.nan)
-            
-            st.markdown("##### Public QCEW Estimate (no imputed values)")
-            summary_text_noimpute = f"""
-- **Mean Absolute Error:** {format_value(mae_noimpute, selected_display_metric)}
-- **Root Mean Squared Error:** {format_value(rmse_noimpute, selected_display_metric)}
-- **Mean Percent Difference:** {pct_diff_noimpute.mean():.2f}%
+        stats_headings = {
+            "Open ENOW Estimate": "##### Open ENOW Estimate (with imputed values)",
+            "Public QCEW data, no imputed values": "##### Public QCEW Estimate (no imputed values)",
+            "DORADO (unsuppressed QCEW)": "##### DORADO (unsuppressed QCEW data)",
+        }
+        for source, heading in stats_headings.items():
+            source_stats = comparison.stats.get(source)
+            # DORADO covers state-level sectors only; other selections leave it out.
+            if source_stats is None and source == "DORADO (unsuppressed QCEW)":
+                continue
+            st.markdown(heading)
+            if source_stats is None:
+                st.warning("Not enough overlapping data to calculate statistics.")
+                continue
+            summary_text = f"""
+- **Mean Absolute Error:** {format_value(source_stats["mae"] / unit_scale, selected_display_metric)}
+- **Root Mean Squared Error:** {format_value(source_stats["rmse"] / unit_scale, selected_display_metric)}
+- **Mean Percent Difference:** {source_stats["mpd"]:.2f}%
 """
-            st.markdown(summary_text_noimpute)
-        else:
-            st.markdown("##### Public QCEW Estimate (no imputed values)")
-            st.warning("Not enough overlapping data to calculate statistics.")
+            st.markdown(summary_text)
     else:
         st.warning("No overlapping data available to compare for the selected filters.")
+
+# --- Profiling panel ---
+if profile.enabled:
+    if "profile_session" not in st.session_state:
+        st.session_state.profile_session = uuid.uuid4().hex[:8]
+    profile.note(session=st.session_state.profile_session, result_cache=result_cache.stats())
+    with st.sidebar.expander("⏱️ Rerun Profile", expanded=False):
+        st.caption(f"Session {st.session_state.profile_session} · rerun took {profile.total_seconds() * 1000:,.0f} ms")
+        st.dataframe(profile.summary_frame(), hide_index=True, use_container_width=True)
+        cache_stats = result_cache.stats()
+        st.caption(
+            f"Result cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses, "
+            f"{cache_stats['entries']:,} entries ({cache_stats['bytes'] / 2**20:,.1f} of {cache_stats['max_bytes'] / 2**20:,.0f} MB)"
+        )
+        # Loads every dataset that is not loaded yet; see openenow.memory for the per-column report.
+        if st.button("Measure memory", key="profile_memory"):
+            memory_df = object_bytes({
+                "Estimates (frame, index, cube)": load_estimate_data(),
+                "Comparison data": load_comparison_data(),
+                "Compare table": load_comparison_table(),
+                "Result cache": result_cache,
+                "Export cache": get_export_cache(),
+            })
+            st.dataframe(memory_df.assign(MB=memory_df.pop("bytes") / 2**20).round(1), hide_index=True, use_container_width=True)
+            st.caption("Largest result cache entries")
+            st.dataframe(cache_entry_bytes(result_cache, top=5), hide_index=True, use_container_width=True)
+    profile.append_to_log()
@@ -0,0 +1 @@
+"""Data and query helpers behind the Open ENOW Streamlit app."""
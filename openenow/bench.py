@@ -0,0 +1,516 @@
+"""
+Headless benchmarks for the app's display modes.
+
+Runs the same query and chart code the app runs on each rerun (see
+openenow.queries and openenow.charts) over a sweep of representative widget
+combinations, at several multiples of the input data size, and writes a JSON
+report that can be diffed between releases:
+
+    python -m openenow.bench run --scales 1,10 --output bench.json
+    python -m openenow.bench compare old.json new.json
+
+The 1x dataset is openENOWinput.csv and enow_version_comparisons.csv from
+--source when they exist there, and a synthetic dataset of similar shape
+otherwise. Larger scales replicate every geography with renamed copies and
+jittered values. The 100x dataset needs several GB of disk and memory.
+
+Each case records per-phase timings (filter, aggregate, chart spec build,
+table/CSV build) and the peak memory allocated while it runs; each dataset
+records its load phases (CSV parse, columnar cache write and read, shared
+file write and map, index and cube build). The cases run on the memory-mapped
+estimates where pyarrow is installed.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from openenow.charts import comparison_chart, comparison_long_form, error_analysis_chart, estimate_chart
+from openenow.comparison_table import ComparisonTable, comparison_table_frame
+from openenow.cube import AggregateCube
+from openenow.data import (
+    COMPARISON_CSV, COMPARISON_RENAME, DORADO_CSV, OPEN_ENOW_CSV, join_dorado, load_cached_frame, load_dorado,
+    process_rss_bytes, read_comparison_csv, read_open_enow_csv
+)
+from openenow.export import export_bytes
+from openenow.index import PartitionIndex
+from openenow.queries import (
+    ALL_COUNTIES, ALL_INDUSTRIES, ALL_SECTORS, ALL_STATES, error_analysis_results, filter_error_analysis,
+    query_comparison, query_estimates
+)
+from openenow.shared import map_frame, shared_available, write_frame
+
+REPORT_VERSION = 1
+
+# Metric suffixes offered by each mode, as in the app's metric selectors.
+ESTIMATE_METRICS = ["Employment", "Wages", "RealWages", "Establishments", "GDP", "RealGDP"]
+COMPARISON_METRICS = ["Employment", "Wages", "Establishments", "GDP", "RealGDP"]
+ERROR_ANALYSIS_METRICS = ["Employment", "Wages", "GDP"]
+CURRENCY_METRICS = {"Wages", "RealWages", "GDP", "RealGDP"}
+
+# Shape of the synthetic 1x dataset, close to the published Open ENOW input.
+SYNTHETIC_STATES = 30
+SYNTHETIC_COUNTIES_PER_STATE = 14
+SYNTHETIC_REGIONS = 8
+SYNTHETIC_YEARS = range(2001, 2025)
+COMPARISON_YEARS = range(2005, 2022)
+SYNTHETIC_SECTORS = {
+    "Living Resources": ["Fishing", "Aquaculture", "Seafood Processing", "Seafood Markets"],
+    "Marine Construction": ["Marine Construction"],
+    "Marine Transportation": ["Marine Freight", "Marine Transportation Services", "Navigation Equipment", "Warehousing"],
+    "Offshore Mineral Resources": ["Oil and Gas Extraction", "Sand and Gravel", "Drilling Support"],
+    "Ship and Boat Building": ["Ship and Boat Building"],
+    "Tourism and Recreation": ["Boat Dealers", "Marinas", "Hotels", "Restaurants", "Recreation", "Zoos and Aquaria"],
+}
+
+# Raw (CSV) column names of the geography labels and metrics, per input file.
+OPEN_ENOW_NAME_COLUMNS = ["geoName", "stateName", "state"]
+OPEN_ENOW_RAW_METRICS = ["establishments", "employment", "wages", "real_wages", "gdp", "rgdp"]
+COMPARISON_NAME_COLUMNS = ["GeoName", "state"]
+
+
+# --- Synthetic data ---
+def synthetic_open_enow(seed=0):
+    """Returns a synthetic openENOWinput.csv frame (raw column names) shaped like the published file."""
+    rng = np.random.default_rng(seed)
+    econ = [(sector, None, "Sector") for sector in SYNTHETIC_SECTORS]
+    econ += [(sector, industry, "Industry") for sector, industries in SYNTHETIC_SECTORS.items() for industry in industries]
+
+    geos = []
+    for i in range(1, SYNTHETIC_STATES + 1):
+        state_name, abbr = f"Coastal State {i:02d}", f"S{i:02d}"
+        geos.append(("State", state_name, abbr, state_name, 1.0))
+        for j in range(1, SYNTHETIC_COUNTIES_PER_STATE + 1):
+            geos.append(("County", f"County {j:02d}, {abbr}", abbr, state_name, 0.1))
+    for k in range(1, SYNTHETIC_REGIONS + 1):
+        geos.append(("Region", f"Region {k}", None, None, 4.0))
+
+    keys = pd.MultiIndex.from_product(
+        [range(len(geos)), SYNTHETIC_YEARS, range(len(econ))], names=["geo", "year", "econ"]
+    ).to_frame(index=False)
+    geo_cols = pd.DataFrame(geos, columns=["geoType", "geoName", "state", "stateName", "weight"]).iloc[keys["geo"]]
+    econ_cols = pd.DataFrame(econ, columns=["enowSector", "enowIndustry", "aggregation"]).iloc[keys["econ"]]
+    df = pd.concat([geo_cols.reset_index(drop=True), econ_cols.reset_index(drop=True)], axis=1)
+    df.insert(4, "year", keys["year"].to_numpy())
+
+    n = len(df)
+    weight = df.pop("weight").to_numpy() * np.where(df["aggregation"] == "Industry", 0.3, 1.0)
+    employment = np.round(rng.lognormal(7, 1.5, n) * weight)
+    wages = employment * rng.uniform(2e4, 8e4, n)
+    df["establishments"] = np.round(employment / rng.uniform(5, 40, n))
+    df["employment"] = np.where(rng.random(n) < 0.03, np.nan, employment)
+    df["wages"] = wages
+    df["real_wages"] = wages * rng.uniform(1.0, 1.6, n)
+    latest = df["year"].to_numpy() == SYNTHETIC_YEARS[-1]
+    df["gdp"] = np.where(latest, np.nan, wages * rng.uniform(1.5, 2.5, n))
+    df["rgdp"] = df["gdp"] * rng.uniform(0.8, 1.2, n)
+    return df
+
+
+def synthetic_comparison(open_raw, seed=0):
+    """Returns a synthetic enow_version_comparisons.csv frame derived from Open ENOW rows."""
+    rng = np.random.default_rng(seed + 1)
+    rows = open_raw[(open_raw["geoType"] != "Region") & open_raw["year"].isin(COMPARISON_YEARS)]
+    df = pd.DataFrame({
+        "GeoScale": rows["geoType"].to_numpy(), "GeoName": rows["geoName"].to_numpy(),
+        "state": rows["state"].to_numpy(), "Year": rows["year"].to_numpy(),
+        "OceanSector": rows["enowSector"].to_numpy(), "OceanIndustry": rows["enowIndustry"].to_numpy(),
+        "aggregation": rows["aggregation"].to_numpy(),
+    })
+    n = len(df)
+    sources = {"establishments": "establishments", "employment": "employment", "wages": "wages", "GDP": "gdp", "RealGDP": "rgdp"}
+    for metric, source in sources.items():
+        values = rows[source].to_numpy(dtype="float64")
+        df[f"Open_{metric}"] = values
+        df[f"oldENOW_{metric}"] = np.where(rng.random(n) < 0.02, 0.0, values * rng.uniform(0.7, 1.3, n))
+        df[f"noimpute_{metric}"] = np.where(rng.random(n) < 0.2, np.nan, values * rng.uniform(0.5, 1.0, n))
+    return df
+
+
+def replicate_frame(df, factor, name_columns, metric_columns, seed=0):
+    """
+    Returns df repeated `factor` times. Copy i (from 2) renames every geography
+    label with an " (i)" suffix and scales its metrics by a random factor, so
+    each copy adds new states, counties and regions rather than duplicate rows.
+    """
+    if factor <= 1:
+        return df
+    rng = np.random.default_rng(seed + 2)
+    copies = [df]
+    for i in range(2, factor + 1):
+        copy = df.copy()
+        for col in name_columns:
+            copy[col] = copy[col].where(copy[col].isna(), copy[col].astype(str) + f" ({i})")
+        for col in metric_columns:
+            copy[col] = copy[col] * rng.uniform(0.8, 1.2, len(copy))
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def write_datasets(source_dir, out_dir, factor, seed=0):
+    """
+    Writes openENOWinput.csv and enow_version_comparisons.csv at `factor` times
+    the 1x size into out_dir, plus an unscaled copy of DORADO_combined_sectors.csv
+    if source_dir has one. Returns (paths, description of the 1x base).
+    """
+    open_source = os.path.join(source_dir, OPEN_ENOW_CSV)
+    comparison_source = os.path.join(source_dir, COMPARISON_CSV)
+    if os.path.exists(open_source):
+        open_raw = pd.read_csv(open_source)
+        base = open_source
+    else:
+        open_raw = synthetic_open_enow(seed)
+        base = "synthetic"
+    if os.path.exists(comparison_source):
+        comparison_raw = pd.read_csv(comparison_source)
+    else:
+        comparison_raw = synthetic_comparison(open_raw, seed)
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "open_enow": os.path.join(out_dir, OPEN_ENOW_CSV),
+        "comparison": os.path.join(out_dir, COMPARISON_CSV),
+    }
+    open_metrics = [col for col in OPEN_ENOW_RAW_METRICS if col in open_raw.columns]
+    replicate_frame(open_raw, factor, OPEN_ENOW_NAME_COLUMNS, open_metrics, seed).to_csv(paths["open_enow"], index=False)
+    comparison_metrics = [col for col in COMPARISON_RENAME if col in comparison_raw.columns]
+    replicate_frame(comparison_raw, factor, COMPARISON_NAME_COLUMNS, comparison_metrics, seed).to_csv(paths["comparison"], index=False)
+    # DORADO covers real states only, so the renamed copies are left without DORADO values.
+    dorado_source = os.path.join(source_dir, DORADO_CSV)
+    if os.path.exists(dorado_source):
+        paths["dorado"] = os.path.join(out_dir, DORADO_CSV)
+        shutil.copyfile(dorado_source, paths["dorado"])
+    return paths, base
+
+
+# --- Timing ---
+class PhaseTimer:
+    """Collects named phase durations for one run of a case."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def time(self, phase, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + time.perf_counter() - started
+        return result
+
+
+def measure(run, repeats):
+    """
+    Calls run(timer) `repeats` times and once more under tracemalloc.
+    Returns per-phase min/median milliseconds and the traced peak allocation in bytes.
+    """
+    samples = []
+    for _ in range(repeats):
+        timer = PhaseTimer()
+        run(timer)
+        samples.append(timer.seconds)
+
+    tracemalloc.start()
+    try:
+        run(PhaseTimer())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    phases = {}
+    for phase in samples[0]:
+        values = [sample[phase] * 1000 for sample in samples]
+        phases[phase] = {"min_ms": round(min(values), 3), "median_ms": round(statistics.median(values), 3)}
+    total = statistics.median(sum(sample.values()) * 1000 for sample in samples)
+    return {"phases": phases, "total_ms": round(total, 3), "peak_bytes": peak}
+
+
+# --- Cases ---
+def _case_id(mode, params):
+    return mode + "|" + "|".join(f"{key}={value}" for key, value in params.items())
+
+
+def estimate_cases(index):
+    """Widget combinations for the States, Counties and Regions modes."""
+    first_sector = index.sectors[0] if index.sectors else ALL_SECTORS
+    first_industry = next(iter(index.industries_by_sector.get(first_sector, [])), None)
+    for mode, scale in [("States", "State"), ("Regions", "Region"), ("Counties", "County")]:
+        geos = index.geos_by_scale.get(scale, [])
+        if not geos:
+            continue
+        if scale == "County":
+            state = next(iter(index.counties_by_state))
+            counties = index.counties_by_state[state]
+            selections = [(state, None), (state, counties[0])]
+        else:
+            selections = [(None, None), (None, geos[0])]
+        for state, geo in selections:
+            for sector in [ALL_SECTORS] + list(index.sectors):
+                for metric in ESTIMATE_METRICS:
+                    yield mode, dict(scale=scale, state=state, geo=geo, sector=sector, industry=ALL_INDUSTRIES, metric=metric)
+            if first_industry is not None:
+                yield mode, dict(scale=scale, state=state, geo=geo, sector=first_sector, industry=first_industry, metric="Employment")
+
+
+def run_estimate_case(cube, sector_names, params, timer):
+    scale, metric = params["scale"], params["metric"]
+    result = timer.time(
+        "aggregate", query_estimates, cube, scale, params["geo"], params["sector"], params["industry"],
+        metric, params["year_range"], state=params["state"]
+    )
+    if not result.chart_df.empty:
+        chart = estimate_chart(result, sector_names, scale, metric, metric, currency=metric in CURRENCY_METRICS)
+        timer.time("chart", chart.to_dict)
+    if result.table_df is not None:
+        timer.time("table", export_bytes, result.table_df, "CSV", index=True)
+
+
+def comparison_cases(df):
+    """Widget combinations for the Compare mode."""
+    state_rows = df[df["GeoScale"] == "State"]
+    state_name = state_rows["GeoName"].iloc[0]
+    state_abbr = state_rows["state"].iloc[0]
+    county_rows = df[(df["GeoScale"] == "County") & (df["state"] == state_abbr)]
+    counties = [ALL_COUNTIES] + ([county_rows["GeoName"].iloc[0]] if not county_rows.empty else [])
+    sectors = sorted(df["OceanSector"].dropna().unique())
+    industry_rows = df[(df["aggregation"] == "Industry") & (df["OceanSector"] == sectors[0])]
+    for state in [ALL_STATES, state_name]:
+        for county in counties if state != ALL_STATES else [ALL_COUNTIES]:
+            for sector in [ALL_SECTORS] + sectors:
+                for metric in COMPARISON_METRICS:
+                    yield "Compare", dict(state=state, county=county, sector=sector, industry=ALL_INDUSTRIES, metric=metric)
+            if not industry_rows.empty:
+                industry = industry_rows["OceanIndustry"].iloc[0]
+                yield "Compare", dict(state=state, county=county, sector=sectors[0], industry=industry, metric="Employment")
+
+
+def run_comparison_case(table, state_abbrs, params, timer):
+    metric = params["metric"]
+    result = timer.time(
+        "aggregate", query_comparison, table, params["state"], params["county"], params["sector"],
+        params["industry"], metric, params["year_range"], state_abbr=state_abbrs.get(params["state"])
+    )
+    compare_df = result.compare_df
+    long_form_df = comparison_long_form(compare_df)
+    if not long_form_df.empty:
+        chart = comparison_chart(long_form_df, metric, metric, currency=metric in CURRENCY_METRICS)
+        timer.time("chart", chart.to_dict)
+    timer.time("table", export_bytes, compare_df, "CSV")
+
+
+def error_analysis_cases(df):
+    """Widget combinations for the Error Analysis mode."""
+    groupings = {"State": [["OceanSector"]], "County": [["OceanSector"], ["OceanSector", "Year", "state"]]}
+    for geoscale, grouping_options in groupings.items():
+        for grouping_vars in grouping_options:
+            for metric in ERROR_ANALYSIS_METRICS:
+                for exclude_outliers in (False, True):
+                    yield "Error Analysis", dict(
+                        aggregation="Sector", geoscale=geoscale, grouping=grouping_vars,
+                        metric=metric, exclude_outliers=exclude_outliers
+                    )
+    for exclude_outliers in (False, True):
+        yield "Error Analysis", dict(
+            aggregation="Industry", geoscale="State", grouping=["OceanSector", "OceanIndustry"],
+            metric="Employment", exclude_outliers=exclude_outliers
+        )
+
+
+def run_error_analysis_case(df, params, timer):
+    metric = params["metric"]
+    filtered = timer.time("filter", filter_error_analysis, df, params["aggregation"], params["geoscale"], params["year_range"])
+    analysis = timer.time(
+        "aggregate", error_analysis_results, filtered, params["grouping"], metric,
+        exclude_outliers=params["exclude_outliers"]
+    )
+    if not analysis.results_df.empty:
+        chart = error_analysis_chart(analysis.results_df, metric, "Mean Percent Difference", currency=metric in CURRENCY_METRICS)
+        timer.time("chart", chart.to_dict)
+    timer.time("table", analysis.results_df.to_csv, index=False)
+
+
+# --- Runner ---
+def _year_range(df):
+    return int(df["Year"].min()), int(df["Year"].max())
+
+
+def benchmark_dataset(paths, repeats, log=print):
+    """Times the load phases and every case for one dataset written by write_datasets."""
+    tracemalloc.start()
+    try:
+        timer = PhaseTimer()
+        timer.time("parse_csv", read_open_enow_csv, paths["open_enow"])
+        timer.time("parse_csv", read_comparison_csv, paths["comparison"])
+        cache_dir = tempfile.mkdtemp(prefix="enow-bench-cache-")
+        try:
+            timer.time("cache_write", load_cached_frame, paths["open_enow"], read_open_enow_csv, cache_dir=cache_dir)
+            timer.time("cache_write", load_cached_frame, paths["comparison"], read_comparison_csv, cache_dir=cache_dir)
+            open_enow = timer.time("cache_read", load_cached_frame, paths["open_enow"], read_open_enow_csv, cache_dir=cache_dir)
+            comparison = timer.time("cache_read", load_cached_frame, paths["comparison"], read_comparison_csv, cache_dir=cache_dir)
+            if shared_available(cache_dir):
+                # The cases below run on the memory-mapped frame, as workers sharing the data do.
+                shared_path = os.path.join(cache_dir, "estimates.arrow")
+                timer.time("shared_write", write_frame, shared_path, open_enow)
+                open_enow = timer.time("shared_map", map_frame, shared_path)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        dorado = timer.time("parse_csv", load_dorado, paths["dorado"]) if "dorado" in paths else None
+        comparison = timer.time("dorado_join", join_dorado, comparison, dorado)
+        index = timer.time("index", PartitionIndex, open_enow)
+        cube = timer.time("cube", AggregateCube, open_enow)
+        comparison_table = timer.time("comparison_table", lambda: ComparisonTable(comparison_table_frame(comparison)))
+        load_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    load = {phase: round(seconds * 1000, 3) for phase, seconds in timer.seconds.items()}
+    log(f"  loaded {len(open_enow):,} + {len(comparison):,} rows: " + ", ".join(f"{k} {v:,.0f} ms" for k, v in load.items()))
+
+    sector_names = sorted(index.sectors)
+    estimate_years = index.year_bounds
+    comparison_years = _year_range(comparison)
+    state_rows = comparison[comparison["GeoScale"] == "State"]
+    state_abbrs = dict(zip(state_rows["GeoName"], state_rows["state"]))
+    runners = [
+        (estimate_cases(index), estimate_years, lambda params, t: run_estimate_case(cube, sector_names, params, t)),
+        (comparison_cases(comparison), comparison_years, lambda params, t: run_comparison_case(comparison_table, state_abbrs, params, t)),
+        (error_analysis_cases(comparison), comparison_years, lambda params, t: run_error_analysis_case(comparison, params, t)),
+    ]
+    cases = []
+    # Streamlit sends chart data separately and has no row limit; neither should the spec build here.
+    with alt.data_transformers.disable_max_rows():
+        for case_params, year_range, run in runners:
+            for mode, params in case_params:
+                params["year_range"] = list(year_range)
+                measured = measure(lambda t: run(params, t), repeats)
+                cases.append({"id": _case_id(mode, params), "mode": mode, "params": params, **measured})
+    log(f"  ran {len(cases)} cases")
+    return {
+        "open_enow_rows": len(open_enow),
+        "comparison_rows": len(comparison),
+        "csv_bytes": {name: os.path.getsize(path) for name, path in paths.items()},
+        "load_ms": load,
+        "load_peak_bytes": load_peak,
+        "rss_bytes": process_rss_bytes(),
+        "cases": cases,
+    }
+
+
+def _environment():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    versions = {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__}
+    for module in ("altair", "pyarrow"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {"revision": revision, "platform": platform.platform(), "cpus": os.cpu_count(), "versions": versions}
+
+
+def run_benchmarks(scales=(1,), repeats=3, source_dir=".", work_dir=None, seed=0, log=print):
+    """Runs the full sweep at each scale and returns the report as a dict."""
+    report = {
+        "report_version": REPORT_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "environment": _environment(),
+        "settings": {"scales": list(scales), "repeats": repeats, "seed": seed},
+        "datasets": [],
+    }
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="enow-bench-")
+    try:
+        for factor in scales:
+            log(f"Scale {factor}x")
+            paths, base = write_datasets(source_dir, os.path.join(work_dir, f"x{factor}"), factor, seed)
+            result = benchmark_dataset(paths, repeats, log=log)
+            report["datasets"].append({"scale": factor, "base": base, **result})
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+# --- Report comparison ---
+def compare_reports(old, new, threshold=0.1):
+    """
+    Returns text lines comparing two reports, matching datasets by scale and
+    cases by id. Changes smaller than `threshold` (a fraction) are omitted.
+    """
+    lines = []
+    old_datasets = {d["scale"]: d for d in old["datasets"]}
+    for dataset in new["datasets"]:
+        before = old_datasets.get(dataset["scale"])
+        if before is None:
+            continue
+        lines.append(f"Scale {dataset['scale']}x")
+        changes = []
+        for phase, ms in dataset["load_ms"].items():
+            if phase in before["load_ms"]:
+                changes.append((f"load: {phase}", before["load_ms"][phase], ms))
+        old_cases = {case["id"]: case for case in before["cases"]}
+        for case in dataset["cases"]:
+            if case["id"] in old_cases:
+                changes.append((case["id"], old_cases[case["id"]]["total_ms"], case["total_ms"]))
+        changes = [(name, a, b) for name, a, b in changes if a > 0 and abs(b / a - 1) >= threshold]
+        for name, a, b in sorted(changes, key=lambda change: change[2] / change[1], reverse=True):
+            lines.append(f"  {b / a:6.2f}x  {a:10.2f} ms -> {b:10.2f} ms  {name}")
+        if not changes:
+            lines.append(f"  no changes of {threshold:.0%} or more")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m openenow.bench", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark sweep and write a JSON report")
+    run_parser.add_argument("--scales", default="1", help="comma-separated data size multiples, e.g. 1,10,100")
+    run_parser.add_argument("--repeats", type=int, default=3, help="timed runs per case (default 3)")
+    run_parser.add_argument("--source", default=".", help="directory holding the 1x input CSVs, if any")
+    run_parser.add_argument("--work-dir", help="keep the generated datasets in this directory")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default="-", help="report path, or - for stdout")
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="smallest relative change shown (default 0.1)")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        print("\n".join(compare_reports(old, new, args.threshold)))
+        return 0
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    report = run_benchmarks(
+        scales, args.repeats, args.source, args.work_dir, args.seed, log=lambda msg: print(msg, file=sys.stderr)
+    )
+    text = json.dumps(report, indent=1)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
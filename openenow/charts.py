@@ -0,0 +1,312 @@
+"""
+Altair chart builders for the app's display modes.
+
+Each function turns a query result (see openenow.queries) plus display labels
+into an Altair chart. They do not call Streamlit, so chart construction can be
+timed and tested on its own.
+
+chart_spec serializes a chart once into a ChartSpec: the Vega-Lite JSON with
+its data stored as named Arrow datasets (JSON rows where pyarrow is not
+installed). The app caches ChartSpecs per selection and hands them to
+st.vega_lite_chart, so a rerun that does not change the selection neither
+rebuilds nor re-validates the chart.
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+
+import altair as alt
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # Datasets are stored as JSON rows instead.
+    pa = None
+
+COMPARISON_COLORS = {
+    "Original ENOW": "#D55E00",
+    "Open ENOW Estimate": "#0072B2",
+    "Public QCEW data, no imputed values": "#117733",
+    "DORADO (unsuppressed QCEW)": "#CC79A7",
+}
+# Sources left out of the legend when the selection has no values for them.
+OPTIONAL_COMPARISON_SOURCES = {"DORADO (unsuppressed QCEW)"}
+OTHER_CONTRIBUTION_COLOR = "#A5AAAF"
+DEFAULT_BAR_COLOR = "#808080"
+# Vega's tableau20 scheme, used when more colors are needed than the base palette holds.
+TABLEAU20 = [
+    "#4c78a8", "#9ecae9", "#f58518", "#ffbf79", "#54a24b", "#88d27a", "#b79a20",
+    "#f2cf5b", "#439894", "#83bcb6", "#e45756", "#ff9d98", "#79706e", "#bab0ac",
+    "#d67195", "#fcbfd2", "#b279a2", "#d6a5c9", "#9e765f", "#d8b5a5"
+]
+
+
+def get_sector_colors(n):
+    """Provides a list of distinct, colorblind-friendly colors."""
+    base_colors = [
+        "#332288", "#117733", "#44AA99", "#88CCEE", "#DDCC77",
+        "#CC6677", "#AA4499", "#882255", "#E69F00", "#56B4E9",
+        "#009E73", "#F0E442"
+    ]
+    if n <= len(base_colors):
+        return base_colors[:n]
+    return [TABLEAU20[i % len(TABLEAU20)] for i in range(n)]
+
+
+def estimate_chart(result, sector_names, scale, metric_label, y_label, currency=False, bar_color=DEFAULT_BAR_COLOR):
+    """
+    Builds the stacked or single bar chart for an EstimateResult.
+
+    sector_names fixes the sector color order of the stacked-by-sector chart;
+    currency values are drawn in millions of dollars.
+    """
+    plot_df = result.chart_df
+    if currency:
+        plot_df = plot_df.assign(Estimate_value=plot_df["Estimate_value"] / 1e6)
+    tooltip_format = '$,.0f' if currency else ',.0f'
+    x = alt.X('Year:O', title='Year')
+    y = alt.Y('Estimate_value:Q', title=y_label, stack='zero', axis=alt.Axis(tickCount=8))
+    value_tooltip = alt.Tooltip('Estimate_value:Q', title=metric_label, format=tooltip_format)
+
+    if result.chart_kind == "by_sector":
+        colors_list = get_sector_colors(len(sector_names))
+        chart = alt.Chart(plot_df).mark_bar().encode(
+            x=x, y=y,
+            color=alt.Color('OceanSector:N', scale=alt.Scale(domain=sector_names, range=colors_list), legend=alt.Legend(title="Sectors")),
+            tooltip=[alt.Tooltip('Year:O', title='Year'), alt.Tooltip('OceanSector:N', title='Sector'), value_tooltip]
+        ).properties(height=600).configure_axis(labelFontSize=14, titleFontSize=16).configure_legend(symbolLimit=len(sector_names))
+    elif result.chart_kind == "by_geo":
+        other_geo_text = result.other_label
+        unique_contributors = sorted([c for c in plot_df['GeoContribution'].unique() if c != other_geo_text])
+        sort_order = unique_contributors + [other_geo_text]
+        color_range = get_sector_colors(len(unique_contributors)) + [OTHER_CONTRIBUTION_COLOR]
+        chart = alt.Chart(plot_df).mark_bar().encode(
+            x=x, y=y,
+            color=alt.Color('GeoContribution:N', legend=alt.Legend(title=f"{scale} Contribution", orient="right"), sort=sort_order, scale=alt.Scale(domain=sort_order, range=color_range)),
+            tooltip=[alt.Tooltip('Year:O', title='Year'), alt.Tooltip('GeoContribution:N', title='Contribution'), value_tooltip]
+        ).properties(height=600).configure_axis(labelFontSize=14, titleFontSize=16).configure_legend(symbolLimit=31)
+    else:  # One bar per year for a single sector or industry
+        chart = alt.Chart(plot_df).mark_bar(color=bar_color).encode(
+            x=x, y=y,
+            tooltip=[alt.Tooltip('Year:O', title='Year'), value_tooltip]
+        ).properties(height=600).configure_axis(labelFontSize=14, titleFontSize=16)
+    return chart
+
+
+def comparison_long_form(compare_df):
+    """Melts a ComparisonResult.compare_df into Year/Source/Value rows, dropping missing values."""
+    long_form_df = compare_df.melt('Year', var_name='Source', value_name='Value')
+    return long_form_df.dropna(subset=['Value'])
+
+
+def comparison_chart(long_form_df, metric_label, y_label, currency=False):
+    """Builds the line chart comparing the data sources year by year."""
+    tooltip_format = '$,.0f' if currency else ',.0f'
+    present = set(long_form_df['Source'])
+    sources = [source for source in COMPARISON_COLORS if source not in OPTIONAL_COMPARISON_SOURCES or source in present]
+    base = alt.Chart(long_form_df).encode(
+        x=alt.X('Year:O', title='Year'),
+        y=alt.Y('Value:Q', title=y_label, scale=alt.Scale(zero=True)),
+        color=alt.Color('Source:N',
+                        scale=alt.Scale(
+                            domain=sources,
+                            range=[COMPARISON_COLORS[source] for source in sources]
+                        ),
+                        legend=alt.Legend(title="Data Source", orient="bottom")),
+        tooltip=[
+            alt.Tooltip('Year:O', title='Year'), alt.Tooltip('Source:N', title='Source'),
+            alt.Tooltip('Value:Q', title=metric_label, format=tooltip_format)
+        ]
+    )
+    line = base.mark_line()
+    points = base.mark_point(size=80, filled=True)
+    return (line + points).properties(height=500).configure_axis(labelFontSize=14, titleFontSize=16).interactive()
+
+
+GEO_COMPARISON_LAYOUTS = ("Side by Side", "Small Multiples")
+
+
+def geo_comparison_chart(chart_df, metric_label, y_label, layout="Side by Side", currency=False):
+    """
+    Builds the line chart of a GeoComparisonResult: every geography and sector
+    on one chart (color by geography, dash by sector), or with layout "Small
+    Multiples" one panel per geography colored by sector. Currency values are
+    drawn in millions of dollars.
+    """
+    geos = list(chart_df['Geography'].cat.categories)
+    sectors = list(chart_df['Sector'].cat.categories)
+    plot_df = chart_df.astype({'Geography': str, 'Sector': str})
+    if currency:
+        plot_df = plot_df.assign(Estimate_value=plot_df["Estimate_value"] / 1e6)
+    tooltip_format = '$,.0f' if currency else ',.0f'
+    x = alt.X('Year:O', title='Year')
+    y = alt.Y('Estimate_value:Q', title=y_label, scale=alt.Scale(zero=True))
+    tooltip = [
+        alt.Tooltip('Geography:N', title='Geography'), alt.Tooltip('Sector:N', title='Sector'),
+        alt.Tooltip('Year:O', title='Year'), alt.Tooltip('Estimate_value:Q', title=metric_label, format=tooltip_format)
+    ]
+    geo_color = alt.Color('Geography:N', scale=alt.Scale(domain=geos, range=get_sector_colors(len(geos))),
+                          legend=alt.Legend(title="Geography", orient="bottom"))
+    sector_color = alt.Color('Sector:N', scale=alt.Scale(domain=sectors, range=get_sector_colors(len(sectors))),
+                             legend=alt.Legend(title="Sector", orient="bottom"))
+
+    if layout == "Small Multiples":
+        base = alt.Chart(plot_df).encode(x=x, y=y, color=sector_color, tooltip=tooltip)
+        chart = (base.mark_line() + base.mark_point(size=50, filled=True)).properties(width=260, height=220).facet(
+            facet=alt.Facet('Geography:N', sort=geos, title=None), columns=3
+        )
+    else:
+        base = alt.Chart(plot_df).encode(
+            x=x, y=y, color=geo_color, tooltip=tooltip,
+            strokeDash=alt.StrokeDash('Sector:N', sort=sectors, legend=alt.Legend(title="Sector", orient="bottom"))
+        )
+        chart = (base.mark_line() + base.mark_point(size=60, filled=True)).properties(height=500)
+    return chart.configure_axis(labelFontSize=14, titleFontSize=16)
+
+
+# ColorBrewer Blues, light to dark.
+MAP_COLORS = ["#EFF3FF", "#C6DBEF", "#9ECAE1", "#6BAED6", "#4292C6", "#2171B5", "#084594"]
+NO_DATA_COLOR = "#E0E0E0"
+
+
+def county_map_chart(values_df, topology_url, object_name, metric_label, y_label, year_range, currency=False,
+                     selected_fips=None):
+    """
+    Builds the choropleth of a query_county_map result over the county
+    topology at topology_url. The data holds every year of year_range and a
+    slider bound to the year picks the one drawn, so scrubbing recolors the
+    counties in the browser without refetching the geometry or rerunning the
+    app. Colors are septiles of all the years' values, so a color means the
+    same in every year; counties without data are grey. selected_fips is
+    outlined. Currency values are drawn in millions of dollars.
+    """
+    plot_df = values_df
+    if currency:
+        plot_df = plot_df.assign(Estimate_value=plot_df["Estimate_value"] / 1e6)
+    tooltip_format = '$,.0f' if currency else ',.0f'
+    positive = plot_df.loc[plot_df["Estimate_value"] > 0, "Estimate_value"].to_numpy()
+    thresholds = [0.0]
+    if len(positive):
+        thresholds = sorted(set(np.quantile(positive, np.linspace(0, 1, len(MAP_COLORS) + 1)[1:-1]).tolist()))
+    colors = [MAP_COLORS[i] for i in np.linspace(0, len(MAP_COLORS) - 1, len(thresholds) + 1).round().astype(int)]
+
+    year = alt.param(
+        name="year", value=int(year_range[1]),
+        bind=alt.binding_range(min=int(year_range[0]), max=int(year_range[1]), step=1, name="Year ")
+    )
+    counties = alt.topo_feature(topology_url, object_name)
+    background = alt.Chart(counties).mark_geoshape(fill=NO_DATA_COLOR, stroke="white", strokeWidth=0.3).encode(
+        tooltip=[alt.Tooltip('properties.name:N', title='County')]
+    )
+    values = alt.Chart(plot_df).transform_filter(alt.datum.Year == year).transform_lookup(
+        lookup='FIPS', from_=alt.LookupData(counties, key='id'), as_='geo'
+    )
+    filled = values.mark_geoshape(stroke="white", strokeWidth=0.3).encode(
+        shape='geo:G',
+        color=alt.Color('Estimate_value:Q', scale=alt.Scale(type='threshold', domain=thresholds, range=colors),
+                        legend=alt.Legend(title=y_label, format=tooltip_format, orient="bottom")),
+        tooltip=[
+            alt.Tooltip('County:N', title='County'), alt.Tooltip('Year:O', title='Year'),
+            alt.Tooltip('Estimate_value:Q', title=metric_label, format=tooltip_format)
+        ]
+    ).add_params(year)
+    layers = [background, filled]
+    if selected_fips is not None:
+        layers.append(alt.Chart(counties).transform_filter(alt.datum.id == selected_fips).mark_geoshape(
+            fillOpacity=0, stroke="black", strokeWidth=1.5
+        ))
+    return alt.layer(*layers).project(type='albersUsa').properties(height=600)
+
+
+def error_analysis_chart(results_df, x_metric_label, y_axis, currency=False, estimate_label="Open ENOW Estimate",
+                         estimate_name="Open ENOW"):
+    """
+    Builds the Error Analysis scatter plot with a quadratic trend line per group.
+    estimate_label is the results_df column of the series compared with original
+    ENOW and estimate_name its short name for the axis title.
+    """
+    tooltip_format = '$,.0f' if currency else ',.0f'
+    tooltip_list = [
+        alt.Tooltip('Group:N', title='Group'),
+        alt.Tooltip('GeoName:N', title='Geography'),
+        alt.Tooltip('X_Value:Q', title=f'Mean {x_metric_label}', format=',.0f'),
+        alt.Tooltip('Y_Value:Q', title=y_axis, format='.2f'),
+        alt.Tooltip('Original ENOW Value:Q', title='Original ENOW Value', format=tooltip_format),
+        alt.Tooltip(f'{estimate_label}:Q', title=estimate_label, format=tooltip_format)
+    ]
+
+    base_chart = alt.Chart(results_df).encode(
+         x=alt.X('X_Value:Q',
+                 scale=alt.Scale(type="log"),
+                 title=f'Mean of Original and {estimate_name} {x_metric_label} (Log Scale)'),
+         y=alt.Y('Y_Value:Q', title=y_axis)
+    )
+
+    scatter_points = base_chart.mark_circle(size=100, opacity=0.8).encode(
+        color=alt.Color('Group:N', legend=alt.Legend(title="Group")),
+        tooltip=tooltip_list
+    ).interactive()
+
+    trend_line = scatter_points.transform_regression(
+        'X_Value', 'Y_Value', groupby=['Group'], order=2
+    ).mark_line()
+
+    return (scatter_points + trend_line).properties(height=700)
+
+
+# --- Serialized specs ---
+@dataclass(frozen=True)
+class ChartSpec:
+    """A chart's Vega-Lite spec as JSON text, with its data as Arrow IPC bytes (or JSON rows) keyed by dataset name."""
+    spec_json: str
+    datasets: dict
+
+    def to_dict(self):
+        """Returns a fresh spec dict for st.vega_lite_chart, which takes the datasets out of it."""
+        spec = json.loads(self.spec_json)
+        spec["datasets"] = dict(self.datasets)
+        return spec
+
+
+def _to_named_arrow_dataset(data, datasets):
+    """Altair data transformer that stores a DataFrame as Arrow bytes (or JSON rows) under a content-hash name."""
+    if pa is None:
+        values = alt.to_values(data)["values"]
+        name = f"data-{hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()[:16]}"
+        datasets[name] = values
+        return {"name": name}
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    payload = sink.getvalue().to_pybytes()
+    name = f"data-{hashlib.sha256(payload).hexdigest()[:16]}"
+    datasets[name] = payload
+    return {"name": name}
+
+
+alt.data_transformers.register("openenow_arrow", _to_named_arrow_dataset)
+# Altair's theme and data transformer are process-wide settings.
+_SPEC_LOCK = threading.Lock()
+
+
+def chart_spec(chart):
+    """
+    Serializes an Altair chart into a ChartSpec. Like st.altair_chart, the
+    chart is converted without Altair's default theme, whose fixed view size
+    would override the container width.
+    """
+    datasets = {}
+    themes = alt.theme if hasattr(alt, "theme") else alt.themes
+    with _SPEC_LOCK:
+        previous_theme = themes.active
+        themes.enable("none")
+        try:
+            with alt.data_transformers.enable("openenow_arrow", datasets=datasets):
+                spec = chart.to_dict()
+        finally:
+            themes.enable(previous_theme)
+    # Datasets the chart already carries inline (e.g. alt.InlineData) are kept as they are.
+    datasets = {**spec.pop("datasets", {}), **datasets}
+    return ChartSpec(spec_json=json.dumps(spec), datasets=datasets)
@@ -0,0 +1,197 @@
+"""
+Precomputed yearly totals and error terms for "Compare to original ENOW".
+
+Every Compare view is a per-year sum of each data source over one geography
+and sector or industry, followed by MAE, RMSE and mean percent difference of
+the Open ENOW and no-imputation series against original ENOW. The table
+holds those yearly totals for every selection the page offers, together with
+each year's absolute, squared and percent error, so the statistics for any
+year window are sums over a few rows. It is built offline from
+enow_version_comparisons.csv, with the DORADO state and sector values joined
+on (see openenow.data.join_dorado), and kept in the columnar cache:
+
+    python -m openenow.comparison_table      # build or refresh the stored table
+"""
+import argparse
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+
+from openenow.cube import WILDCARD, row_slices
+from openenow.data import (
+    COMPARISON_CSV, COMPARISON_METRICS, DORADO_CSV, downcast_exact, join_dorado, load_cached_frame, load_dorado,
+    read_comparison_csv
+)
+from openenow.index import KEY_LEVELS
+from openenow.metrics import masked_mean
+
+REFERENCE = "oldENOW"
+COMPARISON_SOURCES = {
+    REFERENCE: "Original ENOW",
+    "Open": "Open ENOW Estimate",
+    "noimpute": "Public QCEW data, no imputed values",
+    # State and sector level only; NaN for counties and industries.
+    "DORADO": "DORADO (unsuppressed QCEW)",
+}
+# Per-year error of each source against the reference, stored as "{prefix}_{metric}_{term}".
+ERROR_TERMS = ("abs_error", "sq_error", "pct_error")
+
+
+def comparison_columns(metric):
+    """Maps each source's column for `metric` to its COMPARISON_SOURCES label."""
+    return {f"{prefix}_{metric}": label for prefix, label in COMPARISON_SOURCES.items()}
+
+
+def table_metrics(df):
+    """Returns the metrics for which df has a column from every source."""
+    metrics = dict.fromkeys(col.split("_", 1)[1] for col in COMPARISON_METRICS)
+    return [metric for metric in metrics if all(col in df.columns for col in comparison_columns(metric))]
+
+
+def comparison_table_frame(df):
+    """
+    Returns the yearly source totals and error terms for every comparison key.
+
+    Keys follow openenow.index: state is the state abbreviation of county rows
+    (county names repeat across states) and None otherwise; geo "*" sums every
+    state and econ "*" every sector. Zero totals are treated as missing, and
+    the error terms are NaN wherever either total is.
+
+    Key columns are categoricals and error terms float32, since they are only
+    ever averaged for display; totals are float32 only where that is exact.
+    """
+    metrics = table_metrics(df)
+    value_cols = [col for metric in metrics for col in comparison_columns(metric)]
+    is_county = (df["GeoScale"] == "County").to_numpy()
+    is_industry = (df["aggregation"] == "Industry").to_numpy()
+    base = pd.DataFrame({
+        "scale": df["GeoScale"].astype(object).to_numpy(),
+        "aggregation": df["aggregation"].astype(object).to_numpy(),
+        "state": np.where(is_county, df["state"].astype(object), None),
+        "geo": df["GeoName"].astype(object).to_numpy(),
+        "econ": np.where(is_industry, df["OceanIndustry"].astype(object), df["OceanSector"].astype(object)),
+        "Year": df["Year"].to_numpy(),
+    })
+    for col in value_cols:
+        base[col] = df[col].to_numpy(dtype="float64")
+    base = base[base["scale"].isin(["State", "County"]) & base["aggregation"].isin(["Sector", "Industry"])]
+
+    def total(frame, by):
+        return frame.groupby(by + ["Year"], dropna=False, sort=False)[value_cols].sum(min_count=1).reset_index()
+
+    leaf = total(base, KEY_LEVELS)
+    all_sectors = total(leaf[leaf["aggregation"] == "Sector"], ["scale", "aggregation", "state", "geo"]).assign(econ=WILDCARD)
+    states = pd.concat([leaf, all_sectors], ignore_index=True)
+    all_states = total(states[states["scale"] == "State"], ["scale", "aggregation", "econ"]).assign(geo=WILDCARD)
+    table = pd.concat([leaf, all_sectors, all_states], ignore_index=True)[KEY_LEVELS + ["Year"] + value_cols]
+    table[value_cols] = table[value_cols].replace({0: np.nan})
+
+    for metric in metrics:
+        reference = table[f"{REFERENCE}_{metric}"]
+        for prefix in COMPARISON_SOURCES:
+            if prefix == REFERENCE:
+                continue
+            residual = table[f"{prefix}_{metric}"] - reference
+            terms = {"abs_error": residual.abs(), "sq_error": residual ** 2, "pct_error": 100 * residual / reference}
+            for term in ERROR_TERMS:
+                table[f"{prefix}_{metric}_{term}"] = terms[term].astype("float32")
+    downcast_exact(table, value_cols)
+    table = table.sort_values(KEY_LEVELS + ["Year"], kind="stable", ignore_index=True)
+    table[KEY_LEVELS] = table[KEY_LEVELS].astype("category")
+    return table
+
+
+def read_comparison_table(path=COMPARISON_CSV, dorado_path=DORADO_CSV):
+    """
+    Builds the comparison table from enow_version_comparisons.csv and
+    DORADO_combined_sectors.csv; the builder for load_cached_frame.
+    """
+    return comparison_table_frame(join_dorado(read_comparison_csv(path), load_dorado(dorado_path)))
+
+
+def load_comparison_table_frame(path=COMPARISON_CSV, cache_dir=None):
+    """
+    Returns the stored comparison table for path and DORADO_CSV, building and
+    storing it first if it is missing or either file has changed.
+    """
+    return load_cached_frame(
+        path, read_comparison_table, cache_dir=cache_dir, name="comparison_table", depends_on=(DORADO_CSV,)
+    )
+
+
+class ComparisonTable:
+    """
+    Per-year source totals and error terms for every (GeoScale, aggregation,
+    state, geo, econ) key of the Compare mode, as built by comparison_table_frame.
+
+    None as geo or econ stands for every value at that level, as in
+    openenow.cube.AggregateCube.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.metrics = table_metrics(frame)
+        self.slices = row_slices(frame, KEY_LEVELS, skip_missing=("scale", "aggregation", "geo", "econ"))
+        self.years = frame["Year"].to_numpy()
+        counties = frame.loc[frame["scale"] == "County", ["state", "geo"]].drop_duplicates()
+        self.counties_by_state = {
+            state: sorted(group["geo"]) for state, group in counties.groupby("state", sort=True, observed=True)
+        }
+
+    def _rows(self, scale, aggregation, geo, econ, state, year_range):
+        """Returns the (start, stop) row range of one key's years within year_range; each key's rows are in year order."""
+        start, stop = self.slices.get((scale, aggregation, state, geo, econ), (0, 0))
+        if year_range is not None and stop > start:
+            years = self.years[start:stop]
+            start, stop = start + np.searchsorted(years, year_range[0]), start + np.searchsorted(years, year_range[1], "right")
+        return start, stop
+
+    def totals(self, scale, aggregation, metric, geo=None, econ=None, state=None, year_range=None):
+        """Returns a Year column and one float64 column of yearly totals per COMPARISON_SOURCES label."""
+        columns = comparison_columns(metric)
+        start, stop = self._rows(scale, aggregation, geo, econ, state, year_range)
+        block = self.frame.iloc[start:stop][["Year", *columns]].astype(dict.fromkeys(columns, "float64"))
+        return block.rename(columns=columns).reset_index(drop=True)
+
+    def statistics(self, scale, aggregation, metric, geo=None, econ=None, state=None, year_range=None):
+        """
+        Returns, for each non-reference source label, a dict of MAE, RMSE and
+        MPD against original ENOW over the years where both totals are present,
+        or None when there are no such years. Zero totals are already missing,
+        so these match openenow.metrics on the yearly totals.
+        """
+        start, stop = self._rows(scale, aggregation, geo, econ, state, year_range)
+        stats = {}
+        for prefix, label in COMPARISON_SOURCES.items():
+            if prefix == REFERENCE:
+                continue
+            terms = {term: self.frame[f"{prefix}_{metric}_{term}"].to_numpy()[start:stop] for term in ERROR_TERMS}
+            present = ~np.isnan(terms["abs_error"])
+            if not present.any():
+                stats[label] = None
+                continue
+            stats[label] = {
+                "mae": masked_mean(terms["abs_error"], present),
+                "rmse": float(np.sqrt(masked_mean(terms["sq_error"], present))),
+                "mpd": masked_mean(terms["pct_error"], present),
+            }
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m openenow.comparison_table", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", default=COMPARISON_CSV, help="path of enow_version_comparisons.csv")
+    parser.add_argument("--cache-dir", default=None, help="columnar cache directory (default: OPENENOW_CACHE_DIR)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    frame = load_comparison_table_frame(args.source, cache_dir=args.cache_dir)
+    table = ComparisonTable(frame)
+    print(f"Comparison table: {len(frame):,} rows, {len(table.slices):,} selections, metrics {', '.join(table.metrics)}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Aggregate cube over the Open ENOW estimates.
+
+Every chart in the estimate modes is a per-year sum over one partition of the
+data (see openenow.index). The cube materializes those sums once at load time
+for every partition key, along with the per-sector breakdown drawn by the
+stacked chart. Building a chart then reads a few dozen rows instead of
+aggregating row-level data, whatever the size of the underlying dataset.
+
+The top-N geography split drawn by the "All Coastal States" and "All
+Regions" views, and each state's or region's share and rank, read a
+year-by-geography matrix per (scale, sector or industry, metric), also built
+at load time: selecting the N largest entries of each row is one partial
+sort (np.partition) over the matrix, summing the rest one masked row sum,
+and share and rank one comparison against the selected column, with no
+grouping at request time.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from openenow.data import OPEN_ENOW_METRICS, downcast_exact
+from openenow.index import KEY_LEVELS, WILDCARD_LEVELS, none_if_missing, partition_keys
+
+# Marks a key level that was summed over, e.g. geo for "All Coastal States".
+WILDCARD = "*"
+# Default number of geographies named in the top-contributor split.
+TOP_CONTRIBUTORS = 3
+TOP_CONTRIBUTOR_SCALES = ("State", "Region")
+
+
+def row_slices(frame, by, skip_missing=()):
+    """Maps each group of a frame sorted by `by` to its (start, stop) row range."""
+    slices = {}
+    for key, positions in frame.groupby(by, dropna=False, sort=False, observed=True).indices.items():
+        key = key if isinstance(key, tuple) else (key,)
+        if any(pd.isna(value) for level, value in zip(by, key) if level in skip_missing):
+            continue
+        key = tuple(None if value == WILDCARD else none_if_missing(value) for value in key)
+        slices[key] = (positions[0], positions[-1] + 1)
+    return slices
+
+
+def top_mask(values, n):
+    """
+    Returns a mask of the n largest non-NaN entries in each row of a 2-D
+    array. Ties at the cut go to the leftmost columns, as rank(method='first')
+    over the columns in order would.
+    """
+    present = ~np.isnan(values)
+    n = min(n, values.shape[1])
+    if n <= 0:
+        return np.zeros(values.shape, dtype=bool)
+    filled = np.where(present, values, -np.inf)
+    cut = -np.partition(-filled, n - 1, axis=1)[:, n - 1:n]
+    above = filled > cut
+    tied = present & (filled == cut)
+    room = n - above.sum(axis=1, keepdims=True)
+    return above | (tied & (np.cumsum(tied, axis=1) <= room))
+
+
+@dataclass(frozen=True)
+class GeoMatrix:
+    """
+    Yearly totals of every geography at one scale for one sector or industry
+    (or all sectors): values[metric] has a row per year and a column per geo,
+    NaN where a geography has no value that year. Geos are in alphabetical
+    order; values keep the dtype of the cube's totals.
+    """
+    years: np.ndarray
+    geos: np.ndarray
+    values: dict
+
+    def _block(self, metric, year_range):
+        start, stop = 0, len(self.years)
+        if year_range is not None:
+            start, stop = np.searchsorted(self.years, year_range[0]), np.searchsorted(self.years, year_range[1], "right")
+        return self.years[start:stop], self.values[metric][start:stop].astype("float64")
+
+    def split(self, metric, other_label, year_range=None, n=TOP_CONTRIBUTORS, stable=False):
+        """
+        Returns Year, GeoContribution and Estimate_value rows giving the n
+        largest geographies of each year and the sum of the rest as
+        other_label. stable=True names the same n geographies in every year:
+        the largest over the whole year range.
+        """
+        years, values = self._block(metric, year_range)
+        present = ~np.isnan(values)
+        if stable:
+            range_totals = np.where(present.any(axis=0), np.nansum(values, axis=0), np.nan)
+            top = top_mask(range_totals[np.newaxis, :], n) & present
+        else:
+            top = top_mask(values, n)
+        rows, cols = np.nonzero(top)
+        rest = present & ~top
+        has_rest = rest.any(axis=1)
+        split = pd.DataFrame({
+            "Year": np.concatenate([years[rows], years[has_rest]]),
+            "GeoContribution": np.concatenate([self.geos[cols], np.full(has_rest.sum(), other_label, dtype=object)]),
+            "Estimate_value": np.concatenate([values[rows, cols], np.where(rest, values, 0).sum(axis=1)[has_rest]]),
+        })
+        return split.sort_values(["Year", "GeoContribution"], kind="stable", ignore_index=True)
+
+    def standing(self, metric, geo, year_range=None):
+        """
+        Returns Year, Share (percent of the total over every geography), Rank
+        (1 for the largest; ties share the better rank) and Peers (geographies
+        with a value) for each year in which geo has a value.
+        """
+        column = np.searchsorted(self.geos, geo)
+        if column == len(self.geos) or self.geos[column] != geo:
+            return pd.DataFrame({"Year": [], "Share": [], "Rank": [], "Peers": []})
+        years, values = self._block(metric, year_range)
+        own = values[:, column]
+        has_value = ~np.isnan(own)
+        standing = pd.DataFrame({
+            "Year": years,
+            "Share": 100 * own / np.nansum(values, axis=1),
+            "Rank": 1 + (values > own[:, np.newaxis]).sum(axis=1),
+            "Peers": (~np.isnan(values)).sum(axis=1),
+        })
+        return standing[has_value].reset_index(drop=True)
+
+
+def geo_matrices(totals, metrics):
+    """
+    Builds the GeoMatrix of every (scale, aggregation, econ) of the
+    TOP_CONTRIBUTOR_SCALES from sorted cube totals; econ None stands for all
+    sectors (or industries), as in the partition keys.
+    """
+    rows = totals[
+        totals["scale"].isin(TOP_CONTRIBUTOR_SCALES) & totals["state"].isna() & (totals["geo"] != WILDCARD)
+        & totals["econ"].notna()
+    ]
+    matrices = {}
+    for (scale, aggregation, econ), group in rows.groupby(["scale", "aggregation", "econ"], sort=False, observed=True):
+        years, year_pos = np.unique(group["Year"].to_numpy(), return_inverse=True)
+        geos, geo_pos = np.unique(group["geo"].astype(object).to_numpy(), return_inverse=True)
+        values = {}
+        for metric in metrics:
+            column = group[metric].to_numpy()
+            matrix = np.full((len(years), len(geos)), np.nan, dtype=column.dtype)
+            matrix[year_pos, geo_pos] = column
+            values[metric] = matrix
+        matrices[(scale, aggregation, None if econ == WILDCARD else econ)] = GeoMatrix(years, geos, values)
+    return matrices
+
+
+def _in_years(frame, year_range):
+    if year_range is None:
+        return frame
+    years = frame["Year"]
+    return frame[(years >= year_range[0]) & (years <= year_range[1])]
+
+
+class AggregateCube:
+    """
+    Per-year metric totals for every (GeoScale, aggregation, state, geo, econ)
+    partition key, with the same key conventions as PartitionIndex.
+
+    Totals are NaN where every contributing value is missing, so callers can
+    tell "no data" from zero. The stored keys are categoricals and the totals
+    float32 where that is exact; series and breakdown return float64 totals.
+    """
+
+    def __init__(self, df, metrics=None):
+        self.metrics = [col for col in (metrics or OPEN_ENOW_METRICS) if col in df.columns]
+        self._set_tables(self._aggregate(df))
+
+    def _aggregate(self, df):
+        """Returns the unsorted totals for the years in df."""
+        base = partition_keys(df)
+        base["Year"] = df["Year"].to_numpy()
+        for col in self.metrics:
+            base[col] = df[col].to_numpy(dtype="float64")
+
+        leaf = base.groupby(KEY_LEVELS + ["Year"], dropna=False, sort=False)[self.metrics].sum(min_count=1).reset_index()
+        parts = [leaf]
+        for wildcard in WILDCARD_LEVELS[1:]:
+            by = [level for level in KEY_LEVELS if level not in wildcard]
+            part = leaf.groupby(by + ["Year"], dropna=False, sort=False)[self.metrics].sum(min_count=1).reset_index()
+            for level in wildcard:
+                part[level] = WILDCARD
+            parts.append(part)
+        return pd.concat(parts, ignore_index=True)[KEY_LEVELS + ["Year"] + self.metrics]
+
+    def _set_tables(self, totals):
+        totals = totals.sort_values(KEY_LEVELS + ["Year"], kind="stable", ignore_index=True)
+        totals[KEY_LEVELS] = totals[KEY_LEVELS].astype("category")
+        self.totals = downcast_exact(totals, self.metrics)
+        self.total_slices = row_slices(self.totals, KEY_LEVELS, skip_missing=("scale", "aggregation", "geo", "econ"))
+        self.breakdown_slices = row_slices(self.totals, KEY_LEVELS[:-1], skip_missing=("scale", "aggregation", "geo"))
+        self.geo_matrices = geo_matrices(self.totals, self.metrics)
+
+    def replace_years(self, df):
+        """
+        Returns a new cube in which every year present in df is aggregated from
+        df's rows, which must be complete for those years, and every other year
+        is taken over from this cube. Every total is a sum within one year, so
+        the result equals a cube built from the merged rows.
+        """
+        years = df["Year"].unique()
+        cube = object.__new__(AggregateCube)
+        cube.metrics = self.metrics
+        cube._set_tables(pd.concat([self.totals[~self.totals["Year"].isin(years)], self._aggregate(df)], ignore_index=True))
+        return cube
+
+    def series(self, scale, aggregation, geo=None, econ=None, state=None, year_range=None):
+        """Returns the per-year totals for one partition key: a Year column plus one column per metric."""
+        start, stop = self.total_slices.get((scale, aggregation, state, geo, econ), (0, 0))
+        block = _in_years(self.totals.iloc[start:stop], year_range)[["Year"] + self.metrics]
+        return block.astype(dict.fromkeys(self.metrics, "float64")).reset_index(drop=True)
+
+    def series_many(self, keys, year_range=None):
+        """
+        Returns the per-year totals of several partition keys from one gather
+        over the stored totals: a "key" column with each row's position in
+        keys, Year and one float64 column per metric. Keys are (scale,
+        aggregation, state, geo, econ) tuples; unknown keys give no rows.
+        """
+        found = [(i, self.total_slices[key]) for i, key in enumerate(keys) if key in self.total_slices]
+        starts = np.array([bounds[0] for _, bounds in found], dtype=np.intp)
+        lengths = np.array([bounds[1] - bounds[0] for _, bounds in found], dtype=np.intp)
+        # Consecutive runs start..stop of every key, laid end to end.
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        positions = offsets + np.arange(lengths.sum(), dtype=np.intp)
+        block = self.totals.take(positions)[["Year"] + self.metrics]
+        block.insert(0, "key", np.repeat([i for i, _ in found], lengths).astype(np.intp))
+        block = _in_years(block, year_range)
+        return block.astype(dict.fromkeys(self.metrics, "float64")).reset_index(drop=True)
+
+    def breakdown(self, scale, aggregation, geo=None, state=None, year_range=None):
+        """
+        Returns the per-year totals of each sector (or industry) within one
+        geography: OceanSector (or enowIndustry), Year and one column per metric.
+        """
+        econ_col = "enowIndustry" if aggregation == "Industry" else "OceanSector"
+        bounds = self.breakdown_slices.get((scale, aggregation, state, geo))
+        if bounds is None:
+            block = self.totals.iloc[0:0]
+        else:
+            block = self.totals.iloc[bounds[0]:bounds[1]]
+            block = block[(block["econ"] != WILDCARD) & block["econ"].notna()]
+        block = _in_years(block, year_range)[["econ", "Year"] + self.metrics]
+        block = block.astype({"econ": object, **dict.fromkeys(self.metrics, "float64")})
+        return block.rename(columns={"econ": econ_col}).reset_index(drop=True)
+
+    def top_contributors(self, scale, econ, metric, year_range=None, n=TOP_CONTRIBUTORS, stable=False):
+        """
+        Returns Year, GeoContribution and Estimate_value rows splitting one
+        sector's yearly total between its n largest geographies and "All
+        Other ..." (see GeoMatrix.split).
+        """
+        matrix = self.geo_matrices.get((scale, "Sector", econ))
+        if matrix is None:
+            return pd.DataFrame({"Year": [], "GeoContribution": [], "Estimate_value": []})
+        return matrix.split(metric, f"All Other {scale}s", year_range, n=n, stable=stable)
+
+    def standing(self, scale, aggregation, geo, econ, metric, year_range=None):
+        """
+        Returns the yearly share and rank of one geography among all
+        geographies at its scale (see GeoMatrix.standing), or None at scales
+        without a GeoMatrix.
+        """
+        matrix = self.geo_matrices.get((scale, aggregation, econ))
+        if matrix is None:
+            return None
+        return matrix.standing(metric, geo, year_range)
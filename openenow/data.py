@@ -0,0 +1,435 @@
+"""
+Loading and typing of the Open ENOW input datasets.
+
+The CSV files are parsed exactly once with explicit dtypes: repeated strings
+(geographies, sectors, industries) are held as pandas categoricals and the
+metric columns are downcast where their values allow it. The app keeps one
+copy of each frame per process, so these dtypes set most of a worker's
+memory; `python -m openenow.memory` reports it column by column.
+
+Parsed frames are kept in an on-disk Arrow IPC cache (see load_cached_frame),
+so renaming and type coercion run once per source file rather than on every
+cold start.
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # The cache is skipped and every load parses the CSV.
+    pa = None
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+OPEN_ENOW_CSV = "openENOWinput.csv"
+COMPARISON_CSV = "enow_version_comparisons.csv"
+DORADO_CSV = "DORADO_combined_sectors.csv"
+
+# Directory for the columnar cache; replicas can share it through a common volume.
+CACHE_DIR = os.environ.get("OPENENOW_CACHE_DIR", ".enow_cache")
+# Bump when the parsing code changes the cached frames, to invalidate old cache files.
+CACHE_FORMAT_VERSION = 2
+
+# Datasets to load in the background at startup: comma-separated loader names, or "all".
+PRELOAD = os.environ.get("OPENENOW_PRELOAD", "")
+
+OPEN_ENOW_RENAME = {
+    "geoType": "GeoScale", "geoName": "GeoName", "state": "StateAbbrv",
+    "year": "Year", "enowSector": "OceanSector", "establishments": "Open_Establishments",
+    "employment": "Open_Employment", "wages": "Open_Wages", "real_wages": "Open_RealWages",
+    "gdp": "Open_GDP", "rgdp": "Open_RealGDP"
+}
+
+# Dimension columns, by their names in the CSV, parsed straight to categoricals.
+OPEN_ENOW_DIMENSIONS = [
+    "geoType", "geoName", "state", "stateName", "enowSector", "enowIndustry", "aggregation"
+]
+
+# Metric columns and the dtype each is held in. Counts stay exact in float32;
+# dollar totals routinely exceed float32's 24-bit mantissa, so they stay float64.
+OPEN_ENOW_METRICS = {
+    "Open_Establishments": "float32",
+    "Open_Employment": "float32",
+    "Open_Wages": "float64",
+    "Open_RealWages": "float64",
+    "Open_GDP": "float64",
+    "Open_RealGDP": "float64",
+}
+
+# Columns the app reads under both their original and their renamed label.
+OPEN_ENOW_ALIASES = {"geoType": "GeoScale"}
+
+
+def process_rss_bytes():
+    """
+    Returns the resident set size of the current process in bytes.
+    Falls back to the peak RSS where /proc is unavailable, and to None if neither can be read.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_bytes(n):
+    """Formats a byte count for log messages."""
+    if n is None:
+        return "n/a"
+    return f"{n / 2**20:,.1f} MB"
+
+
+def coerce_metrics(df, metric_dtypes):
+    """Converts metric columns to numbers (invalid entries become NaN) in the given dtypes."""
+    for col, dtype in metric_dtypes.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+
+def downcast_exact(df, columns):
+    """
+    Stores each float64 column of `columns` as float32 where no value changes
+    (counts and whole-dollar amounts below 2**24, NaN); others stay float64.
+    """
+    for col in columns:
+        if col in df.columns and df[col].dtype == "float64":
+            values = df[col].to_numpy()
+            with np.errstate(over="ignore"):
+                narrow = values.astype("float32")
+            if np.array_equal(narrow.astype("float64"), values, equal_nan=True):
+                df[col] = narrow
+    return df
+
+
+def read_open_enow_csv(path=OPEN_ENOW_CSV):
+    """
+    Parses openENOWinput.csv once into a typed frame.
+
+    Columns are renamed to the labels used throughout the app and the alias
+    columns listed in OPEN_ENOW_ALIASES are added without re-reading the file.
+    Load time and memory are reported through the module logger.
+    """
+    started = time.perf_counter()
+    dtypes = {col: "category" for col in OPEN_ENOW_DIMENSIONS}
+    dtypes["year"] = "int32"
+    df = pd.read_csv(path, dtype=dtypes)
+    df.rename(columns=OPEN_ENOW_RENAME, inplace=True)
+    for alias, renamed in OPEN_ENOW_ALIASES.items():
+        if renamed in df.columns:
+            df[alias] = df[renamed]
+    coerce_metrics(df, OPEN_ENOW_METRICS)
+
+    logger.info(
+        "Loaded %s: %d rows in %.2fs; frame %s, process RSS %s",
+        path, len(df), time.perf_counter() - started,
+        format_bytes(df.memory_usage(deep=True).sum()), format_bytes(process_rss_bytes())
+    )
+    return df
+
+
+def concat_frames(frames):
+    """
+    Concatenates frames of the same columns, keeping categorical columns
+    categorical over the union of their categories (plain pd.concat falls back
+    to object columns when the categories differ).
+    """
+    first = frames[0]
+    for col in first.columns:
+        if isinstance(first[col].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals(
+                [frame[col].cat.remove_unused_categories() for frame in frames], sort_categories=True
+            ).categories
+            dtype = pd.CategoricalDtype(categories)
+            frames = [frame.assign(**{col: frame[col].astype(dtype)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+COMPARISON_RENAME = {
+    "Open_establishments": "Open_Establishments",
+    "Open_employment": "Open_Employment",
+    "Open_wages": "Open_Wages",
+    "Open_GDP": "Open_GDP",
+    "Open_RealGDP": "Open_RealGDP",
+    "oldENOW_establishments": "oldENOW_Establishments",
+    "oldENOW_employment": "oldENOW_Employment",
+    "oldENOW_wages": "oldENOW_Wages",
+    "oldENOW_GDP": "oldENOW_GDP",
+    "oldENOW_RealGDP": "oldENOW_RealGDP",
+    "noimpute_establishments": "noimpute_Establishments",
+    "noimpute_employment": "noimpute_Employment",
+    "noimpute_wages": "noimpute_Wages",
+    "noimpute_GDP": "noimpute_GDP",
+    "noimpute_RealGDP": "noimpute_RealGDP"
+}
+
+# Dimension columns of enow_version_comparisons.csv, parsed straight to categoricals.
+COMPARISON_DIMENSIONS = ["GeoScale", "GeoName", "state", "OceanSector", "OceanIndustry", "aggregation"]
+
+# Parsed as float64 and then downcast column by column (see downcast_exact): the
+# comparison sources mix whole counts with fractional imputed values.
+COMPARISON_METRICS = {
+    col: "float64" for col in [
+        'Open_Establishments', 'Open_Employment', 'Open_Wages', 'Open_GDP', 'Open_RealGDP',
+        'oldENOW_Establishments', 'oldENOW_Employment', 'oldENOW_Wages', 'oldENOW_GDP', 'oldENOW_RealGDP',
+        'noimpute_Establishments', 'noimpute_Employment', 'noimpute_Wages', 'noimpute_GDP', 'noimpute_RealGDP'
+    ]
+}
+
+
+def read_comparison_csv(path=COMPARISON_CSV):
+    """
+    Parses enow_version_comparisons.csv, renaming columns and converting
+    metrics to numbers; dimensions are categoricals and metrics are float32
+    where their values allow it.
+    """
+    dtypes = {col: "category" for col in COMPARISON_DIMENSIONS}
+    dtypes["Year"] = "int32"
+    df = pd.read_csv(path, dtype=dtypes)
+    df.rename(columns=COMPARISON_RENAME, inplace=True)
+    coerce_metrics(df, COMPARISON_METRICS)
+    return downcast_exact(df, COMPARISON_METRICS)
+
+
+# DORADO's unsuppressed ("NQ_") state and sector metrics, under the comparison columns' naming.
+DORADO_RENAME = {
+    "NQ_establishments": "DORADO_Establishments",
+    "NQ_employment": "DORADO_Employment",
+    "NQ_wages": "DORADO_Wages",
+    "NQ_GDP": "DORADO_GDP",
+    "NQ_RealGDP": "DORADO_RealGDP",
+}
+# Columns DORADO rows are matched on, in DORADO_combined_sectors.csv and in the comparison data.
+DORADO_KEYS = ["StateAbbrv", "Year", "OceanSector"]
+
+
+def normalize_join_key(values):
+    """Returns labels as stripped, case-folded strings, so case and whitespace differences between files still match."""
+    return pd.Series(values, dtype=object).astype(str).str.strip().str.casefold().to_numpy()
+
+
+def read_dorado_csv(path=DORADO_CSV):
+    """
+    Parses DORADO_combined_sectors.csv into one row per (StateAbbrv, Year,
+    OceanSector) with the DORADO_RENAME metric columns, indexed on the
+    normalized join key (see join_dorado).
+    """
+    df = pd.read_csv(path, usecols=DORADO_KEYS + list(DORADO_RENAME))
+    df.rename(columns=DORADO_RENAME, inplace=True)
+    coerce_metrics(df, {col: "float64" for col in DORADO_RENAME.values()})
+    df.index = pd.MultiIndex.from_arrays([
+        normalize_join_key(df["StateAbbrv"]), df["Year"].astype("int64").to_numpy(), normalize_join_key(df["OceanSector"])
+    ])
+    duplicated = df.index.duplicated(keep="last")
+    if duplicated.any():
+        logger.warning("%s: %d duplicate state, year and sector rows; keeping the last of each", path, duplicated.sum())
+        df = df[~duplicated]
+    return df
+
+
+def load_dorado(path=DORADO_CSV):
+    """Returns read_dorado_csv(path), or None if the file does not exist."""
+    try:
+        return read_dorado_csv(path)
+    except FileNotFoundError:
+        logger.info("%s not found; comparisons are shown without DORADO", path)
+        return None
+
+
+def join_dorado(df, dorado):
+    """
+    Returns the comparison rows with a DORADO_* column per DORADO_RENAME metric.
+    State-level sector rows take the DORADO values of their (state, Year,
+    OceanSector); every other row, and every row when dorado is None, gets NaN.
+    The lookup is one index probe per row rather than a merge, and only copies
+    the new columns.
+    """
+    columns = list(DORADO_RENAME.values())
+    positions = np.full(len(df), -1)
+    if dorado is not None and len(df):
+        state_sector = ((df["GeoScale"] == "State") & (df["aggregation"] == "Sector")).to_numpy()
+        keys = pd.MultiIndex.from_arrays([
+            normalize_join_key(df["state"]), df["Year"].astype("int64").to_numpy(), normalize_join_key(df["OceanSector"])
+        ])
+        positions = np.where(state_sector, dorado.index.get_indexer(keys), -1)
+    matched = positions >= 0
+    joined = df.copy(deep=False)
+    for col in columns:
+        values = np.full(len(df), np.nan)
+        if dorado is not None:
+            values[matched] = dorado[col].to_numpy(dtype="float64")[positions[matched]]
+        joined[col] = values
+    return downcast_exact(joined, columns)
+
+
+def load_comparison_frame(path=COMPARISON_CSV, dorado_path=DORADO_CSV):
+    """Returns the parsed comparison rows of path, from the columnar cache, with the DORADO values joined on."""
+    return join_dorado(load_cached_frame(path, read_comparison_csv), load_dorado(dorado_path))
+
+
+# --- Columnar cache ---
+def file_sha256(path, chunk_size=1 << 20):
+    """Returns the hex SHA-256 digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_atomic(path, write):
+    """Calls write(tmp_path) and moves the result into place, so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _dump_json(obj, path):
+    with open(path, "w") as f:
+        json.dump(obj, f, indent=2)
+
+
+def _save_manifest(manifest_path, manifest):
+    write_atomic(manifest_path, lambda tmp: _dump_json(manifest, tmp))
+
+
+def file_signatures(paths):
+    """Maps each path to [size, mtime_ns], or to None if it does not exist."""
+    signatures = {}
+    for dependency in paths:
+        try:
+            stat = os.stat(dependency)
+        except FileNotFoundError:
+            signatures[dependency] = None
+            continue
+        signatures[dependency] = [stat.st_size, stat.st_mtime_ns]
+    return signatures
+
+
+def load_cached_frame(path, build, cache_dir=None, name=None, depends_on=()):
+    """
+    Returns build(path), served from an Arrow IPC cache file when one is current.
+    Cache files are named after `name`, by default the source file's stem;
+    frames built differently from the same source need names of their own.
+    depends_on lists other files the builder reads: adding, removing or
+    touching one of them rebuilds the frame.
+
+    The cache is keyed on the source file's size, modification time and
+    SHA-256 digest, plus the builder's name and CACHE_FORMAT_VERSION. The
+    digest is only recomputed when size or mtime differ from the manifest, so
+    an unchanged file costs one stat() call. Cache files are memory-mapped on
+    read. Raises FileNotFoundError if the source file does not exist.
+    """
+    stat = os.stat(path)
+    if feather is None:
+        return build(path)
+
+    cache_dir = cache_dir or CACHE_DIR
+    stem = name or os.path.splitext(os.path.basename(path))[0]
+    manifest_path = os.path.join(cache_dir, f"{stem}.json")
+    manifest = _read_manifest(manifest_path)
+    key = {"builder": build.__name__, "format": CACHE_FORMAT_VERSION}
+    if depends_on:
+        key["depends_on"] = file_signatures(depends_on)
+
+    if manifest and all(manifest.get(k) == v for k, v in key.items()):
+        cache_file = os.path.join(cache_dir, manifest.get("cache_file", ""))
+        unchanged = manifest.get("size") == stat.st_size and manifest.get("mtime_ns") == stat.st_mtime_ns
+        if not unchanged and manifest.get("size") == stat.st_size:
+            # Touched but possibly identical (e.g. re-deployed); fall back to the content hash.
+            unchanged = manifest.get("sha256") == file_sha256(path)
+        if unchanged and os.path.exists(cache_file):
+            started = time.perf_counter()
+            df = feather.read_table(cache_file, memory_map=True).to_pandas()
+            logger.info("Loaded %s from cache %s in %.2fs", path, cache_file, time.perf_counter() - started)
+            if manifest.get("mtime_ns") != stat.st_mtime_ns:
+                manifest["mtime_ns"] = stat.st_mtime_ns
+                _save_manifest(manifest_path, manifest)
+            return df
+
+    df = build(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        sha256 = file_sha256(path)
+        cache_name = f"{stem}-{sha256[:16]}.arrow"
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        write_atomic(
+            os.path.join(cache_dir, cache_name),
+            lambda tmp: feather.write_feather(table, tmp, compression="uncompressed")
+        )
+        _save_manifest(manifest_path, dict(
+            key, size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=sha256, cache_file=cache_name
+        ))
+        if manifest and manifest.get("cache_file") not in (None, cache_name):
+            stale = os.path.join(cache_dir, manifest["cache_file"])
+            if os.path.exists(stale):
+                os.remove(stale)
+    except (OSError, pa.ArrowException) as e:
+        logger.warning("Could not write the cache for %s: %s", path, e)
+    return df
+
+
+# --- Background preloading ---
+def preload_names(spec, available):
+    """Returns the loader names selected by a PRELOAD-style spec, in the order of `available`."""
+    requested = {name.strip().lower() for name in spec.split(",") if name.strip()}
+    if "all" in requested:
+        return list(available)
+    unknown = requested - set(available)
+    if unknown:
+        logger.warning("Ignoring unknown preload target(s): %s", ", ".join(sorted(unknown)))
+    return [name for name in available if name in requested]
+
+
+def start_preload(loaders, spec=None):
+    """
+    Calls the loaders named in spec (default PRELOAD) one after another in a
+    daemon thread, so a later first use finds their results cached. loaders
+    maps names to zero-argument callables. Returns the thread, or None when
+    nothing is to be preloaded.
+    """
+    names = preload_names(PRELOAD if spec is None else spec, loaders)
+    if not names:
+        return None
+
+    def run():
+        for name in names:
+            started = time.perf_counter()
+            try:
+                loaders[name]()
+            except Exception:
+                logger.exception("Background preload of %s failed", name)
+                continue
+            logger.info("Preloaded %s in %.2fs", name, time.perf_counter() - started)
+
+    thread = threading.Thread(target=run, name="openenow-preload", daemon=True)
+    thread.start()
+    return thread
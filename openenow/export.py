@@ -0,0 +1,84 @@
+"""
+File exports behind the app's download buttons.
+
+A download is written only when its button is clicked: the app hands
+st.download_button a callable, which calls export_bytes. CSV is written in
+chunks of CSV_CHUNK_ROWS rows straight into the output buffer, optionally
+through gzip, so a large extract never exists as one Python string next to
+its encoded copy; Parquet is written with pyarrow where it is installed.
+
+Finished files are kept in a ResultCache of their own with a byte budget of
+EXPORT_CACHE_MB, so popular downloads are served again without rewriting
+them while a file larger than the budget is written for its click and then
+released.
+"""
+import gzip
+import io
+import os
+from dataclasses import dataclass
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is not offered.
+    pa = None
+    pq = None
+
+CSV_CHUNK_ROWS = 50_000
+EXPORT_CACHE_MB = float(os.environ.get("OPENENOW_EXPORT_CACHE_MB", "32"))
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    extension: str
+    mime: str
+    compress: bool = False
+
+
+EXPORT_FORMATS = {
+    "CSV": ExportFormat(".csv", "text/csv"),
+    "CSV (gzip)": ExportFormat(".csv.gz", "application/gzip", compress=True),
+    "Parquet": ExportFormat(".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def available_formats():
+    """Returns the labels of the EXPORT_FORMATS that can be written here."""
+    return [label for label in EXPORT_FORMATS if label != "Parquet" or pq is not None]
+
+
+def write_csv(df, out, index=False, chunk_rows=CSV_CHUNK_ROWS):
+    """Writes df as UTF-8 CSV to the binary file `out`, chunk_rows rows at a time."""
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    try:
+        df.to_csv(text, index=index, chunksize=chunk_rows)
+    finally:
+        text.detach()
+
+
+def write_parquet(df, out, index=False):
+    """Writes df as Parquet to the binary file `out`; column labels are written as strings."""
+    table = pa.Table.from_pandas(df.rename(columns=str), preserve_index=index)
+    pq.write_table(table, out)
+
+
+def export_bytes(df, label, index=False):
+    """Returns df written in the EXPORT_FORMATS format `label`; index=True writes the row labels as well."""
+    export_format = EXPORT_FORMATS[label]
+    out = io.BytesIO()
+    if label == "Parquet":
+        if pq is None:
+            raise ValueError("Parquet export needs pyarrow")
+        write_parquet(df, out, index=index)
+    elif export_format.compress:
+        # mtime=0 keeps the bytes identical for identical data.
+        with gzip.GzipFile(fileobj=out, mode="wb", mtime=0) as compressed:
+            write_csv(df, compressed, index=index)
+    else:
+        write_csv(df, out, index=index)
+    return out.getvalue()
+
+
+def export_file_name(stem, label):
+    """Returns the download file name for stem in the EXPORT_FORMATS format `label`."""
+    return stem + EXPORT_FORMATS[label].extension
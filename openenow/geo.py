@@ -0,0 +1,377 @@
+"""
+County geometries for the map of coastal counties.
+
+The map is drawn in the browser from a TopoJSON topology built ahead of time
+from a county boundary file (e.g. a Census cartographic boundary file
+converted to GeoJSON), keeping only the counties in openENOWinput.csv.
+Coordinates are quantized to a QUANTIZATION x QUANTIZATION grid, borders
+shared by neighbouring counties are stored once as arcs, and each arc is
+simplified once with Douglas-Peucker, so neighbours keep a common border.
+The topology is written under GEO_DIR with a hash of its content in its name,
+so browsers can cache it, next to an index that maps each (state, county) of
+the data to its 5-digit FIPS code, the id of its geometry. The app only sends
+the FIPS-keyed values of a selection to the browser; the geometry is fetched
+from Streamlit's static route once.
+
+    python -m openenow.geo counties.geojson    # build the topology and FIPS index
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from openenow.data import OPEN_ENOW_CSV, format_bytes, write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Served by Streamlit at GEO_URL when server.enableStaticServing is on.
+GEO_DIR = os.path.join("static", "geo")
+GEO_URL = "app/static/geo"
+COUNTY_INDEX = "coastal_counties.json"
+COUNTY_OBJECT = "counties"
+# Bump when the index layout changes.
+GEO_FORMAT_VERSION = 1
+
+QUANTIZATION = 100_000
+# Douglas-Peucker tolerance in degrees (about 500 m).
+SIMPLIFY_TOLERANCE = 0.005
+
+STATE_FIPS = {
+    "01": "Alabama", "02": "Alaska", "04": "Arizona", "05": "Arkansas", "06": "California", "08": "Colorado",
+    "09": "Connecticut", "10": "Delaware", "11": "District of Columbia", "12": "Florida", "13": "Georgia",
+    "15": "Hawaii", "16": "Idaho", "17": "Illinois", "18": "Indiana", "19": "Iowa", "20": "Kansas",
+    "21": "Kentucky", "22": "Louisiana", "23": "Maine", "24": "Maryland", "25": "Massachusetts", "26": "Michigan",
+    "27": "Minnesota", "28": "Mississippi", "29": "Missouri", "30": "Montana", "31": "Nebraska", "32": "Nevada",
+    "33": "New Hampshire", "34": "New Jersey", "35": "New Mexico", "36": "New York", "37": "North Carolina",
+    "38": "North Dakota", "39": "Ohio", "40": "Oklahoma", "41": "Oregon", "42": "Pennsylvania",
+    "44": "Rhode Island", "45": "South Carolina", "46": "South Dakota", "47": "Tennessee", "48": "Texas",
+    "49": "Utah", "50": "Vermont", "51": "Virginia", "53": "Washington", "54": "West Virginia", "55": "Wisconsin",
+    "56": "Wyoming", "60": "American Samoa", "66": "Guam", "69": "Northern Mariana Islands", "72": "Puerto Rico",
+    "78": "United States Virgin Islands",
+}
+
+
+def county_key(state, county):
+    """Returns the key (state, county) names are matched on: case, periods and extra spaces ignored."""
+    def norm(name):
+        return re.sub(r"\s+", " ", str(name).replace(".", "")).strip().casefold()
+    return norm(state), norm(county)
+
+
+# --- Reading boundaries ---
+@dataclass
+class CountyShape:
+    """One county of a boundary file: FIPS code, state, the names it may be listed under, and its polygons."""
+    fips: str
+    state: str
+    names: list
+    polygons: list
+
+
+def read_county_shapes(path):
+    """
+    Reads the counties of a GeoJSON FeatureCollection (optionally gzipped).
+    The FIPS code is taken from the GEOID property, the feature id, or
+    STATEFP/STATE plus COUNTYFP/COUNTY; the state from STATE_NAME or the
+    FIPS code; the names from NAMELSAD, NAME and NAME plus LSAD.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        collection = json.load(f)
+    shapes = []
+    for feature in collection.get("features", []):
+        props = feature.get("properties") or {}
+        geometry = feature.get("geometry")
+        fips = props.get("GEOID") or feature.get("id")
+        if not fips:
+            fips = f"{props.get('STATEFP', props.get('STATE', ''))}{props.get('COUNTYFP', props.get('COUNTY', ''))}"
+        fips = str(fips).zfill(5)
+        state = props.get("STATE_NAME") or STATE_FIPS.get(fips[:2])
+        if not geometry or not state or len(fips) != 5:
+            continue
+        name = props.get("NAME")
+        names = [n for n in (props.get("NAMELSAD"), name) if n]
+        lsad = props.get("LSAD")
+        if name and lsad and not str(lsad).isdigit():
+            names.append(f"{name} {lsad}")
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+        shapes.append(CountyShape(fips, state, names, polygons))
+    return shapes
+
+
+def data_counties(path=OPEN_ENOW_CSV):
+    """Returns the (state, county) names of the counties in openENOWinput.csv, reading only the columns needed."""
+    df = pd.read_csv(path, usecols=["geoType", "geoName", "stateName"])
+    counties = df.loc[df["geoType"] == "County", ["stateName", "geoName"]].dropna().drop_duplicates()
+    return sorted(counties.itertuples(index=False, name=None))
+
+
+def match_counties(counties, shapes):
+    """
+    Returns ({(state, county): fips}, unmatched) for the (state, county)
+    names of the data, matched to the shapes' states and names.
+    """
+    by_name = {}
+    for shape in shapes:
+        for name in shape.names:
+            by_name.setdefault(county_key(shape.state, name), shape.fips)
+    fips = {}
+    unmatched = []
+    for state, county in counties:
+        code = by_name.get(county_key(state, county))
+        if code is None:
+            unmatched.append((state, county))
+        else:
+            fips[(state, county)] = code
+    return fips, unmatched
+
+
+# --- Topology ---
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of an (n, 2) array of points, keeping both ends."""
+    n = len(points)
+    if n <= 2 or tolerance <= 0:
+        return points
+    coords = points.astype(np.float64)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        chord = coords[last] - coords[first]
+        offsets = coords[first + 1:last] - coords[first]
+        length = np.hypot(*chord)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack += [(first, split), (split, last)]
+    return points[keep]
+
+
+def _signed_area(ring):
+    x, y = ring[:, 0].astype(np.float64), ring[:, 1].astype(np.float64)
+    return (np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2
+
+
+@dataclass
+class _ArcTable:
+    """The arcs of a topology being built, each stored once whichever direction it is met in."""
+    arcs: list = field(default_factory=list)
+    index: dict = field(default_factory=dict)
+
+    def add(self, arc):
+        """Returns the topology reference of arc: its index, or ~index if it is stored reversed."""
+        if arc in self.index:
+            return self.index[arc]
+        reverse = arc[::-1]
+        if reverse in self.index:
+            return ~self.index[reverse]
+        self.index[arc] = len(self.arcs)
+        self.arcs.append(arc)
+        return self.index[arc]
+
+
+def build_topology(shapes, quantization=QUANTIZATION, tolerance=SIMPLIFY_TOLERANCE, object_name=COUNTY_OBJECT):
+    """
+    Returns the TopoJSON topology (a dict) of shapes, one geometry per shape
+    with the FIPS code as id and "name" ("County, State") as property.
+    Exterior rings are wound clockwise and holes counterclockwise, as d3-geo
+    (and so Vega) expects.
+    """
+    coords = [np.asarray(ring, dtype=np.float64)[:, :2] for shape in shapes for polygon in shape.polygons for ring in polygon]
+    everything = np.vstack(coords) if coords else np.zeros((1, 2))
+    (x0, y0), (x1, y1) = everything.min(axis=0), everything.max(axis=0)
+    scale = np.array([(x1 - x0) / (quantization - 1) or 1.0, (y1 - y0) / (quantization - 1) or 1.0])
+    translate = np.array([x0, y0])
+
+    # Quantize every ring, dropping repeated points and rings too small to draw.
+    geometries = []
+    for shape in shapes:
+        polygons = []
+        for polygon in shape.polygons:
+            rings = []
+            for position, ring in enumerate(polygon):
+                quantized = np.round((np.asarray(ring, dtype=np.float64)[:, :2] - translate) / scale).astype(np.int64)
+                distinct = np.r_[True, (np.diff(quantized, axis=0) != 0).any(axis=1)]
+                quantized = quantized[distinct]
+                if len(quantized) and (quantized[0] != quantized[-1]).any():
+                    quantized = np.vstack([quantized, quantized[:1]])
+                if len(quantized) < 4:
+                    if position == 0:
+                        break
+                    continue
+                if (_signed_area(quantized) > 0) == (position == 0):
+                    quantized = quantized[::-1]
+                rings.append([tuple(p) for p in quantized[:-1].tolist()])
+            if rings:
+                polygons.append(rings)
+        if polygons:
+            geometries.append((shape, polygons))
+
+    # A point where rings part ways (it has different neighbours in two rings) ends an arc.
+    neighbours = {}
+    junctions = set()
+    for _, polygons in geometries:
+        for rings in polygons:
+            for ring in rings:
+                n = len(ring)
+                for i, point in enumerate(ring):
+                    pair = frozenset((ring[i - 1], ring[(i + 1) % n]))
+                    if neighbours.setdefault(point, pair) != pair:
+                        junctions.add(point)
+
+    table = _ArcTable()
+
+    def ring_arcs(ring):
+        cuts = [i for i, point in enumerate(ring) if point in junctions]
+        if not cuts:
+            # A ring touching no other is one closed arc, started at its smallest point in both directions.
+            start = ring.index(min(ring))
+            rotated = ring[start:] + ring[:start]
+            return [table.add(tuple(rotated + rotated[:1]))]
+        rotated = ring[cuts[0]:] + ring[:cuts[0]] + [ring[cuts[0]]]
+        ends = [i - cuts[0] for i in cuts] + [len(ring)]
+        return [table.add(tuple(rotated[a:b + 1])) for a, b in zip(ends, ends[1:])]
+
+    objects = []
+    for shape, polygons in geometries:
+        arcs = [[ring_arcs(ring) for ring in rings] for rings in polygons]
+        geometry = {"type": "Polygon", "arcs": arcs[0]} if len(arcs) == 1 else {"type": "MultiPolygon", "arcs": arcs}
+        geometry.update(id=shape.fips, properties={"name": f"{shape.names[0] if shape.names else shape.fips}, {shape.state}"})
+        objects.append(geometry)
+
+    encoded = []
+    for arc in table.arcs:
+        points = np.array(arc, dtype=np.int64)
+        simplified = simplify_line(points, tolerance / scale.min())
+        if arc[0] == arc[-1] and len(simplified) < 4:
+            simplified = points  # A small closed ring keeps its points rather than collapse.
+        encoded.append(np.vstack([simplified[:1], np.diff(simplified, axis=0)]).tolist())
+    return {
+        "type": "Topology",
+        "bbox": [float(x0), float(y0), float(x1), float(y1)],
+        "transform": {"scale": scale.tolist(), "translate": translate.tolist()},
+        "objects": {object_name: {"type": "GeometryCollection", "geometries": objects}},
+        "arcs": encoded,
+    }
+
+
+# --- Built files ---
+@dataclass(frozen=True)
+class CountyGeometry:
+    """
+    A built county topology: url is its path under Streamlit's static route,
+    object_name the topology object holding the counties, and fips maps each
+    (state, county) of the data that has a geometry to its FIPS code.
+    """
+    url: str
+    object_name: str
+    fips: dict
+    unmatched: tuple = ()
+
+
+def build_county_geometry(source, data_path=OPEN_ENOW_CSV, out_dir=GEO_DIR, quantization=QUANTIZATION,
+                          tolerance=SIMPLIFY_TOLERANCE):
+    """
+    Builds the topology of the counties in data_path from the boundary file
+    source and writes it, with the FIPS index, to out_dir. Returns the
+    CountyGeometry and the size of the topology in bytes.
+    """
+    shapes = read_county_shapes(source)
+    fips, unmatched = match_counties(data_counties(data_path), shapes)
+    wanted = set(fips.values())
+    topology = build_topology([shape for shape in shapes if shape.fips in wanted], quantization, tolerance)
+    payload = json.dumps(topology, separators=(",", ":")).encode()
+    name = f"coastal_counties-{hashlib.sha256(payload).hexdigest()[:12]}.topo.json"
+    os.makedirs(out_dir, exist_ok=True)
+    previous = _read_index(out_dir)
+
+    def write_topology(tmp_path):
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+    write_atomic(os.path.join(out_dir, name), write_topology)
+
+    index = {
+        "format": GEO_FORMAT_VERSION, "topology": name, "object": COUNTY_OBJECT,
+        "counties": [[state, county, code] for (state, county), code in sorted(fips.items())],
+        "unmatched": [list(pair) for pair in unmatched],
+    }
+
+    def write_index(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+    write_atomic(os.path.join(out_dir, COUNTY_INDEX), write_index)
+    if previous and previous["topology"] != name:
+        try:
+            os.remove(os.path.join(out_dir, previous["topology"]))
+        except FileNotFoundError:
+            pass
+    return _county_geometry(index), len(payload)
+
+
+def _read_index(geo_dir):
+    try:
+        with open(os.path.join(geo_dir, COUNTY_INDEX)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("format") == GEO_FORMAT_VERSION else None
+
+
+def _county_geometry(index):
+    return CountyGeometry(
+        url=f"{GEO_URL}/{index['topology']}", object_name=index["object"],
+        fips={(state, county): code for state, county, code in index["counties"]},
+        unmatched=tuple(tuple(pair) for pair in index.get("unmatched", [])),
+    )
+
+
+def load_county_geometry(geo_dir=GEO_DIR):
+    """Returns the CountyGeometry built in geo_dir, or None if none is built there."""
+    index = _read_index(geo_dir)
+    if index is None or not os.path.exists(os.path.join(geo_dir, index["topology"])):
+        return None
+    return _county_geometry(index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m openenow.geo", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="county boundaries as a GeoJSON FeatureCollection (.json, .geojson, optionally .gz)")
+    parser.add_argument("--data", default=OPEN_ENOW_CSV, help="Open ENOW input whose counties are kept")
+    parser.add_argument("--out-dir", default=GEO_DIR, help=f"output directory (default: {GEO_DIR})")
+    parser.add_argument("--quantization", type=int, default=QUANTIZATION, help="grid size coordinates are rounded to")
+    parser.add_argument("--tolerance", type=float, default=SIMPLIFY_TOLERANCE, help="simplification tolerance in degrees")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    geometry, size = build_county_geometry(args.source, args.data, args.out_dir, args.quantization, args.tolerance)
+    print(f"{len(geometry.fips):,} counties in {geometry.url} ({format_bytes(size)}).")
+    if geometry.unmatched:
+        names = ", ".join(f"{county}, {state}" for state, county in geometry.unmatched)
+        print(f"Counties without a geometry in {args.source}: {names}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
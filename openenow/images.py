@@ -0,0 +1,187 @@
+"""
+Resized, content-hashed derivatives of the app's images.
+
+The state maps are 1000px JPEGs and the logo a 746px PNG, while the page
+shows them at most ~800px and 200px wide. Each image is resized once per
+width and format into STATIC_IMAGE_DIR, under a name that carries a hash of
+the source file, so the files never change under a given URL and browsers
+can cache them. Streamlit serves that directory at app/static/ when static
+serving is enabled (see .streamlit/config.toml); derivative bytes are also
+kept in memory for st.image.
+
+    python -m openenow.images      # build every derivative, check that each state has a map
+"""
+import argparse
+import functools
+import io
+import logging
+import os
+import sys
+from dataclasses import dataclass
+
+import pandas as pd
+from PIL import Image, features
+
+from openenow.data import OPEN_ENOW_CSV, file_sha256, write_atomic
+
+logger = logging.getLogger(__name__)
+
+MAP_DIR = "ENOW state maps"
+LOGO_PATH = "open_ENOW_logo.png"
+# Served by Streamlit at STATIC_URL when server.enableStaticServing is on.
+STATIC_IMAGE_DIR = os.path.join("static", "derived")
+STATIC_URL = "app/static/derived"
+
+MAP_WIDTHS = (480, 800)
+LOGO_WIDTH = 200
+WEBP_SUPPORTED = features.check("webp")
+QUALITY = {"webp": 80, "jpeg": 85}
+MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+
+@dataclass(frozen=True)
+class ImageDerivative:
+    """One resized copy of a source image; url is its path under Streamlit's static route."""
+    path: str
+    url: str
+    width: int
+    height: int
+    format: str
+
+    @property
+    def mime(self):
+        return MIME_TYPES[self.format]
+
+
+def map_path(state):
+    """Returns the path of the map image for a state name."""
+    return os.path.join(MAP_DIR, f"Map_{state.replace(' ', '_')}.jpg")
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(buffer, "JPEG", quality=QUALITY["jpeg"], optimize=True, progressive=True)
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", quality=QUALITY["webp"], method=6)
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=256)
+def build_derivative(source, width, fmt, out_dir=STATIC_IMAGE_DIR):
+    """
+    Returns the ImageDerivative of `source` at `width` pixels (never upscaled)
+    in `fmt` ("webp", "jpeg" or "png"), writing it to out_dir if it is not
+    there yet. The file name carries the first 12 hex digits of the source's
+    SHA-256, so a changed source gets a new name. Raises OSError if out_dir
+    is not writable.
+    """
+    digest = file_sha256(source)[:12]
+    stem = os.path.splitext(os.path.basename(source))[0]
+    with Image.open(source) as image:
+        image.load()
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    name = f"{stem}-{image.width}w-{digest}.{'jpg' if fmt == 'jpeg' else fmt}"
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        data = _encode(image, fmt)
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+
+        os.makedirs(out_dir, exist_ok=True)
+        write_atomic(path, write)
+        logger.debug("Wrote %s (%d bytes)", path, len(data))
+    return ImageDerivative(path, f"{STATIC_URL}/{name}", image.width, image.height, fmt)
+
+
+@functools.lru_cache(maxsize=256)
+def derivative_bytes(path):
+    """Returns the bytes of a derivative file, read once per process."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def state_map_derivatives(state):
+    """
+    Returns {format: [ImageDerivative, ...] by width} for a state's map, or
+    None if the state has no map. WebP is included when Pillow supports it.
+    """
+    source = map_path(state)
+    if not os.path.exists(source):
+        return None
+    formats = ["webp", "jpeg"] if WEBP_SUPPORTED else ["jpeg"]
+    return {fmt: [build_derivative(source, width, fmt) for width in MAP_WIDTHS] for fmt in formats}
+
+
+def state_map_html(state, derivatives):
+    """Returns a responsive <picture> element for a state's map derivatives."""
+    sizes = f"(max-width: {MAP_WIDTHS[-1]}px) 100vw, {MAP_WIDTHS[-1]}px"
+    sources = []
+    for fmt, items in derivatives.items():
+        if fmt == "jpeg":
+            continue
+        srcset = ", ".join(f"{d.url} {d.width}w" for d in items)
+        sources.append(f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset}" sizes="{sizes}">')
+    fallback = derivatives["jpeg"]
+    srcset = ", ".join(f"{d.url} {d.width}w" for d in fallback)
+    largest = fallback[-1]
+    return (
+        "<picture>" + "".join(sources)
+        + f'<img src="{largest.url}" srcset="{srcset}" sizes="{sizes}" width="{largest.width}" '
+        + f'height="{largest.height}" alt="Coastal counties and zip codes of {state}" '
+        + 'style="width: 100%; height: auto;" loading="lazy">'
+        + "</picture>"
+    )
+
+
+def logo_derivative():
+    """Returns the sidebar logo resized to its display width, as PNG to keep transparency."""
+    return build_derivative(LOGO_PATH, LOGO_WIDTH, "png")
+
+
+def missing_maps(state_names):
+    """Returns the state names, sorted, that have no map image."""
+    return sorted(state for state in set(state_names) if not os.path.exists(map_path(state)))
+
+
+def data_state_names(path=OPEN_ENOW_CSV):
+    """Returns the state names in openENOWinput.csv, reading only the columns needed."""
+    df = pd.read_csv(path, usecols=["geoType", "geoName"])
+    return sorted(df.loc[df["geoType"] == "State", "geoName"].dropna().unique())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m openenow.images", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=OPEN_ENOW_CSV, help="Open ENOW input used for the map check")
+    parser.add_argument("--check-only", action="store_true", help="only check that every state has a map")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    status = 0
+    if os.path.exists(args.data):
+        missing = missing_maps(data_state_names(args.data))
+        if missing:
+            print(f"States without a map in '{MAP_DIR}': {', '.join(missing)}", file=sys.stderr)
+            status = 1
+        else:
+            print("Every state in the data has a map.")
+    else:
+        print(f"{args.data} not found; skipping the map check.", file=sys.stderr)
+
+    if not args.check_only:
+        states = sorted(name[len("Map_"):-len(".jpg")].replace("_", " ")
+                        for name in os.listdir(MAP_DIR) if name.startswith("Map_") and name.endswith(".jpg"))
+        for state in states:
+            state_map_derivatives(state)
+        logo_derivative()
+        print(f"Derivatives for {len(states)} maps and the logo are in {STATIC_IMAGE_DIR}.")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Partition index over the Open ENOW estimates.
+
+The estimate modes narrow the dataset by geographic scale, geography,
+aggregation level and sector or industry, then by a year range. Rather than
+scanning the whole frame for each of those conditions on every rerun, the
+index resolves the categorical part of the filter with one dictionary lookup
+and the year range with a binary search over a year-ordered block.
+"""
+import numpy as np
+import pandas as pd
+
+
+KEY_LEVELS = ["scale", "aggregation", "state", "geo", "econ"]
+# Levels that can be left open in a key; later entries take precedence on collisions.
+WILDCARD_LEVELS = ([], ["geo"], ["econ"], ["geo", "econ"])
+
+
+def none_if_missing(value):
+    return None if pd.isna(value) else value
+
+
+def partition_keys(df):
+    """
+    Returns the partition key columns (see PartitionIndex) for each row of df, as object columns.
+    """
+    is_county = (df["GeoScale"] == "County").to_numpy()
+    is_industry = (df["aggregation"] == "Industry").to_numpy()
+    return pd.DataFrame({
+        "scale": df["GeoScale"].astype(object).to_numpy(),
+        "aggregation": df["aggregation"].astype(object).to_numpy(),
+        "state": np.where(is_county, df["stateName"].astype(object), None),
+        "geo": df["GeoName"].astype(object).to_numpy(),
+        "econ": np.where(is_industry, df["enowIndustry"].astype(object), df["OceanSector"].astype(object)),
+    })
+
+
+class PartitionIndex:
+    """
+    Maps (GeoScale, aggregation, state, geo, econ) keys to year-ordered row positions.
+
+    - state is the stateName of county rows, since county names repeat across
+      states, and None for every other scale.
+    - econ is the OceanSector of sector-level rows and the enowIndustry of
+      industry-level rows.
+    - None as geo or econ stands for every value at that level, e.g.
+      ("State", "Sector", None, None, None) holds all state-level sector rows.
+    """
+
+    def __init__(self, df):
+        self.frame = df
+        year_order = np.argsort(df["Year"].to_numpy(), kind="stable")
+        self.year_order = year_order
+        self.sorted_years = df["Year"].to_numpy()[year_order]
+
+        keys = partition_keys(df).iloc[year_order].reset_index(drop=True)
+
+        # Grouping the year-sorted keys yields ascending positions, i.e. year order.
+        self.blocks = {}
+        for wildcard in WILDCARD_LEVELS:
+            by = [level for level in KEY_LEVELS if level not in wildcard]
+            for key, positions in keys.groupby(by, dropna=False, sort=False).indices.items():
+                key = dict(zip(by, key))
+                full_key = tuple(none_if_missing(key.get(level)) for level in KEY_LEVELS)
+                if full_key[0] is None or full_key[1] is None:
+                    continue
+                rows = year_order[positions]
+                self.blocks[full_key] = (rows, self.sorted_years[positions])
+
+        self.sectors = sorted(df["OceanSector"].dropna().unique())
+        industry_rows = df[df["aggregation"] == "Industry"]
+        self.industries_by_sector = {
+            sector: sorted(group["enowIndustry"].dropna().unique())
+            for sector, group in industry_rows.groupby("OceanSector", observed=True)
+        }
+        self.geos_by_scale = {
+            scale: sorted(group["GeoName"].dropna().unique())
+            for scale, group in df.groupby("GeoScale", observed=True)
+        }
+        county_rows = df[df["GeoScale"] == "County"]
+        self.counties_by_state = {
+            state: sorted(group["GeoName"].dropna().unique())
+            for state, group in county_rows.groupby("stateName", observed=True)
+        }
+
+    @property
+    def year_bounds(self):
+        """Returns the (first, last) year covered by the data."""
+        return int(self.sorted_years[0]), int(self.sorted_years[-1])
+
+    def rows_for_years(self, start_year, end_year):
+        """Returns all rows with start_year <= Year <= end_year."""
+        lo = np.searchsorted(self.sorted_years, start_year, side="left")
+        hi = np.searchsorted(self.sorted_years, end_year, side="right")
+        return self.frame.take(self.year_order[lo:hi])
+
+    def lookup(self, scale, aggregation, geo=None, econ=None, state=None, year_range=None):
+        """
+        Returns the rows for one partition key, ordered by year.
+
+        year_range, if given, is an inclusive (start, end) pair applied with a
+        binary search over the block. Unknown keys give an empty frame.
+        """
+        block = self.blocks.get((scale, aggregation, state, geo, econ))
+        if block is None:
+            return self.frame.iloc[0:0]
+        rows, years = block
+        if year_range is not None:
+            lo = np.searchsorted(years, year_range[0], side="left")
+            hi = np.searchsorted(years, year_range[1], side="right")
+            rows = rows[lo:hi]
+        return self.frame.take(rows)
@@ -0,0 +1,130 @@
+"""
+Memory report for the datasets and caches a worker holds.
+
+Several replicas share a node, and it is memory rather than CPU that limits
+how many fit. This module measures where it goes: bytes per column of each
+loaded frame, and bytes per cached object. Data shared between objects (an
+EstimateData's frame is also its index's frame) is counted once, for the
+first object that holds it.
+
+    python -m openenow.memory       # load the datasets as the app does and report
+"""
+import argparse
+import dataclasses
+import logging
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from openenow.comparison_table import ComparisonTable, load_comparison_table_frame
+from openenow.data import COMPARISON_CSV, OPEN_ENOW_CSV, format_bytes, load_comparison_frame, process_rss_bytes
+from openenow.refresh import EstimateStore
+
+
+def column_bytes(df):
+    """Returns one row per column of df with its dtype and deep size in bytes, largest first."""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "column": usage.index, "dtype": [str(df[col].dtype) for col in usage.index], "bytes": usage.to_numpy()
+    })
+    return report.sort_values("bytes", ascending=False, kind="stable", ignore_index=True)
+
+
+class _Sizer:
+    """Sums the memory held by objects, skipping anything an earlier call already counted."""
+
+    def __init__(self):
+        self.seen = set()
+
+    def size(self, obj):
+        if obj is None or isinstance(obj, (bool, int, float)) or id(obj) in self.seen:
+            return 0
+        self.seen.add(id(obj))
+        if isinstance(obj, pd.DataFrame):
+            return int(obj.memory_usage(deep=True).sum())
+        if isinstance(obj, (pd.Series, pd.Index)):
+            return int(obj.memory_usage(deep=True))
+        if isinstance(obj, np.ndarray):
+            return obj.nbytes
+        if isinstance(obj, dict):
+            return sys.getsizeof(obj) + sum(self.size(k) + self.size(v) for k, v in obj.items())
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            return sys.getsizeof(obj) + sum(self.size(item) for item in obj)
+        if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            return sys.getsizeof(obj) + sum(self.size(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+        if hasattr(obj, "__dict__") and not isinstance(obj, type):
+            return sys.getsizeof(obj) + self.size(vars(obj))
+        return sys.getsizeof(obj)
+
+
+def object_bytes(objects):
+    """
+    Returns one row per entry of `objects` (a name -> object mapping) with the
+    bytes it holds beyond the entries before it, so the column adds up to the
+    total without double counting.
+    """
+    sizer = _Sizer()
+    rows = [(name, sizer.size(obj)) for name, obj in objects.items()]
+    return pd.DataFrame(rows, columns=["object", "bytes"])
+
+
+def cache_entry_bytes(cache, top=10):
+    """Returns the `top` largest entries of a ResultCache with their keys and sizes."""
+    entries = sorted(cache.entry_sizes(), key=lambda entry: entry[1], reverse=True)[:top]
+    return pd.DataFrame([(repr(key), size) for key, size in entries], columns=["key", "bytes"])
+
+
+def format_report(frames, objects):
+    """Formats the per-column report of each frame in `frames` and the per-object report of `objects`."""
+    lines = []
+    for name, df in frames.items():
+        if df is None:
+            continue
+        report = column_bytes(df)
+        lines.append(f"{name}: {len(df):,} rows, {format_bytes(report['bytes'].sum())}")
+        for row in report.itertuples(index=False):
+            lines.append(f"  {row.column:<36} {row.dtype:<10} {row.bytes:>14,} bytes")
+        lines.append("")
+    report = object_bytes(objects)
+    lines.append("Objects (shared data counted once):")
+    for row in report.itertuples(index=False):
+        lines.append(f"  {row.object:<36} {row.bytes:>25,} bytes")
+    lines.append(f"  {'total':<36} {report['bytes'].sum():>25,} bytes")
+    lines.append(f"Process RSS: {format_bytes(process_rss_bytes())}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m openenow.memory", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--estimates", default=OPEN_ENOW_CSV, help="path of openENOWinput.csv")
+    parser.add_argument("--comparison", default=COMPARISON_CSV, help="path of enow_version_comparisons.csv")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    objects = OrderedDict()
+    frames = OrderedDict()
+    estimates = EstimateStore(path=args.estimates).current()
+    if estimates is not None:
+        frames["openENOWinput.csv"] = estimates.frame
+        objects.update([("estimate frame", estimates.frame), ("partition index", estimates.index),
+                        ("aggregate cube", estimates.cube)])
+    try:
+        comparison = load_comparison_frame(args.comparison)
+        table = ComparisonTable(load_comparison_table_frame(args.comparison))
+    except FileNotFoundError:
+        comparison = table = None
+    if comparison is not None:
+        frames["enow_version_comparisons.csv"] = comparison
+        frames["Compare table"] = table.frame
+        objects.update([("comparison frame", comparison), ("Compare table", table)])
+    if not objects:
+        print("No dataset found.", file=sys.stderr)
+        return 1
+    print(format_report(frames, objects))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Error metrics comparing Open ENOW estimates with original ENOW values.
+
+The helpers take array-likes of reference (original ENOW) and estimated
+values and ignore any pair where either value is missing, so they can be
+applied directly to columns with gaps; their results match scikit-learn's
+mean_absolute_error and mean_squared_error. They average with masked_mean,
+which openenow.comparison_table also uses on its precomputed error terms,
+so the Compare statistics follow the same definitions.
+"""
+import numpy as np
+import pandas as pd
+
+# Output columns of grouped_error_metrics, ahead of the group columns.
+ERROR_METRIC_COLUMNS = [
+    'X_Value', 'Original ENOW Value', 'Open ENOW Estimate',
+    'Mean Percent Difference', 'Mean Absolute Error', 'Root Mean Squared Error'
+]
+
+
+def _paired_values(reference, estimate):
+    """Returns float arrays of the pairs where both values are present."""
+    reference = np.asarray(reference, dtype="float64")
+    estimate = np.asarray(estimate, dtype="float64")
+    present = ~(np.isnan(reference) | np.isnan(estimate))
+    return reference[present], estimate[present]
+
+
+def masked_mean(values, present):
+    """Returns the float64 mean of values where present is true, or NaN if it is nowhere true."""
+    count = int(np.count_nonzero(present))
+    if count == 0:
+        return np.nan
+    return float(np.asarray(values)[present].sum(dtype="float64") / count)
+
+
+def mean_absolute_error(reference, estimate):
+    """Returns the mean absolute difference between paired values, or NaN if there are no pairs."""
+    reference, estimate = _paired_values(reference, estimate)
+    return masked_mean(np.abs(estimate - reference), np.ones(reference.shape, dtype=bool))
+
+
+def root_mean_squared_error(reference, estimate):
+    """Returns the root mean squared difference between paired values, or NaN if there are no pairs."""
+    reference, estimate = _paired_values(reference, estimate)
+    return float(np.sqrt(masked_mean((estimate - reference) ** 2, np.ones(reference.shape, dtype=bool))))
+
+
+def mean_percent_difference(reference, estimate):
+    """
+    Returns the mean of 100 * (estimate - reference) / reference over paired
+    values, skipping zero references. NaN if no pair qualifies.
+    """
+    reference, estimate = _paired_values(reference, estimate)
+    nonzero = reference != 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_diff = 100 * (estimate - reference) / reference
+    return masked_mean(percent_diff, nonzero)
+
+
+def grouped_error_metrics(df, grouping_cols, estimate_col, reference_col, estimate_label='Open ENOW Estimate'):
+    """
+    Computes error statistics of estimate_col against reference_col for each group of rows.
+
+    Rows missing either value are ignored, as are groups left empty. The
+    percent difference skips rows whose reference value is zero. Residual
+    columns are computed once for the whole frame and reduced with a single
+    groupby, so the cost does not grow with the number of groups.
+
+    Returns one row per group with the ERROR_METRIC_COLUMNS followed by the
+    grouping columns, in sorted group order; the mean estimate column is named
+    estimate_label.
+    """
+    valid = df.dropna(subset=[reference_col, estimate_col])
+    reference = valid[reference_col].to_numpy(dtype="float64")
+    estimate = valid[estimate_col].to_numpy(dtype="float64")
+    residual = estimate - reference
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_diff = np.where(reference != 0, 100 * residual / reference, np.nan)
+
+    work = valid[grouping_cols].assign(
+        _reference=reference, _estimate=estimate, _percent_diff=percent_diff,
+        _abs_error=np.abs(residual), _sq_error=residual ** 2
+    )
+    stats = work.groupby(grouping_cols, observed=True, sort=True).agg(
+        reference=('_reference', 'mean'),
+        estimate=('_estimate', 'mean'),
+        mpd=('_percent_diff', 'mean'),
+        mae=('_abs_error', 'mean'),
+        mse=('_sq_error', 'mean'),
+    )
+
+    results = pd.DataFrame({
+        'X_Value': (stats['reference'] + stats['estimate']) / 2,
+        'Original ENOW Value': stats['reference'],
+        estimate_label: stats['estimate'],
+        'Mean Percent Difference': stats['mpd'],
+        'Mean Absolute Error': stats['mae'],
+        'Root Mean Squared Error': np.sqrt(stats['mse']),
+    }, index=stats.index)
+    return results.reset_index()[list(results.columns) + list(grouping_cols)]
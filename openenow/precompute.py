@@ -0,0 +1,477 @@
+"""
+Precomputed views of every dashboard selection.
+
+A batch job runs the query of every view the app opens on (each mode x
+geography x sector or industry x metric, at the mode's default year range;
+see the *_views functions) across a process pool and writes the results to a
+view store: one SQLite file in PRECOMPUTE_DIR holding each result pickled and
+compressed under its view key. The file is named after a digest of the input
+files it was built from, and PRECOMPUTE_DIR/current.json names the last store
+that was completed without errors.
+
+The app opens that store and, for a view whose inputs still match the files
+it was built from (same size and modification time, or same content), reads
+the result instead of querying the data; other selections, such as another
+year range, are computed as before. The job is resumable: rerun on the same
+inputs, it skips the views already stored. It also validates a data release:
+views that raise, come back empty or hold negative estimates are counted per
+mode, and any error keeps current.json on the previous store.
+
+    python -m openenow.precompute                 # build or resume the store for the current inputs
+    python -m openenow.precompute --workers 8     # size of the process pool (default: CPU count)
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import pandas as pd
+
+from openenow.comparison_table import ComparisonTable, comparison_table_frame, load_comparison_table_frame
+from openenow.cube import TOP_CONTRIBUTORS
+from openenow.data import (
+    CACHE_FORMAT_VERSION, COMPARISON_CSV, DORADO_CSV, OPEN_ENOW_CSV, file_sha256, file_signatures, format_bytes,
+    load_comparison_frame, write_atomic
+)
+from openenow.queries import (
+    ALL_COUNTIES, ALL_INDUSTRIES, ALL_SECTORS, ALL_STATES, default_comparison_years, default_estimate_years,
+    query_comparison, query_error_analysis, query_estimates
+)
+from openenow.refresh import UPDATES_DIR, EstimateStore
+from openenow.result_cache import normalize_key
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_DIR = os.environ.get("OPENENOW_PRECOMPUTE_DIR", "precomputed")
+# Bump when the query results change shape or content, to rebuild old stores.
+PRECOMPUTE_FORMAT_VERSION = 1
+CURRENT_MANIFEST = "current.json"
+
+ESTIMATE_METRICS = ["Employment", "Wages", "RealWages", "Establishments", "GDP", "RealGDP"]
+COMPARISON_METRICS = ["Employment", "Wages", "Establishments", "GDP", "RealGDP"]
+ERROR_ANALYSIS_METRICS = ["Employment", "Wages", "GDP"]
+ERROR_ANALYSIS_Y_AXES = ["Mean Percent Difference", "Mean Absolute Error", "Root Mean Squared Error"]
+ERROR_ANALYSIS_GROUPING = ["OceanSector"]
+# Views per task sent to a worker, and so per committed batch.
+BATCH_SIZE = 200
+
+
+# --- View keys ---
+def estimate_view(scale, state, geo, sector, industry, metric, year_range, top_n=TOP_CONTRIBUTORS, stable_top=False):
+    """Returns the view key of a query_estimates selection."""
+    return normalize_key("estimates", scale, state, geo, sector, industry, metric, year_range, top_n, stable_top)
+
+
+def comparison_view(state_name, county, sector, industry, metric, year_range):
+    """Returns the view key of a query_comparison selection."""
+    return normalize_key("comparison", state_name, county, sector, industry, metric, year_range)
+
+
+def error_analysis_view(aggregation, geoscale, grouping_vars, metric, year_range, state_abbr, sector, y_axis,
+                        exclude_outliers, estimate):
+    """Returns the view key of a query_error_analysis selection."""
+    return normalize_key(
+        "error_analysis", aggregation, geoscale, grouping_vars, metric, year_range, state_abbr, sector, y_axis,
+        exclude_outliers, estimate
+    )
+
+
+def view_group(key):
+    """Returns the input group a view is computed from: "estimates" or "comparison"."""
+    return "estimates" if key[0] == "estimates" else "comparison"
+
+
+# --- Datasets and views ---
+@dataclass
+class Datasets:
+    """The inputs the views are computed from; a part is None when its file is missing."""
+    estimates: object
+    comparison: pd.DataFrame
+    comparison_table: ComparisonTable
+    state_abbrs: dict
+
+
+def load_datasets(path=OPEN_ENOW_CSV, updates_dir=UPDATES_DIR, comparison_path=COMPARISON_CSV,
+                  dorado_path=DORADO_CSV):
+    """Loads the estimates (with their index and cube) and the comparison data and table, as the app does."""
+    estimates = EstimateStore(path=path, updates_dir=updates_dir, shared_dir="").current()
+    try:
+        comparison = load_comparison_frame(comparison_path, dorado_path)
+        # The stored table is built with DORADO_CSV; other DORADO files get a table of their own.
+        table = ComparisonTable(
+            load_comparison_table_frame(comparison_path) if dorado_path == DORADO_CSV else comparison_table_frame(comparison)
+        )
+    except FileNotFoundError:
+        comparison, table = None, None
+    state_abbrs = {}
+    if comparison is not None:
+        state_rows = comparison[comparison["GeoScale"] == "State"]
+        state_abbrs = dict(zip(state_rows["GeoName"], state_rows["state"]))
+    return Datasets(estimates, comparison, table, state_abbrs)
+
+
+def estimate_views(index):
+    """Yields the view key of every States, Counties and Regions selection at the default year range."""
+    year_range = default_estimate_years(index.year_bounds)
+    econ_choices = [(ALL_SECTORS, ALL_INDUSTRIES)] + [(sector, ALL_INDUSTRIES) for sector in index.sectors]
+    # Only the States mode offers industries.
+    state_choices = econ_choices + [
+        (sector, industry) for sector in index.sectors for industry in index.industries_by_sector.get(sector, [])
+    ]
+    geos = {
+        "State": [(None, None)] + [(None, geo) for geo in index.geos_by_scale.get("State", [])],
+        "Region": [(None, None)] + [(None, geo) for geo in index.geos_by_scale.get("Region", [])],
+        "County": [(state, county) for state, counties in index.counties_by_state.items() for county in counties],
+    }
+    for scale, selections in geos.items():
+        for state, geo in selections:
+            for sector, industry in (state_choices if scale == "State" else econ_choices):
+                for metric in ESTIMATE_METRICS:
+                    yield estimate_view(scale, state, geo, sector, industry, metric, year_range)
+
+
+def comparison_views(df, table):
+    """Yields the view key of every Compare selection at the default year range."""
+    year_range = default_comparison_years((int(df["Year"].min()), int(df["Year"].max())))
+    state_rows = df[df["GeoScale"] == "State"]
+    states = dict(zip(state_rows["GeoName"], state_rows["state"]))
+    sectors = sorted(df["OceanSector"].dropna().unique())
+    industry_rows = df[df["aggregation"] == "Industry"]
+    industries = {
+        sector: sorted(industry_rows.loc[industry_rows["OceanSector"] == sector, "OceanIndustry"].dropna().unique())
+        for sector in sectors
+    }
+    econ_choices = [(ALL_SECTORS, ALL_INDUSTRIES)] + [
+        (sector, industry) for sector in sectors for industry in [ALL_INDUSTRIES] + industries[sector]
+    ]
+    selections = [(ALL_STATES, ALL_COUNTIES)] + [
+        (state, county) for state in sorted(states)
+        for county in [ALL_COUNTIES] + table.counties_by_state.get(states[state], [])
+    ]
+    for state, county in selections:
+        for sector, industry in econ_choices:
+            for metric in COMPARISON_METRICS:
+                yield comparison_view(state, county, sector, industry, metric, year_range)
+
+
+def error_analysis_views(df):
+    """
+    Yields the view key of every Error Analysis aggregation, scale, state and
+    sector filter, metric, error metric and estimate, with the default grouping
+    and outliers kept, over all years.
+    """
+    year_range = (int(df["Year"].min()), int(df["Year"].max()))
+    states = [None] + sorted(df.loc[df["GeoScale"] == "State", "state"].dropna().unique())
+    sectors = [ALL_SECTORS] + sorted(df["OceanSector"].dropna().unique())
+    estimates = ["Open"] + (["DORADO"] if df["DORADO_Employment"].notna().any() else [])
+    for aggregation in ("Sector", "Industry"):
+        for geoscale in ("State", "County"):
+            for state_abbr in states:
+                for sector in sectors:
+                    for metric in ERROR_ANALYSIS_METRICS:
+                        for y_axis in ERROR_ANALYSIS_Y_AXES:
+                            for estimate in estimates:
+                                yield error_analysis_view(
+                                    aggregation, geoscale, ERROR_ANALYSIS_GROUPING, metric, year_range, state_abbr,
+                                    sector, y_axis, False, estimate
+                                )
+
+
+def all_views(datasets):
+    """Returns the view key of every precomputed selection the datasets support."""
+    views = []
+    if datasets.estimates is not None:
+        views += estimate_views(datasets.estimates.index)
+    if datasets.comparison is not None:
+        views += comparison_views(datasets.comparison, datasets.comparison_table)
+        views += error_analysis_views(datasets.comparison)
+    return views
+
+
+def compute_view(datasets, key):
+    """Runs the query behind a view key and returns its result."""
+    kind, params = key[0], key[1:]
+    if kind == "estimates":
+        scale, state, geo, sector, industry, metric, year_range, top_n, stable_top = params
+        return query_estimates(
+            datasets.estimates.cube, scale, geo, sector, industry, metric, year_range, state=state, top_n=top_n,
+            stable_top=stable_top
+        )
+    if kind == "comparison":
+        state_name, county, sector, industry, metric, year_range = params
+        return query_comparison(
+            datasets.comparison_table, state_name, county, sector, industry, metric, year_range,
+            state_abbr=datasets.state_abbrs.get(state_name, "All")
+        )
+    if kind == "error_analysis":
+        aggregation, geoscale, grouping_vars, metric, year_range, state_abbr, sector, y_axis, exclude_outliers, estimate = params
+        return query_error_analysis(
+            datasets.comparison, aggregation, geoscale, list(grouping_vars), metric, year_range, state_abbr=state_abbr,
+            sector=sector, y_axis=y_axis, exclude_outliers=exclude_outliers, estimate=estimate
+        )
+    raise ValueError(f"Unknown view kind {kind!r}")
+
+
+def view_issues(key, result):
+    """Returns the validation issues of a view's result: "empty" and "negative" (estimates below zero)."""
+    if result is None:
+        return ["empty"]
+    if key[0] == "estimates":
+        frame, column = result.chart_df, "Estimate_value"
+    elif key[0] == "comparison":
+        frame, column = result.compare_df.dropna(how="all", subset=list(result.compare_df.columns[1:])), None
+    else:
+        frame, column = result.results_df, None
+    if frame is None or frame.empty:
+        return ["empty"]
+    if column is not None and (frame[column] < 0).any():
+        return ["negative"]
+    return []
+
+
+# --- Store ---
+def key_text(key):
+    """Returns the text a view key is stored under."""
+    return json.dumps(key, separators=(",", ":"))
+
+
+def source_digests(paths):
+    """Maps each existing path to [size, mtime_ns, sha256]."""
+    return {
+        path: signature + [file_sha256(path)]
+        for path, signature in file_signatures(paths).items() if signature is not None
+    }
+
+
+def store_name(sources):
+    """Returns the file name of the store built from sources ({group: source_digests(...)})."""
+    digest = hashlib.sha256(json.dumps([
+        PRECOMPUTE_FORMAT_VERSION, CACHE_FORMAT_VERSION,
+        {group: sorted([os.path.basename(path), entry[2]] for path, entry in entries.items())
+         for group, entries in sorted(sources.items())}
+    ]).encode()).hexdigest()
+    return f"views-{digest[:16]}.sqlite"
+
+
+class ViewStore:
+    """
+    Precomputed query results in one SQLite file, keyed by view key. Opened
+    read-only unless writable; safe to share between threads.
+    """
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        if writable:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS views (key TEXT PRIMARY KEY, kind TEXT, issues TEXT, value BLOB);
+                CREATE TABLE IF NOT EXISTS errors (key TEXT PRIMARY KEY, kind TEXT, error TEXT);
+            """)
+        else:
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._matched = {}
+        self.meta = {name: json.loads(value) for name, value in self._db.execute("SELECT name, value FROM meta")}
+
+    def close(self):
+        self._db.close()
+
+    def set_meta(self, **values):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)", [(name, json.dumps(value)) for name, value in values.items()]
+            )
+        self.meta.update(values)
+
+    def stored_keys(self):
+        """Returns the key texts of the views already stored."""
+        with self._lock:
+            return {key for (key,) in self._db.execute("SELECT key FROM views")}
+
+    def write(self, rows):
+        """Stores (key text, kind, issues, compressed value or None, error or None) rows in one transaction."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO views VALUES (?, ?, ?, ?)",
+                [(key, kind, json.dumps(issues), value) for key, kind, issues, value, error in rows if error is None]
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO errors VALUES (?, ?, ?)",
+                [(key, kind, error) for key, kind, _, _, error in rows if error is not None]
+            )
+            self._db.executemany(
+                "DELETE FROM errors WHERE key = ?", [(key,) for key, _, _, _, error in rows if error is None]
+            )
+
+    def serves(self, group, sources):
+        """
+        True if the views of group ("estimates" or "comparison") were built
+        from the files in sources ({path: (size, mtime_ns) or None}): the same
+        files, each with the recorded size and modification time or content.
+        """
+        current = {path: list(signature) for path, signature in sources.items() if signature is not None}
+        memo_key = json.dumps([group, sorted(current.items())])
+        if memo_key not in self._matched:
+            recorded = self.meta.get("sources", {}).get(group)
+            self._matched[memo_key] = recorded is not None and set(recorded) == set(current) and all(
+                recorded[path][:2] == signature
+                or (recorded[path][0] == signature[0] and recorded[path][2] == file_sha256(path))
+                for path, signature in current.items()
+            )
+        return self._matched[memo_key]
+
+    def get(self, key):
+        """Returns the stored result of a view key, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM views WHERE key = ?", (key_text(key),)).fetchone()
+        return None if row is None else pickle.loads(zlib.decompress(row[0]))
+
+    def summary(self):
+        """Returns per view kind: views stored, empty, negative and errors."""
+        with self._lock:
+            counts = {}
+            for kind, issues, n in self._db.execute("SELECT kind, issues, COUNT(*) FROM views GROUP BY kind, issues"):
+                entry = counts.setdefault(kind, {"views": 0, "empty": 0, "negative": 0, "errors": 0})
+                entry["views"] += n
+                for issue in json.loads(issues):
+                    entry[issue] += n
+            for kind, n in self._db.execute("SELECT kind, COUNT(*) FROM errors GROUP BY kind"):
+                counts.setdefault(kind, {"views": 0, "empty": 0, "negative": 0, "errors": 0})["errors"] += n
+        return counts
+
+    def errors(self, limit=10):
+        """Returns up to limit (key text, error) rows."""
+        with self._lock:
+            return self._db.execute("SELECT key, error FROM errors ORDER BY key LIMIT ?", (limit,)).fetchall()
+
+
+def open_view_store(precompute_dir=None):
+    """Returns the ViewStore named by current.json in precompute_dir (default PRECOMPUTE_DIR), or None."""
+    precompute_dir = precompute_dir or PRECOMPUTE_DIR
+    try:
+        with open(os.path.join(precompute_dir, CURRENT_MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != PRECOMPUTE_FORMAT_VERSION:
+            return None
+        return ViewStore(os.path.join(precompute_dir, manifest["store"]))
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        logger.debug("No precomputed views in %s: %s", precompute_dir, e)
+        return None
+
+
+# --- Batch job ---
+_worker_datasets = None
+
+
+def _init_worker(paths):
+    global _worker_datasets
+    logging.getLogger("openenow").setLevel(logging.WARNING)
+    _worker_datasets = load_datasets(**paths)
+
+
+def _compute_batch(keys):
+    rows = []
+    for key in keys:
+        try:
+            result = compute_view(_worker_datasets, key)
+        except Exception as e:  # Reported as a validation error rather than ending the job.
+            rows.append((key_text(key), key[0], [], None, f"{type(e).__name__}: {e}"))
+            continue
+        value = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        rows.append((key_text(key), key[0], view_issues(key, result), value, None))
+    return rows
+
+
+def precompute(paths, precompute_dir=None, workers=None, log=print):
+    """
+    Builds or resumes the view store for the input files in paths (keyword
+    arguments of load_datasets) and returns it. current.json is pointed at
+    the store once every view is stored without error.
+    """
+    precompute_dir = precompute_dir or PRECOMPUTE_DIR
+    started = time.perf_counter()
+    datasets = load_datasets(**paths)
+    estimate_files = list(datasets.estimates.sources) if datasets.estimates is not None else []
+    sources = {
+        "estimates": source_digests(estimate_files),
+        "comparison": source_digests([paths["comparison_path"], paths["dorado_path"]]),
+    }
+    views = all_views(datasets)
+    name = store_name(sources)
+    os.makedirs(precompute_dir, exist_ok=True)
+    store = ViewStore(os.path.join(precompute_dir, name), writable=True)
+    store.set_meta(format=PRECOMPUTE_FORMAT_VERSION, sources=sources, views=len(views))
+    done = store.stored_keys()
+    pending = [key for key in views if key_text(key) not in done]
+    log(f"{len(views):,} views, {len(views) - len(pending):,} already in {store.path}; loaded in {time.perf_counter() - started:.1f}s")
+
+    batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+    computed, last_report, run_started = 0, 0.0, time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(paths,)) as pool:
+        futures = [pool.submit(_compute_batch, batch) for batch in batches]
+        try:
+            for future in as_completed(futures):
+                rows = future.result()
+                store.write(rows)
+                computed += len(rows)
+                elapsed = time.perf_counter() - run_started
+                if elapsed - last_report >= 2 or computed == len(pending):
+                    last_report = elapsed
+                    rate = computed / elapsed if elapsed else 0
+                    remaining = (len(pending) - computed) / rate if rate else 0
+                    log(f"  {computed:,}/{len(pending):,} views ({rate:,.0f}/s, {remaining:,.0f}s left)")
+        except KeyboardInterrupt:
+            pool.shutdown(cancel_futures=True)
+            log(f"Interrupted; {computed:,} views stored. Rerun to resume.")
+            raise
+
+    summary = store.summary()
+    errors = sum(entry["errors"] for entry in summary.values())
+    stored = sum(entry["views"] for entry in summary.values())
+    if not errors and stored == len(views):
+        manifest = {"format": PRECOMPUTE_FORMAT_VERSION, "store": name, "views": stored}
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+        write_atomic(os.path.join(precompute_dir, CURRENT_MANIFEST), write)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m openenow.precompute", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=OPEN_ENOW_CSV, help="Open ENOW input")
+    parser.add_argument("--updates-dir", default=UPDATES_DIR, help="directory of update files merged into the input")
+    parser.add_argument("--comparison", default=COMPARISON_CSV, help="comparison input")
+    parser.add_argument("--dorado", default=DORADO_CSV, help="DORADO input")
+    parser.add_argument("--output-dir", default=PRECOMPUTE_DIR, help=f"store directory (default: {PRECOMPUTE_DIR})")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    paths = dict(path=args.data, updates_dir=args.updates_dir, comparison_path=args.comparison, dorado_path=args.dorado)
+    store = precompute(paths, args.output_dir, args.workers, log=lambda msg: print(msg, file=sys.stderr))
+    print(f"{'Views':<16}{'stored':>10}{'empty':>10}{'negative':>10}{'errors':>10}")
+    status = 0
+    for kind, entry in sorted(store.summary().items()):
+        print(f"{kind:<16}{entry['views']:>10,}{entry['empty']:>10,}{entry['negative']:>10,}{entry['errors']:>10,}")
+        status = status or int(entry["errors"] > 0)
+    for key, error in store.errors():
+        print(f"  {key}: {error}", file=sys.stderr)
+    print(f"{store.path}: {format_bytes(os.path.getsize(store.path))}"
+          + ("" if status else f", now current in {args.output_dir}"))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Opt-in per-rerun profiling.
+
+A RerunProfile records how long each stage of one script run takes (data
+loading, filters, aggregation, chart build and render, table pivot, CSV
+export) and how many rows go into and come out of it. The app shows the
+stages in a sidebar panel and appends each rerun as one JSON line to
+PROFILE_LOG, so slow reruns reported by users can be analysed offline.
+
+Profiling is off unless OPENENOW_PROFILE is set to a true value or the page
+is opened with ?profile=1. When it is off, the app uses NULL_PROFILE, whose
+methods only call through.
+"""
+import datetime
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "OPENENOW_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_LOG = os.environ.get("OPENENOW_PROFILE_LOG", "openenow_profile.jsonl")
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def profiling_requested(query_params=None):
+    """True if profiling is switched on by the environment or a query parameter value."""
+    if os.environ.get(PROFILE_ENV, "").strip().lower() in TRUE_VALUES:
+        return True
+    value = (query_params or {}).get(PROFILE_QUERY_PARAM, "")
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def row_count(obj):
+    """Returns the number of rows of a DataFrame, Series or query result, or None."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    for attr in ("chart_df", "compare_df", "results_df"):  # Query results (see openenow.queries)
+        frame = getattr(obj, attr, None)
+        if isinstance(frame, pd.DataFrame):
+            return len(frame)
+    return None
+
+
+class StageRecord:
+    """Timing and row counts of one stage; rows_out may be set inside the stage."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name, "ms": round(self.seconds * 1000, 3),
+            "rows_in": self.rows_in, "rows_out": self.rows_out,
+        }
+
+
+class RerunProfile:
+    """Stage timings for one script run."""
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.context = {}
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = StageRecord(name, rows_in)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - started
+            self.stages.append(record)
+
+    def note(self, **values):
+        """Records selections or other context of this rerun for the log."""
+        self.context.update(values)
+
+    def time(self, name, func, *args, rows_in=None, **kwargs):
+        """Calls func(*args, **kwargs) as a stage; rows_out is taken from the result."""
+        with self.stage(name, rows_in) as record:
+            result = func(*args, **kwargs)
+            record.rows_out = row_count(result)
+        return result
+
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def summary_frame(self):
+        """Returns the stages as a DataFrame for display."""
+        columns = ["stage", "ms", "rows_in", "rows_out"]
+        return pd.DataFrame([record.to_dict() for record in self.stages], columns=columns)
+
+    def to_dict(self):
+        return {
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "total_ms": round(self.total_seconds() * 1000, 3),
+            "context": self.context,
+            "stages": [record.to_dict() for record in self.stages],
+        }
+
+    def append_to_log(self, path=PROFILE_LOG):
+        """Appends this rerun to the JSON-lines log; failures are logged, not raised."""
+        try:
+            with open(path, "a") as f:
+                f.write(json.dumps(self.to_dict(), default=str) + "\n")
+        except OSError as exc:
+            logger.warning("Could not write profile log %s: %s", path, exc)
+
+
+class NullProfile:
+    """Stand-in for RerunProfile when profiling is off."""
+
+    enabled = False
+
+    def note(self, **values):
+        pass
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        yield StageRecord(name, rows_in)
+
+    def time(self, name, func, *args, rows_in=None, **kwargs):
+        return func(*args, **kwargs)
+
+
+NULL_PROFILE = NullProfile()
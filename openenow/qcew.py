@@ -0,0 +1,326 @@
+"""
+Building openENOWinput.csv from raw QCEW files.
+
+The build reads the BLS county-level QCEW annual files of each year (the
+annual "singlefile" CSV or its zip, or the CSVs of an annual "by_area"
+download) from a local directory, streaming them in chunks and keeping only
+private-ownership rows of the coastal counties in COUNTIES_CSV and the NAICS
+codes of openenow.sectors. Those codes count toward a sector only in the
+years their "Years" label covers, so a lookup of NAICS code to industry is
+precomputed for each year. Each industry is named after the description of
+its codes, so codes that replaced one another across NAICS revisions (e.g.
+722110 and 722511, "Full-Service Restaurants") form one industry.
+
+Suppressed cells (disclosure code "N") are left out of every total and
+counted; no values are imputed. County cells are summed to the sector and
+industry totals of every county, coastal state and region. Real wages,
+GDP and real GDP are derived from wages when a CPI file and a file of
+GDP-to-wage ratios are given, and left empty otherwise.
+
+Years are built in parallel, one per worker process, and written to the
+output in year order as they finish. The output goes to a temporary file
+that replaces the target when complete, so the app can keep reading the
+previous file; with --years, the result can be dropped into the updates
+directory instead (see openenow.refresh).
+
+    python -m openenow.qcew qcew/                                   # rebuild openENOWinput.csv
+    python -m openenow.qcew qcew/ --years 2024 --output updates/2024.csv
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from openenow.data import OPEN_ENOW_CSV, format_bytes, write_atomic
+from openenow.sectors import SECTOR_DESCRIPTIONS
+
+logger = logging.getLogger(__name__)
+
+# Coastal counties: area_fips, geoName, state (abbreviation), stateName and region (blank for none).
+COUNTIES_CSV = "coastal_counties.csv"
+COUNTY_COLUMNS = ["area_fips", "geoName", "state", "stateName", "region"]
+# Optional inputs for the derived metrics: year, cpi; and state, enowSector, gdp_ratio, rgdp_ratio.
+CPI_COLUMNS = ["year", "cpi"]
+GDP_RATIO_COLUMNS = ["state", "enowSector", "gdp_ratio", "rgdp_ratio"]
+# Real wages are in dollars of this year.
+CPI_BASE_YEAR = 2024
+
+PRIVATE_OWNERSHIP = "5"
+SUPPRESSED = "N"
+# Rows parsed at a time; a year's singlefile has several million.
+CHUNK_ROWS = 500_000
+
+# QCEW columns read, and the output metric each is summed into.
+QCEW_DTYPES = {"area_fips": str, "own_code": str, "industry_code": str, "year": "int32", "disclosure_code": str}
+QCEW_METRICS = {
+    "annual_avg_estabs": "establishments",
+    "annual_avg_estabs_count": "establishments",  # The name in the by_area files.
+    "annual_avg_emplvl": "employment",
+    "total_annual_wages": "wages",
+}
+OUTPUT_COLUMNS = [
+    "geoType", "geoName", "state", "stateName", "year", "enowSector", "enowIndustry", "aggregation",
+    "establishments", "employment", "wages", "real_wages", "gdp", "rgdp",
+]
+METRICS = ["establishments", "employment", "wages", "real_wages", "gdp", "rgdp"]
+
+# An annual file belongs to the year its name starts with, e.g. "2021.annual.singlefile.csv".
+_YEAR_FILE = re.compile(r"^(\d{4})[._ ]annual.*\.(csv|csv\.gz|zip)$")
+# The by_area files name their area, e.g. "2021.annual 01003 Baldwin County, Alabama.csv".
+_AREA_FILE = re.compile(r"^\d{4}\.annual (\w{5}) ")
+
+
+# --- NAICS lookup ---
+def naics_years(label):
+    """Returns the (first, last) years of a "Years" label of SECTOR_DESCRIPTIONS, None for an open end."""
+    if label.strip().casefold() == "all years":
+        return None, None
+    first, _, last = (part.strip() for part in label.partition("-"))
+    return int(first), None if last.casefold() == "present" else int(last)
+
+
+def naics_table(sectors=SECTOR_DESCRIPTIONS):
+    """Returns one row per NAICS code of sectors: naics, first_year, last_year, enowSector, enowIndustry."""
+    rows = []
+    for sector, info in sectors.items():
+        for code in info["table"].itertuples(index=False):
+            first, last = naics_years(code.Years)
+            rows.append((str(code[0]), first, last, sector, code.Description))
+    return pd.DataFrame(rows, columns=["naics", "first_year", "last_year", "enowSector", "enowIndustry"])
+
+
+def naics_lookup(table, year):
+    """
+    Returns {NAICS code: (sector, industry)} for the codes table counts in
+    year. Raises ValueError if a code of the year is listed twice or contains
+    another, since its rows would be counted twice.
+    """
+    in_year = (table["first_year"].isna() | (table["first_year"] <= year)) & (table["last_year"].isna() | (table["last_year"] >= year))
+    rows = table[in_year]
+    codes = sorted(rows["naics"])
+    for code, following in zip(codes, codes[1:]):
+        if following == code:
+            raise ValueError(f"NAICS {code} is listed twice for {year}")
+        if following.startswith(code):
+            raise ValueError(f"NAICS {following} is part of {code}; both count toward {year}")
+    return {row.naics: (row.enowSector, row.enowIndustry) for row in rows.itertuples(index=False)}
+
+
+# --- Inputs ---
+def read_counties(path=COUNTIES_CSV):
+    """Returns the coastal counties of path indexed by 5-digit area_fips, with a blank region read as None."""
+    counties = pd.read_csv(path, dtype=str)
+    missing = [col for col in COUNTY_COLUMNS if col not in counties.columns and col != "region"]
+    if missing:
+        raise ValueError(f"{path} lacks the columns {', '.join(missing)}")
+    counties = counties.reindex(columns=COUNTY_COLUMNS)
+    counties["area_fips"] = counties["area_fips"].str.strip().str.zfill(5)
+    repeated = counties["area_fips"][counties["area_fips"].duplicated()]
+    if len(repeated):
+        raise ValueError(f"{path} lists {', '.join(sorted(set(repeated)))} more than once")
+    counties["region"] = counties["region"].where(counties["region"].str.strip().astype(bool), None)
+    return counties.set_index("area_fips")
+
+
+def read_cpi(path, base_year=CPI_BASE_YEAR):
+    """Returns {year: factor} converting that year's dollars to base_year dollars."""
+    cpi = pd.read_csv(path, usecols=CPI_COLUMNS).dropna().set_index("year")["cpi"]
+    if base_year not in cpi.index:
+        raise ValueError(f"{path} has no CPI for {base_year}")
+    return {int(year): float(cpi[base_year] / value) for year, value in cpi.items()}
+
+
+def read_gdp_ratios(path):
+    """Returns {(state, sector): (gdp_ratio, rgdp_ratio)}, the GDP and real GDP per dollar of wages."""
+    ratios = pd.read_csv(path, usecols=GDP_RATIO_COLUMNS, dtype={"state": str, "enowSector": str})
+    return {(row.state, row.enowSector): (row.gdp_ratio, row.rgdp_ratio) for row in ratios.itertuples(index=False)}
+
+
+def qcew_files(qcew_dir, fips=None):
+    """
+    Returns {year: [paths]} of the QCEW files under qcew_dir, by the year
+    their names start with. by_area files of areas not in fips are skipped.
+    """
+    files = {}
+    for root, dirs, names in os.walk(qcew_dir):
+        dirs.sort()
+        for name in sorted(names):
+            match = _YEAR_FILE.match(name)
+            if not match:
+                continue
+            area = _AREA_FILE.match(name)
+            if area and fips is not None and area.group(1) not in fips:
+                continue
+            files.setdefault(int(match.group(1)), []).append(os.path.join(root, name))
+    return files
+
+
+# --- One year ---
+@dataclass
+class YearBuild:
+    """The output rows of one year, with the counts reported for it."""
+    year: int
+    rows: pd.DataFrame
+    files: int
+    cells: int
+    suppressed: int
+    counties: int
+    seconds: float
+
+
+def read_year_cells(paths, year, lookup, fips, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the QCEW files of one year and returns (cells, suppressed): the
+    disclosed private-ownership rows of the counties in fips and the codes
+    in lookup, with area_fips, industry_code and the output metrics, and the
+    number of such rows that were suppressed.
+    """
+    wanted = set(QCEW_DTYPES) | set(QCEW_METRICS)
+    parts = []
+    suppressed = 0
+    for path in paths:
+        reader = pd.read_csv(path, usecols=lambda col: col in wanted, dtype=QCEW_DTYPES, chunksize=chunk_rows)
+        for chunk in reader:
+            keep = (chunk["own_code"] == PRIVATE_OWNERSHIP) & chunk["industry_code"].isin(lookup) & chunk["area_fips"].isin(fips)
+            if "year" in chunk.columns:
+                keep &= chunk["year"] == year
+            chunk = chunk[keep]
+            hidden = chunk["disclosure_code"].fillna("").str.strip() == SUPPRESSED
+            suppressed += int(hidden.sum())
+            parts.append(chunk.loc[~hidden, ["area_fips", "industry_code", *(col for col in QCEW_METRICS if col in chunk.columns)]])
+    if not parts:
+        return pd.DataFrame(columns=["area_fips", "industry_code", "establishments", "employment", "wages"]), suppressed
+    cells = pd.concat(parts, ignore_index=True).rename(columns=QCEW_METRICS)
+    return cells, suppressed
+
+
+def _sum_strict(frame, keys):
+    """Sums METRICS over keys; a total with any missing part is missing."""
+    grouped = frame.groupby(keys, sort=True, dropna=False, observed=True)[METRICS]
+    totals = grouped.sum()
+    return totals.where(grouped.count().eq(grouped.size(), axis=0)).reset_index()
+
+
+def year_rows(cells, year, lookup, counties, cpi=None, gdp_ratios=None):
+    """
+    Returns the output rows of one year from its county cells (see
+    read_year_cells): sector and industry totals of every county, state and
+    region, in the columns of OUTPUT_COLUMNS.
+    """
+    econ = pd.DataFrame([lookup[code] for code in cells["industry_code"]], columns=["enowSector", "enowIndustry"], dtype=object)
+    geo = counties.loc[cells["area_fips"]].reset_index(drop=True)
+    cells = pd.concat([cells.reset_index(drop=True).drop(columns=["area_fips", "industry_code"]), geo, econ], axis=1)
+    cells["real_wages"] = cells["wages"] * cpi[year] if cpi and year in cpi else np.nan
+    ratios = [(gdp_ratios or {}).get(key, (np.nan, np.nan)) for key in zip(cells["state"], cells["enowSector"])]
+    ratios = np.array(ratios, dtype=np.float64).reshape(-1, 2)
+    cells["gdp"] = cells["wages"] * ratios[:, 0]
+    cells["rgdp"] = cells["wages"] * ratios[:, 1]
+
+    levels = [
+        ("State", cells.assign(geoName=cells["stateName"])),
+        ("County", cells),
+        ("Region", cells.dropna(subset=["region"]).assign(geoName=lambda df: df["region"], state=None, stateName=None)),
+    ]
+    frames = []
+    for geo_type, level in levels:
+        geo_keys = ["geoName", "state", "stateName"]
+        sectors = _sum_strict(level, geo_keys + ["enowSector"]).assign(enowIndustry=None, aggregation="Sector")
+        industries = _sum_strict(level, geo_keys + ["enowSector", "enowIndustry"]).assign(aggregation="Industry")
+        frame = pd.concat([sectors, industries], ignore_index=True).assign(geoType=geo_type, year=year)
+        order = frame["aggregation"].map({"Sector": 0, "Industry": 1})
+        frames.append(frame.assign(_order=order).sort_values(["state", "geoName", "enowSector", "_order", "enowIndustry"],
+                                                              na_position="first", kind="stable"))
+    return pd.concat(frames, ignore_index=True)[OUTPUT_COLUMNS]
+
+
+def build_year(year, paths, table, counties, cpi=None, gdp_ratios=None, chunk_rows=CHUNK_ROWS):
+    """Reads and aggregates one year's QCEW files into a YearBuild."""
+    started = time.perf_counter()
+    lookup = naics_lookup(table, year)
+    cells, suppressed = read_year_cells(paths, year, lookup, set(counties.index), chunk_rows)
+    rows = year_rows(cells, year, lookup, counties, cpi, gdp_ratios)
+    return YearBuild(
+        year=year, rows=rows, files=len(paths), cells=len(cells), suppressed=suppressed,
+        counties=cells["area_fips"].nunique(), seconds=time.perf_counter() - started,
+    )
+
+
+# --- Build ---
+def build_open_enow(qcew_dir, output=OPEN_ENOW_CSV, counties_path=COUNTIES_CSV, years=None, cpi_path=None,
+                    gdp_ratios_path=None, cpi_base_year=CPI_BASE_YEAR, workers=None, log=print):
+    """
+    Builds the output file from the QCEW files in qcew_dir, one year per
+    worker process, and returns the YearBuilds in year order. years limits
+    the build to those years. Rows are appended to a temporary file as their
+    years complete, in year order, and the file replaces output at the end.
+    """
+    counties = read_counties(counties_path)
+    table = naics_table()
+    cpi = read_cpi(cpi_path, cpi_base_year) if cpi_path else None
+    gdp_ratios = read_gdp_ratios(gdp_ratios_path) if gdp_ratios_path else None
+    files = qcew_files(qcew_dir, set(counties.index))
+    if years is not None:
+        files = {year: paths for year, paths in files.items() if year in set(years)}
+    if not files:
+        raise ValueError(f"No QCEW files for the requested years in {qcew_dir}")
+    log(f"{len(files)} years, {sum(map(len, files.values())):,} files, {len(counties):,} coastal counties")
+
+    builds = []
+
+    def write(tmp_path):
+        with open(tmp_path, "w", newline="") as f, ProcessPoolExecutor(max_workers=workers) as pool:
+            f.write(",".join(OUTPUT_COLUMNS) + "\n")
+            futures = {
+                year: pool.submit(build_year, year, paths, table, counties, cpi, gdp_ratios)
+                for year, paths in sorted(files.items())
+            }
+            for year, future in futures.items():
+                build = future.result()
+                build.rows.to_csv(f, header=False, index=False)
+                f.flush()
+                log(f"  {year}: {len(build.rows):,} rows from {build.cells:,} cells in {build.files} files, "
+                    f"{build.suppressed:,} suppressed, {build.counties:,} counties ({build.seconds:.1f}s)")
+                builds.append(build)
+    write_atomic(output, write)
+    return builds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m openenow.qcew", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("qcew_dir", help="directory of QCEW annual files (singlefile or by_area CSVs, optionally zipped)")
+    parser.add_argument("--output", default=OPEN_ENOW_CSV, help=f"output file (default: {OPEN_ENOW_CSV})")
+    parser.add_argument("--counties", default=COUNTIES_CSV, help=f"coastal counties (default: {COUNTIES_CSV})")
+    parser.add_argument("--years", help="years to build, e.g. 2024 or 2012-2024 (default: every year found)")
+    parser.add_argument("--cpi", help="CPI by year, for real wages")
+    parser.add_argument("--cpi-base-year", type=int, default=CPI_BASE_YEAR, help="dollar year of real wages")
+    parser.add_argument("--gdp-ratios", help="GDP and real GDP per dollar of wages by state and sector")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    years = None
+    if args.years:
+        first, _, last = args.years.partition("-")
+        years = range(int(first), int(last or first) + 1)
+    started = time.perf_counter()
+    builds = build_open_enow(
+        args.qcew_dir, args.output, args.counties, years, args.cpi, args.gdp_ratios, args.cpi_base_year, args.workers,
+        log=lambda msg: print(msg, file=sys.stderr)
+    )
+    rows = sum(len(build.rows) for build in builds)
+    suppressed = sum(build.suppressed for build in builds)
+    print(f"{args.output}: {rows:,} rows for {builds[0].year}-{builds[-1].year}, "
+          f"{format_bytes(os.path.getsize(args.output))}, in {time.perf_counter() - started:.1f}s; "
+          f"{suppressed:,} suppressed cells left out")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+Headless query API behind the app's display modes.
+
+Each function takes the loaded data plus the user's selections and returns
+plain DataFrames and numbers; none of them touch Streamlit. app.py renders
+their results, and the same calls can be profiled, memoized or load-tested
+without a running Streamlit session.
+
+Selections use the labels shown in the app ("All Marine Sectors", ...), and
+metrics use the internal suffix of the metric columns ("Employment", "GDP", ...).
+The query functions take an optional `profile` (see openenow.profiling) that
+times their stages.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from openenow.comparison_table import COMPARISON_SOURCES, REFERENCE
+from openenow.cube import TOP_CONTRIBUTOR_SCALES, TOP_CONTRIBUTORS
+from openenow.data import OPEN_ENOW_ALIASES
+from openenow.metrics import grouped_error_metrics
+from openenow.profiling import NULL_PROFILE
+
+ALL_SECTORS = "All Marine Sectors"
+ALL_INDUSTRIES = "All Marine Industries"
+ALL_STATES = "All Coastal States"
+ALL_COUNTIES = "All Coastal Counties"
+# Years the estimate modes open on, ending at the latest year.
+ESTIMATE_DEFAULT_YEARS = 10
+# Years Compare opens on, clipped to the data.
+COMPARISON_DEFAULT_YEARS = (2012, 2021)
+
+
+# --- Estimate modes (States, Counties, Regions) ---
+@dataclass
+class EstimateResult:
+    """
+    Chart data, table and summary numbers for one estimate-mode selection.
+
+    chart_kind is "by_sector" (stacked by sector), "by_geo" (stacked by top
+    geographies) or "single" (one bar per year). chart_df holds Year, the
+    stacking column if any, and Estimate_value in the metric's own units.
+    latest_value and start_value are the totals at the ends of the year range,
+    or None when the selection has no data; cagr is the compound annual growth
+    between them in percent. growth_df holds the yearly figures behind the
+    analytics strip (see estimate_growth).
+    """
+    chart_kind: str
+    chart_df: pd.DataFrame
+    table_df: Optional[pd.DataFrame]
+    latest_year: int
+    start_year: int
+    latest_value: Optional[float] = None
+    start_value: Optional[float] = None
+    percent_change: Optional[float] = None
+    cagr: Optional[float] = None
+    other_label: Optional[str] = None
+    growth_df: Optional[pd.DataFrame] = None
+
+
+def estimate_table(chart_df, chart_kind, sector, industry):
+    """Pivots estimate chart data into the Year-by-column table shown under "View as a Table"."""
+    if chart_df.empty:
+        return None
+    if chart_kind == "by_sector":
+        table_df = chart_df.pivot_table(index='OceanSector', columns='Year', values='Estimate_value', observed=True)
+        table_df.index.name = "Sector"
+    elif chart_kind == "by_geo":
+        table_df = chart_df.pivot_table(index='GeoContribution', columns='Year', values='Estimate_value')
+        table_df.index.name = "Geography"
+    else:
+        table_index_name = industry if industry != ALL_INDUSTRIES else sector
+        table_df = chart_df.set_index('Year').rename(columns={'Estimate_value': table_index_name}).T
+        table_df.index.name = "Industry" if industry != ALL_INDUSTRIES else "Sector"
+    return table_df
+
+
+def default_estimate_years(year_bounds):
+    """Returns the year range the estimate modes open on for data covering year_bounds."""
+    min_year, max_year = year_bounds
+    return max(min_year, max_year - ESTIMATE_DEFAULT_YEARS + 1), max_year
+
+
+def estimate_partition(sector, industry):
+    """Returns the (aggregation, econ) partition key levels for a sector and industry selection."""
+    if industry != ALL_INDUSTRIES:
+        return 'Industry', industry
+    if sector != ALL_SECTORS:
+        return 'Sector', sector
+    # Only sector-level rows are summed when all sectors are selected.
+    return 'Sector', None
+
+
+def shows_top_contributors(scale, geo, sector, industry):
+    """True if a selection is charted by its top geographies (chart_kind "by_geo")."""
+    return geo is None and scale in TOP_CONTRIBUTOR_SCALES and sector != ALL_SECTORS and industry == ALL_INDUSTRIES
+
+
+def estimate_growth(cube, history, scale, aggregation, geo, econ, metric_col, year_range):
+    """
+    Returns one row per year of year_range in history (Year plus metric_col
+    from AggregateCube.series, starting a year early so the first year has a
+    predecessor): Estimate_value, YoY change (%) against the previous year,
+    and for a single state or region its Share of the total over all of them
+    (%), its Rank and the number of Peers ranked.
+    """
+    years = history["Year"].to_numpy()
+    values = history[metric_col].to_numpy()
+    previous = np.concatenate([[np.nan], values[:-1]])
+    follows = np.concatenate([[False], np.diff(years) == 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yoy = np.where(follows & (previous > 0), (values / previous - 1) * 100, np.nan)
+    growth = pd.DataFrame({"Year": years, "Estimate_value": values, "YoY change (%)": yoy})
+    growth = growth[growth["Year"] >= year_range[0]].reset_index(drop=True)
+    standing = cube.standing(scale, aggregation, geo, econ, metric_col, year_range) if geo is not None else None
+    if standing is not None:
+        growth = growth.merge(standing, on="Year", how="left")
+    return growth
+
+
+def compound_growth(start_value, latest_value, years):
+    """Returns the compound annual growth rate in percent, or None unless both values are positive and years > 0."""
+    if not (start_value > 0 and latest_value > 0 and years > 0):
+        return None
+    return ((latest_value / start_value) ** (1 / years) - 1) * 100
+
+
+def query_estimates(cube, scale, geo, sector, industry, metric, year_range, state=None, top_n=TOP_CONTRIBUTORS,
+                    stable_top=False, profile=NULL_PROFILE):
+    """
+    Returns the EstimateResult for one geography and sector or industry.
+
+    scale is "State", "County" or "Region"; geo=None selects every geography
+    at that scale (for counties, every county in `state`). An industry other
+    than "All Marine Industries" takes precedence over the sector. A "by_geo"
+    chart names the top_n geographies of each year, or with stable_top the
+    top_n of the whole year range in every year.
+    """
+    metric_col = f"Open_{metric}"
+    aggregation, econ = estimate_partition(sector, industry)
+    start_year, latest_year = year_range
+    # One year more than shown, for the first year's year-over-year change.
+    history = profile.time(
+        "cube.series", cube.series, scale, aggregation, geo=geo, econ=econ, state=state,
+        year_range=(start_year - 1, latest_year)
+    )
+    totals = history[history["Year"] >= start_year]
+    result = EstimateResult(
+        chart_kind="single", chart_df=None, table_df=None, latest_year=latest_year, start_year=start_year
+    )
+
+    if not totals.empty:
+        year_totals = totals.set_index('Year')[metric_col].fillna(0)
+        result.latest_value = year_totals.get(latest_year, 0)
+        result.start_value = year_totals.get(start_year, 0)
+        if result.latest_value > 0 and result.start_value > 0 and start_year != latest_year:
+            result.percent_change = (result.latest_value - result.start_value) / result.start_value * 100
+        result.cagr = compound_growth(result.start_value, result.latest_value, latest_year - start_year)
+        result.growth_df = profile.time(
+            "growth", estimate_growth, cube, history, scale, aggregation, geo, econ, metric_col, year_range,
+            rows_in=len(history)
+        )
+
+    if sector == ALL_SECTORS and industry == ALL_INDUSTRIES:
+        result.chart_kind = "by_sector"
+        chart_df = profile.time("cube.breakdown", cube.breakdown, scale, 'Sector', geo=geo, state=state, year_range=year_range)
+        chart_df = chart_df[["Year", "OceanSector", metric_col]].rename(columns={metric_col: "Estimate_value"})
+        chart_df = chart_df.dropna(subset=["Estimate_value"])
+    elif shows_top_contributors(scale, geo, sector, industry):
+        result.chart_kind = "by_geo"
+        result.other_label = f"All Other {scale}s"
+        chart_df = profile.time(
+            "cube.top_contributors", cube.top_contributors, scale, sector, metric_col, year_range, n=top_n,
+            stable=stable_top
+        )
+        if chart_df.empty or not chart_df["Estimate_value"].sum() > 0:
+            chart_df = chart_df.iloc[0:0]
+    else:
+        chart_df = totals[["Year", metric_col]].fillna(0).rename(columns={metric_col: 'Estimate_value'})
+
+    result.chart_df = chart_df.reset_index(drop=True)
+    result.table_df = profile.time(
+        "pivot_table", estimate_table, result.chart_df, result.chart_kind, sector, industry, rows_in=len(result.chart_df)
+    )
+    return result
+
+
+def estimate_extract(index, scale, geo, sector, industry, year_range, state=None):
+    """
+    Returns the openENOWinput.csv rows behind one estimate selection, ordered
+    by year, from a PartitionIndex; arguments are those of query_estimates.
+    """
+    aggregation, econ = estimate_partition(sector, industry)
+    rows = index.lookup(scale, aggregation, geo=geo, econ=econ, state=state, year_range=year_range)
+    return rows.drop(columns=list(OPEN_ENOW_ALIASES), errors="ignore")
+
+
+# --- Side-by-side geographies ---
+MAX_COMPARED_GEOS = 6
+MAX_COMPARED_SECTORS = 4
+
+
+@dataclass
+class GeoComparisonResult:
+    """
+    Yearly totals of several geographies and sectors for one metric.
+
+    chart_df holds Geography, Sector, Year and Estimate_value, with Geography
+    and Sector as categoricals in the order selected; selections without data
+    have no rows. table_df has one row per geography and sector and one column
+    per year.
+    """
+    chart_df: pd.DataFrame
+    table_df: Optional[pd.DataFrame]
+
+
+def geography_label(state, geo):
+    """Returns the label of a (state, geo) selection: "County, State" for counties, geo otherwise."""
+    return geo if state is None else f"{geo}, {state}"
+
+
+def query_geo_comparison(cube, scale, geos, sectors, metric, year_range, profile=NULL_PROFILE):
+    """
+    Returns the GeoComparisonResult for every combination of geos, a list of
+    (state, geo) pairs with state the state name of counties and None
+    otherwise, and sectors (sector labels, "All Marine Sectors" included).
+    All series are read from the cube in one call.
+    """
+    metric_col = f"Open_{metric}"
+    labels = [geography_label(state, geo) for state, geo in geos]
+    selections = [(label, sector) for label in labels for sector in sectors]
+    partitions = [estimate_partition(sector, ALL_INDUSTRIES) for sector in sectors]
+    keys = [(scale, aggregation, state, geo, econ) for state, geo in geos for aggregation, econ in partitions]
+    series = profile.time("cube.series_many", cube.series_many, keys, year_range)
+    series = series.dropna(subset=[metric_col])
+    selected = [selections[key] for key in series["key"]]
+    chart_df = pd.DataFrame({
+        "Geography": pd.Categorical([label for label, _ in selected], categories=labels),
+        "Sector": pd.Categorical([sector for _, sector in selected], categories=list(sectors)),
+        "Year": series["Year"].to_numpy(),
+        "Estimate_value": series[metric_col].to_numpy(),
+    })
+    table_df = None
+    if not chart_df.empty:
+        table_df = profile.time(
+            "pivot_table", chart_df.pivot_table, index=["Geography", "Sector"], columns="Year", values="Estimate_value",
+            observed=True, rows_in=len(chart_df)
+        )
+    return GeoComparisonResult(chart_df=chart_df, table_df=table_df)
+
+
+def geo_comparison_extract(index, scale, geos, sectors, year_range):
+    """Returns the openENOWinput.csv rows behind a query_geo_comparison selection, ordered by selection and year."""
+    parts = [
+        estimate_extract(index, scale, geo, sector, ALL_INDUSTRIES, year_range, state=state)
+        for state, geo in geos for sector in sectors
+    ]
+    return pd.concat(parts, ignore_index=True) if parts else index.frame.iloc[0:0]
+
+
+# --- County map ---
+def query_county_map(cube, fips, sector, metric, year_range, profile=NULL_PROFILE):
+    """
+    Returns the yearly totals of a sector in every county of fips, the
+    {(state, county): FIPS code} index of the county map (see openenow.geo):
+    FIPS, County ("County, State"), Year and Estimate_value, one row per
+    county and year with data. All counties are read from the cube in one call.
+    """
+    metric_col = f"Open_{metric}"
+    aggregation, econ = estimate_partition(sector, ALL_INDUSTRIES)
+    counties = list(fips)
+    keys = [("County", aggregation, state, county, econ) for state, county in counties]
+    series = profile.time("cube.series_many", cube.series_many, keys, year_range)
+    series = series.dropna(subset=[metric_col])
+    positions = series["key"].to_numpy()
+    codes = np.array([fips[county] for county in counties] or [""], dtype=object)
+    labels = np.array([geography_label(*county) for county in counties] or [""], dtype=object)
+    return pd.DataFrame({
+        "FIPS": codes[positions], "County": labels[positions],
+        "Year": series["Year"].to_numpy(), "Estimate_value": series[metric_col].to_numpy(),
+    })
+
+
+# --- Compare to original ENOW ---
+@dataclass
+class ComparisonResult:
+    """
+    Yearly totals from each data source and their error statistics against original ENOW.
+
+    compare_df has a Year column and one column per COMPARISON_SOURCES label,
+    with zero totals treated as missing. stats maps each non-reference source
+    label to a dict of MAE, RMSE and MPD, or to None when too few years overlap.
+    """
+    compare_df: pd.DataFrame
+    stats: dict
+
+
+def default_comparison_years(year_bounds):
+    """Returns the year range Compare opens on for data covering year_bounds."""
+    min_year, max_year = year_bounds
+    return max(min_year, COMPARISON_DEFAULT_YEARS[0]), min(max_year, COMPARISON_DEFAULT_YEARS[1])
+
+
+def comparison_key(state_name, county, sector, industry, state_abbr=None):
+    """Returns the ComparisonTable key arguments for one Compare selection."""
+    if industry != ALL_INDUSTRIES:
+        key = dict(aggregation='Industry', econ=industry)
+    else:
+        key = dict(aggregation='Sector', econ=None if sector == ALL_SECTORS else sector)
+    if county != ALL_COUNTIES:
+        return dict(key, scale='County', state=state_abbr, geo=county)
+    return dict(key, scale='State', geo=None if state_name == ALL_STATES else state_name)
+
+
+def query_comparison(table, state_name, county, sector, industry, metric, year_range, state_abbr=None,
+                     profile=NULL_PROFILE):
+    """
+    Returns the ComparisonResult for one Compare selection, in the metric's own
+    units, read from a ComparisonTable; None if the data lacks a column the
+    comparison needs. County names repeat across states, so a county is looked
+    up within state_abbr, the abbreviation of the selected state.
+    """
+    if metric not in table.metrics:
+        return None
+    key = comparison_key(state_name, county, sector, industry, state_abbr)
+    compare_df = profile.time("totals", table.totals, metric=metric, year_range=year_range, **key)
+    stats = profile.time("statistics", table.statistics, metric=metric, year_range=year_range, **key)
+    return ComparisonResult(compare_df=compare_df, stats=stats)
+
+
+def comparison_extract(df, state_name, county, sector, industry, year_range, state_abbr=None):
+    """Returns the enow_version_comparisons.csv rows summed into one Compare selection's totals."""
+    key = comparison_key(state_name, county, sector, industry, state_abbr)
+    mask = (df['GeoScale'] == key['scale']) & (df['aggregation'] == key['aggregation']) & df['Year'].between(*year_range)
+    if key['scale'] == 'County':
+        mask &= df['state'] == key['state']
+    if key['geo'] is not None:
+        mask &= df['GeoName'] == key['geo']
+    if key['econ'] is not None:
+        mask &= df['OceanIndustry' if key['aggregation'] == 'Industry' else 'OceanSector'] == key['econ']
+    return df[mask]
+
+
+# --- Error Analysis ---
+@dataclass
+class ErrorAnalysisResult:
+    """
+    Per-group error statistics for the Error Analysis scatter plot and table.
+
+    results_df has the columns of grouped_error_metrics plus Y_Value (the
+    chosen error metric) and Group (the grouping values joined with " - ").
+    outliers_removed counts groups dropped by the interquartile-range filter.
+    """
+    results_df: pd.DataFrame
+    outliers_removed: int = 0
+
+
+def filter_error_analysis(df, aggregation, geoscale, year_range, state_abbr=None, sector=ALL_SECTORS):
+    """
+    Returns the comparison rows behind one Error Analysis selection; state_abbr=None keeps every state.
+    The conditions are combined into one mask, so the rows are copied once.
+    """
+    mask = (
+        (df['aggregation'] == aggregation) &
+        (df['GeoScale'] == geoscale) &
+        (df['Year'] >= year_range[0]) &
+        (df['Year'] <= year_range[1])
+    )
+    if state_abbr is not None:
+        mask &= df['state'] == state_abbr
+    if sector != ALL_SECTORS:
+        mask &= df['OceanSector'] == sector
+    return df[mask]
+
+
+def error_analysis_results(filtered_df, grouping_vars, metric, y_axis="Mean Percent Difference", exclude_outliers=False,
+                           estimate="Open", profile=NULL_PROFILE):
+    """
+    Returns the ErrorAnalysisResult for already filtered rows, grouped by
+    grouping_vars and GeoName. estimate is the COMPARISON_SOURCES prefix of the
+    series measured against original ENOW; its mean is in the column named by
+    its label. Groups whose mean value is not positive are dropped, since the
+    chart uses a log scale.
+    """
+    results_df = profile.time(
+        "grouped_error_metrics", grouped_error_metrics, filtered_df, list(grouping_vars) + ['GeoName'],
+        f"{estimate}_{metric}", f"{REFERENCE}_{metric}", estimate_label=COMPARISON_SOURCES[estimate],
+        rows_in=len(filtered_df)
+    )
+    if results_df.empty:
+        return ErrorAnalysisResult(results_df=results_df)
+
+    results_df['Y_Value'] = results_df[y_axis]
+    results_df = results_df.dropna(subset=['Y_Value', 'X_Value'])
+    results_df = results_df[results_df['X_Value'] > 0]
+
+    removed_rows = 0
+    if exclude_outliers and not results_df.empty:
+        q1 = results_df['Y_Value'].quantile(0.25)
+        q3 = results_df['Y_Value'].quantile(0.75)
+        iqr = q3 - q1
+        in_range = results_df['Y_Value'].between(q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+        removed_rows = int((~in_range).sum())
+        results_df = results_df[in_range]
+
+    if results_df.empty:
+        return ErrorAnalysisResult(results_df=results_df.assign(Group=pd.Series(dtype=object)), outliers_removed=removed_rows)
+    with profile.stage("group_labels", rows_in=len(results_df)):
+        results_df = results_df.assign(Group=results_df[list(grouping_vars)].astype(str).agg(' - '.join, axis=1))
+    return ErrorAnalysisResult(results_df=results_df, outliers_removed=removed_rows)
+
+
+def query_error_analysis(df, aggregation, geoscale, grouping_vars, metric, year_range,
+                         state_abbr=None, sector=ALL_SECTORS, y_axis="Mean Percent Difference",
+                         exclude_outliers=False, estimate="Open", profile=NULL_PROFILE):
+    """
+    Returns the ErrorAnalysisResult comparing the `estimate` series (Open ENOW
+    by default) with original ENOW for `metric`, grouped by grouping_vars and
+    GeoName (see error_analysis_results).
+    """
+    filtered_df = profile.time(
+        "filter", filter_error_analysis, df, aggregation, geoscale, year_range,
+        state_abbr=state_abbr, sector=sector, rows_in=len(df)
+    )
+    return error_analysis_results(
+        filtered_df, grouping_vars, metric, y_axis=y_axis, exclude_outliers=exclude_outliers, estimate=estimate,
+        profile=profile
+    )
@@ -0,0 +1,237 @@
+"""
+Incremental refresh of the Open ENOW estimates.
+
+New data years arrive as CSV files in UPDATES_DIR, in the layout of
+openENOWinput.csv. Each file holds the complete rows of the years it covers
+and replaces those years; where several files cover a year, the last one by
+file name wins. An EstimateStore serves the merged estimates together with
+their partition index and aggregate cube. It notices new or changed update
+files and parses only those, re-aggregates only the years they cover, and
+swaps the new EstimateData in with one assignment, so sessions that are
+still rendering the previous version finish undisturbed. A replaced
+openENOWinput.csv, a removed update file or one that no longer covers all
+its years triggers a full rebuild in the same background way.
+
+When datasets are shared between processes (see openenow.shared), version
+numbers are those of the published frame: the first process to see the
+source files change builds and publishes the merged frame, and the others
+map it when their next check finds the published version moved on. Each
+process builds its own index and cube over the shared frame.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from openenow.cube import AggregateCube
+from openenow.data import OPEN_ENOW_CSV, concat_frames, load_cached_frame, read_open_enow_csv
+from openenow.index import PartitionIndex
+from openenow.shared import SharedDataset, shared_available
+
+logger = logging.getLogger(__name__)
+
+UPDATES_DIR = os.environ.get("OPENENOW_UPDATES_DIR", "updates")
+# Minimum seconds between checks of the source files; 0 checks on every call.
+REFRESH_INTERVAL = float(os.environ.get("OPENENOW_REFRESH_INTERVAL", "30"))
+
+
+def file_signature(path):
+    """Returns (size, mtime_ns) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def update_files(updates_dir=UPDATES_DIR):
+    """Returns the CSV files in updates_dir, in the order they are applied."""
+    return sorted(glob.glob(os.path.join(updates_dir, "*.csv")))
+
+
+@dataclass(frozen=True)
+class EstimateData:
+    """
+    One version of the estimates. version increases with every swap and can
+    be part of cache keys; sources maps each file read to its file_signature
+    and update_years each update file to the years it covers.
+    """
+    version: int
+    frame: pd.DataFrame
+    index: PartitionIndex
+    cube: AggregateCube
+    sources: dict = field(default_factory=dict)
+    update_years: dict = field(default_factory=dict)
+
+
+def merge_years(frame, update):
+    """Returns frame with the years present in update replaced by update's rows."""
+    kept = frame[~frame["Year"].isin(update["Year"].unique())]
+    return concat_frames([kept, update])
+
+
+class EstimateStore:
+    """
+    Process-wide holder of the current EstimateData.
+
+    current() loads the data on first use. check() compares the source files
+    with the current version at most every `interval` seconds and, when they
+    differ, starts a background refresh. on_swap(data) is called after each
+    new version is swapped in. shared_dir (default OPENENOW_SHARED_DIR)
+    shares the merged frame with the other processes of the host.
+    """
+
+    def __init__(self, path=OPEN_ENOW_CSV, updates_dir=UPDATES_DIR, interval=REFRESH_INTERVAL, on_swap=None,
+                 shared_dir=None):
+        self.path = path
+        self.updates_dir = updates_dir
+        self.interval = interval
+        self.on_swap = on_swap
+        self.shared = SharedDataset("estimates", shared_dir) if shared_available(shared_dir) else None
+        self._data = None
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_check = 0.0
+
+    def current(self):
+        """Returns the current EstimateData, or None if openENOWinput.csv does not exist."""
+        if self._data is None:
+            with self._load_lock:
+                if self._data is None:
+                    try:
+                        self._data = self._build_full(version=1) if self.shared is None else self._load_shared(None)
+                    except FileNotFoundError:
+                        return None
+        return self._data
+
+    def _signatures(self):
+        sources = {self.path: file_signature(self.path)}
+        for path in update_files(self.updates_dir):
+            sources[path] = file_signature(path)
+        return sources
+
+    def stale(self):
+        """
+        True if a source file was added, changed or removed since the current
+        version was built, or another process published a newer one.
+        """
+        data = self._data
+        if data is None:
+            return False
+        if self._signatures() != data.sources:
+            return True
+        return self.shared is not None and self.shared.version() != data.version
+
+    def check(self):
+        """Starts a background refresh if the sources changed; returns the thread, or None."""
+        now = time.monotonic()
+        if now - self._last_check < self.interval:
+            return None
+        self._last_check = now
+        if not self.stale() or self._refresh_lock.locked():
+            return None
+        thread = threading.Thread(target=self.refresh, name="openenow-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def refresh(self):
+        """Brings the data up to date with the source files; returns True if a new version was swapped in."""
+        with self._refresh_lock:
+            previous = self._data
+            if previous is None or not self.stale():
+                return False
+            started = time.perf_counter()
+            try:
+                data = self._build_incremental(previous) if self.shared is None else self._load_shared(previous)
+            except Exception:
+                logger.exception("Refreshing %s failed; keeping version %d", self.path, previous.version)
+                return False
+            self._data = data
+            logger.info(
+                "Swapped in estimates version %d (%d rows) in %.2fs",
+                data.version, len(data.frame), time.perf_counter() - started
+            )
+        if self.on_swap is not None:
+            self.on_swap(data)
+        return True
+
+    def _read_updates(self, paths, known_years):
+        """
+        Parses update files. Rows of a year that a later file also covers are
+        dropped; known_years gives the years of files that are not re-read.
+        Returns the merged update rows (or None) and each parsed file's years.
+        """
+        parsed = {path: read_open_enow_csv(path) for path in paths}
+        years_by_file = {path: sorted(int(year) for year in frame["Year"].unique()) for path, frame in parsed.items()}
+        all_years = {**known_years, **years_by_file}
+        frames = []
+        for path, frame in parsed.items():
+            superseded = {year for other, years in all_years.items() if other > path for year in years}
+            frame = frame[~frame["Year"].isin(superseded)] if superseded else frame
+            if not frame.empty:
+                frames.append(frame)
+        return (concat_frames(frames) if frames else None), years_by_file
+
+    def _build_full(self, version):
+        sources = self._signatures()
+        frame = load_cached_frame(self.path, read_open_enow_csv)
+        update, update_years = self._read_updates([path for path in sources if path != self.path], {})
+        if update is not None:
+            frame = merge_years(frame, update)
+        return EstimateData(
+            version=version, frame=frame, index=PartitionIndex(frame), cube=AggregateCube(frame),
+            sources=sources, update_years=update_years,
+        )
+
+    def _build_incremental(self, previous):
+        sources = self._signatures()
+        # Years that drop out of the data can only be restored from the full sources.
+        if sources.get(self.path) != previous.sources.get(self.path) or any(
+            path not in sources for path in previous.update_years
+        ):
+            logger.info("%s replaced or an update file removed; rebuilding the estimates", self.path)
+            return self._build_full(previous.version + 1)
+
+        changed = [path for path in sources if path != self.path and sources[path] != previous.sources.get(path)]
+        known_years = {path: years for path, years in previous.update_years.items() if path not in changed}
+        update, changed_years = self._read_updates(changed, known_years)
+        if any(not set(previous.update_years.get(path, [])) <= set(years) for path, years in changed_years.items()):
+            logger.info("An update file no longer covers all its earlier years; rebuilding the estimates")
+            return self._build_full(previous.version + 1)
+
+        if update is None:
+            frame, cube = previous.frame, previous.cube
+        else:
+            frame = merge_years(previous.frame, update)
+            cube = previous.cube.replace_years(update)
+        logger.info("Merged update files %s", ", ".join(os.path.basename(path) for path in changed))
+        return EstimateData(
+            version=previous.version + 1, frame=frame, index=PartitionIndex(frame), cube=cube,
+            sources=sources, update_years={**known_years, **changed_years},
+        )
+
+    def _load_shared(self, previous):
+        """
+        Returns the published estimates for the current source files, building
+        and publishing them first (incrementally from previous where it is
+        given) if no process has yet.
+        """
+        sources = self._signatures()
+        built = None
+
+        def build():
+            nonlocal built
+            built = self._build_full(version=1) if previous is None else self._build_incremental(previous)
+            return built.frame, {"update_years": built.update_years}
+
+        published = self.shared.attach_or_publish(sources, build)
+        frame = published.frame
+        return EstimateData(
+            version=published.version, frame=frame, index=PartitionIndex(frame),
+            cube=built.cube if built is not None else AggregateCube(frame),
+            sources=sources, update_years=published.meta.get("update_years", {}),
+        )
@@ -0,0 +1,148 @@
+"""
+Bounded cache of query results shared by all sessions.
+
+Many visitors ask for the same selection ("All Coastal States", "All Marine
+Sectors", "Employment" most of all), so results of the query functions in
+openenow.queries are kept in one process-wide cache keyed on the normalized
+selection. Entries are evicted least-recently-used first once their total
+size passes a byte budget, and expire after a time-to-live.
+
+Cached results are shared between sessions and must be treated as read-only.
+"""
+import dataclasses
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MB = float(os.environ.get("OPENENOW_RESULT_CACHE_MB", "64"))
+RESULT_CACHE_TTL = float(os.environ.get("OPENENOW_RESULT_CACHE_TTL", "3600"))
+
+
+def approximate_size(obj):
+    """Estimates the memory held by a query result, in bytes."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(obj, pd.DataFrame) else usage)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(approximate_size(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(approximate_size(k) + approximate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(approximate_size(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+def normalize_key(*parts):
+    """Turns a selection into a hashable cache key; lists become tuples and numbers plain Python numbers."""
+    def normalize(value):
+        if isinstance(value, (list, tuple)):
+            return tuple(normalize(item) for item in value)
+        if hasattr(value, "item") and not isinstance(value, (str, bytes)):  # NumPy scalars
+            return value.item()
+        return value
+    return tuple(normalize(part) for part in parts)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a byte budget and a time-to-live.
+
+    max_bytes bounds the summed approximate_size of the entries; ttl_seconds
+    of None or 0 keeps entries until they are evicted. Results larger than
+    the whole budget are returned but not stored.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MB * 2**20, ttl_seconds=RESULT_CACHE_TTL):
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = ttl_seconds or None
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._lock = threading.RLock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def get(self, key, default=None):
+        """Returns the cached value for key, or default; counts a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[2], time.monotonic()):
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Stores value under key, evicting least-recently-used entries to stay within the budget."""
+        size = approximate_size(value)
+        if size > self.max_bytes:
+            logger.debug("Result of %d bytes exceeds the cache budget; not cached", size)
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, calling compute() and caching its result on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drops every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def entry_sizes(self):
+        """Returns (key, approximate size) for every entry, least recently used first."""
+        with self._lock:
+            return [(key, size) for key, (_, size, _) in self._entries.items()]
+
+    def stats(self):
+        """Returns the entry count, size, budget and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,285 @@
+"""
+Datasets shared by the Streamlit server processes of one host.
+
+Each worker process otherwise parses and holds its own copy of every
+dataset. With OPENENOW_SHARED_DIR set (best on a tmpfs such as /dev/shm),
+each dataset is materialized once per host as an Arrow IPC file in that
+directory and every process memory-maps it, so the frames' buffers exist
+once however many workers run. The files are laid out for pandas to use the
+mapped buffers as they are: one record batch per file, NaN stored as a value
+rather than as a null, and categorical columns stored as their codes with
+the categories in the schema metadata.
+
+Each dataset has a manifest, <name>.json, holding a version counter and the
+signatures of the source files it was built from. The first process to find
+the manifest missing or behind its source files takes an exclusive lock on
+<name>.lock, builds the frame and publishes it as the next version; processes
+that wait on the lock attach to what it published. A process that holds a
+version compares it with the manifest and remaps when the manifest has moved
+on. The file of a superseded version is unlinked once the next is published;
+processes still mapping it keep its pages until they let go of it.
+
+Frames served from here are read-only: writing into one raises.
+
+    python -m openenow.shared      # publish every dataset before the workers start
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: every process loads its own copy.
+    fcntl = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Every process loads its own copy.
+    pa = None
+
+from openenow.comparison_table import load_comparison_table_frame
+from openenow.data import (
+    CACHE_FORMAT_VERSION, COMPARISON_CSV, DORADO_CSV, OPEN_ENOW_CSV, file_signatures, format_bytes,
+    load_comparison_frame, write_atomic
+)
+
+logger = logging.getLogger(__name__)
+
+# Directory of the shared datasets; empty keeps every dataset private to its process.
+SHARED_DIR = os.environ.get("OPENENOW_SHARED_DIR", "")
+# Bump when the file layout below changes, to republish old files.
+SHARED_FORMAT_VERSION = 1
+_METADATA_KEY = b"openenow"
+
+
+def shared_available(shared_dir=None):
+    """True if datasets are to be shared through shared_dir (default SHARED_DIR) and can be here."""
+    return bool(shared_dir if shared_dir is not None else SHARED_DIR) and pa is not None and fcntl is not None
+
+
+# --- File layout ---
+def frame_to_table(df):
+    """
+    Returns df as a single-chunk Arrow table that table_to_frame maps back
+    without copying its numeric and categorical columns. df must have a
+    default RangeIndex, which is not stored.
+    """
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        raise ValueError("Only frames with a default RangeIndex can be shared")
+    arrays = {}
+    categories = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories[col] = {"values": values.cat.categories.tolist(), "ordered": bool(values.cat.ordered)}
+            arrays[col] = pa.array(values.cat.codes.to_numpy())
+        elif isinstance(values.dtype, np.dtype) and values.dtype.kind in "biuf":
+            # From the bare array, NaN stays a float value instead of becoming a null.
+            arrays[col] = pa.array(values.to_numpy())
+        else:
+            arrays[col] = pa.Array.from_pandas(values)
+    metadata = {_METADATA_KEY: json.dumps({"categories": categories}).encode()}
+    return pa.table(arrays).replace_schema_metadata(metadata)
+
+
+def table_to_frame(table):
+    """
+    Returns the frame written by frame_to_table. Columns without nulls use the
+    table's buffers directly, so a table read from a memory map yields a frame
+    whose data stays in the mapped file.
+    """
+    metadata = json.loads((table.schema.metadata or {}).get(_METADATA_KEY, b"{}"))
+    categories = metadata.get("categories", {})
+    columns = {}
+    for col in table.column_names:
+        chunked = table.column(col)
+        values = chunked.chunk(0) if chunked.num_chunks == 1 else chunked.combine_chunks()
+        if col in categories:
+            dtype = pd.CategoricalDtype(categories[col]["values"], ordered=categories[col]["ordered"])
+            columns[col] = pd.Categorical.from_codes(values.to_numpy(zero_copy_only=True), dtype=dtype, validate=False)
+        elif pa.types.is_integer(values.type) or pa.types.is_floating(values.type):
+            columns[col] = values.to_numpy(zero_copy_only=False)
+        else:
+            columns[col] = values.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+
+def write_frame(path, df):
+    """Writes df to path as one record batch of an Arrow IPC file, atomically."""
+    table = frame_to_table(df)
+
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(len(df), 1))
+    write_atomic(path, write)
+
+
+def map_frame(path):
+    """Memory-maps an Arrow IPC file written by write_frame and returns its frame."""
+    with pa.memory_map(path) as source:
+        return table_to_frame(pa.ipc.open_file(source).read_all())
+
+
+# --- Published versions ---
+@dataclass(frozen=True)
+class SharedVersion:
+    """One published version of a dataset, as mapped by this process; meta is what the publisher stored with it."""
+    version: int
+    frame: pd.DataFrame
+    sources: dict
+    meta: dict
+
+
+class SharedDataset:
+    """The published versions of one named dataset in a shared directory."""
+
+    def __init__(self, name, shared_dir=None):
+        self.name = name
+        self.shared_dir = shared_dir or SHARED_DIR
+        self.manifest_path = os.path.join(self.shared_dir, f"{name}.json")
+
+    def manifest(self):
+        """Returns the current manifest, or None if nothing compatible is published."""
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format") != [SHARED_FORMAT_VERSION, CACHE_FORMAT_VERSION]:
+            return None
+        return manifest
+
+    def version(self):
+        """Returns the published version number, or None."""
+        manifest = self.manifest()
+        return manifest and manifest["version"]
+
+    @contextmanager
+    def lock(self):
+        """Holds the dataset's exclusive publishing lock, waiting for other processes to release it."""
+        os.makedirs(self.shared_dir, exist_ok=True)
+        with open(os.path.join(self.shared_dir, f"{self.name}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def attach(self, sources=None):
+        """
+        Maps the published version and returns it as a SharedVersion, or None
+        if nothing is published or, when sources is given, it was built from
+        other source signatures than these.
+        """
+        manifest = self.manifest()
+        if manifest is None or (sources is not None and manifest["sources"] != _as_json(sources)):
+            return None
+        try:
+            frame = map_frame(os.path.join(self.shared_dir, manifest["file"]))
+        except (OSError, pa.ArrowException):
+            # Superseded between reading the manifest and mapping the file.
+            return None
+        return SharedVersion(manifest["version"], frame, manifest["sources"], manifest.get("meta", {}))
+
+    def publish(self, frame, sources, meta=None):
+        """
+        Writes frame as the next version, built from source files with the
+        given signatures, and returns it mapped. Call with the lock held.
+        """
+        previous = self.manifest()
+        version = (previous["version"] if previous else 0) + 1
+        file_name = f"{self.name}-{version}.arrow"
+        os.makedirs(self.shared_dir, exist_ok=True)
+        write_frame(os.path.join(self.shared_dir, file_name), frame)
+        manifest = {
+            "format": [SHARED_FORMAT_VERSION, CACHE_FORMAT_VERSION], "version": version, "file": file_name,
+            "sources": _as_json(sources), "meta": _as_json(meta or {}),
+        }
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+        write_atomic(self.manifest_path, write)
+        if previous and previous["file"] != file_name:
+            try:
+                os.remove(os.path.join(self.shared_dir, previous["file"]))
+            except FileNotFoundError:
+                pass
+        logger.info("Published %s version %d (%d rows) in %s", self.name, version, len(frame), self.shared_dir)
+        return self.attach()
+
+    def attach_or_publish(self, sources, build):
+        """
+        Returns the published version built from the source files with these
+        signatures, first building and publishing it with build() if the
+        manifest is missing or behind them. build returns (frame, meta).
+        """
+        current = self.attach(sources)
+        if current is not None:
+            return current
+        with self.lock():
+            current = self.attach(sources)
+            if current is not None:
+                return current
+            frame, meta = build()
+            return self.publish(frame, sources, meta)
+
+
+def _as_json(obj):
+    """Returns obj as it reads back from JSON (tuples become lists), so that manifests compare equal."""
+    return json.loads(json.dumps(obj))
+
+
+def load_shared_frame(name, build, depends_on, shared_dir=None):
+    """
+    Returns build(), mapped from the shared directory when datasets are shared
+    (see shared_available) and built privately otherwise. depends_on lists the
+    files build reads: when one of them is added, removed or changed, the next
+    process to load the frame publishes a new version. Raises
+    FileNotFoundError where build does.
+    """
+    if not shared_available(shared_dir):
+        return build()
+    dataset = SharedDataset(name, shared_dir)
+    return dataset.attach_or_publish(file_signatures(depends_on), lambda: (build(), {})).frame
+
+
+def main(argv=None):
+    from openenow.refresh import EstimateStore  # openenow.refresh imports this module.
+
+    parser = argparse.ArgumentParser(prog="python -m openenow.shared", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shared-dir", default=SHARED_DIR, help="shared dataset directory (default: OPENENOW_SHARED_DIR)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not shared_available(args.shared_dir):
+        print("Set OPENENOW_SHARED_DIR or --shared-dir; sharing also needs pyarrow and a POSIX system.", file=sys.stderr)
+        return 1
+
+    frames = {}
+    estimates = EstimateStore(path=OPEN_ENOW_CSV, shared_dir=args.shared_dir).current()
+    if estimates is not None:
+        frames[f"estimates version {estimates.version}"] = estimates.frame
+    try:
+        frames["comparison"] = load_shared_frame(
+            "comparison", load_comparison_frame, (COMPARISON_CSV, DORADO_CSV), args.shared_dir
+        )
+        frames["comparison_table"] = load_shared_frame(
+            "comparison_table", load_comparison_table_frame, (COMPARISON_CSV, DORADO_CSV), args.shared_dir
+        )
+    except FileNotFoundError:
+        pass
+    for name, frame in frames.items():
+        size = int(frame.memory_usage(deep=True).sum())
+        print(f"{name}: {len(frame):,} rows, {format_bytes(size)} in {args.shared_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
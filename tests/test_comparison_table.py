@@ -0,0 +1,148 @@
+"""
+Tests of openenow.comparison_table against the per-selection Compare
+computation it replaced.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from openenow.comparison_table import COMPARISON_SOURCES, ComparisonTable, comparison_columns, comparison_table_frame
+from openenow.metrics import mean_absolute_error, mean_percent_difference, root_mean_squared_error
+from openenow.queries import ALL_COUNTIES, ALL_INDUSTRIES, ALL_SECTORS, ALL_STATES, comparison_key
+
+METRICS = ["Establishments", "Employment", "Wages", "GDP", "RealGDP"]
+INDUSTRIES = {
+    "Living Resources": ["Fishing", "Seafood Markets"],
+    "Tourism and Recreation": ["Full-Service Restaurants"],
+}
+STATES = {"ME": "Maine", "OR": "Oregon"}
+# County names repeat across states.
+COUNTIES = {"ME": ["Washington County", "York County"], "OR": ["Washington County"]}
+YEARS = range(2015, 2021)
+
+
+def comparison_frame():
+    """A small enow_version_comparisons frame with zero and missing totals and DORADO on state sectors only."""
+    rng = np.random.default_rng(11)
+    rows = []
+    for abbr, state_name in STATES.items():
+        geos = [("State", state_name)] + [("County", county) for county in COUNTIES[abbr]]
+        for scale, geo in geos:
+            for sector, industries in INDUSTRIES.items():
+                for aggregation, industry in [("Sector", None)] + [("Industry", name) for name in industries]:
+                    for year in YEARS:
+                        row = {
+                            "GeoScale": scale, "aggregation": aggregation, "state": abbr, "GeoName": geo,
+                            "OceanSector": sector, "OceanIndustry": industry, "Year": year,
+                        }
+                        for metric in METRICS:
+                            reference = float(rng.integers(1, 50_000))
+                            row[f"oldENOW_{metric}"] = reference
+                            row[f"Open_{metric}"] = round(reference * rng.uniform(0.6, 1.4))
+                            row[f"noimpute_{metric}"] = round(reference * rng.uniform(0.3, 1.0))
+                            dorado = scale == "State" and aggregation == "Sector"
+                            row[f"DORADO_{metric}"] = round(reference * rng.uniform(0.9, 1.1)) if dorado else np.nan
+                        rows.append(row)
+    df = pd.DataFrame(rows)
+    df.loc[::13, "oldENOW_Employment"] = 0.0
+    df.loc[5::17, "Open_Employment"] = np.nan
+    # York County's fishing has no public QCEW values at all.
+    df.loc[(df["GeoName"] == "York County") & (df["OceanIndustry"] == "Fishing"), "noimpute_Employment"] = np.nan
+    return df
+
+
+def loop_comparison(df, state_abbr, county, sector, industry, metric, year_range):
+    """The filter, yearly totals and statistics of one Compare selection as computed before the table."""
+    state_name = ALL_STATES if state_abbr is None else STATES[state_abbr]
+    filtered = df[(df["Year"] >= year_range[0]) & (df["Year"] <= year_range[1])]
+    if county != ALL_COUNTIES:
+        filtered = filtered[(filtered["GeoScale"] == "County") & (filtered["GeoName"] == county)
+                            & (filtered["state"] == state_abbr)]
+    else:
+        filtered = filtered[filtered["GeoScale"] == "State"]
+        if state_name != ALL_STATES:
+            filtered = filtered[filtered["GeoName"] == state_name]
+    if industry != ALL_INDUSTRIES:
+        filtered = filtered[(filtered["aggregation"] == "Industry") & (filtered["OceanIndustry"] == industry)]
+    else:
+        filtered = filtered[filtered["aggregation"] == "Sector"]
+        if sector != ALL_SECTORS:
+            filtered = filtered[filtered["OceanSector"] == sector]
+
+    columns = comparison_columns(metric)
+    compare_df = filtered[["Year", *columns]].rename(columns=columns)
+    compare_df = compare_df.groupby("Year").sum(min_count=1).reset_index()
+    for label in COMPARISON_SOURCES.values():
+        compare_df[label] = compare_df[label].replace({0: np.nan})
+
+    reference = COMPARISON_SOURCES["oldENOW"]
+    stats = {}
+    for label in COMPARISON_SOURCES.values():
+        if label == reference:
+            continue
+        valid = compare_df.dropna(subset=[reference, label])
+        if valid.empty:
+            stats[label] = None
+            continue
+        stats[label] = {
+            "mae": mean_absolute_error(valid[reference], valid[label]),
+            "rmse": root_mean_squared_error(valid[reference], valid[label]),
+            "mpd": mean_percent_difference(valid[reference], valid[label]),
+        }
+    return compare_df, stats
+
+
+SELECTIONS = [
+    (None, ALL_COUNTIES, ALL_SECTORS, ALL_INDUSTRIES),
+    (None, ALL_COUNTIES, "Living Resources", ALL_INDUSTRIES),
+    (None, ALL_COUNTIES, "Living Resources", "Fishing"),
+    ("ME", ALL_COUNTIES, ALL_SECTORS, ALL_INDUSTRIES),
+    ("OR", ALL_COUNTIES, "Tourism and Recreation", ALL_INDUSTRIES),
+    ("ME", "Washington County", ALL_SECTORS, ALL_INDUSTRIES),
+    ("OR", "Washington County", "Living Resources", "Seafood Markets"),
+    ("ME", "York County", "Living Resources", "Fishing"),
+]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return comparison_frame()
+
+
+@pytest.fixture(scope="module")
+def table(frame):
+    return ComparisonTable(comparison_table_frame(frame))
+
+
+@pytest.mark.parametrize("year_range", [(2015, 2020), (2017, 2018)])
+@pytest.mark.parametrize("metric", ["Employment", "Wages"])
+@pytest.mark.parametrize("state_abbr, county, sector, industry", SELECTIONS)
+def test_statistics_match_per_selection_loop(frame, table, state_abbr, county, sector, industry, metric, year_range):
+    state_name = ALL_STATES if state_abbr is None else STATES[state_abbr]
+    key = comparison_key(state_name, county, sector, industry, state_abbr)
+    expected_totals, expected_stats = loop_comparison(frame, state_abbr, county, sector, industry, metric, year_range)
+
+    totals = table.totals(metric=metric, year_range=year_range, **key)
+    pd.testing.assert_frame_equal(totals, expected_totals, check_dtype=False)
+
+    stats = table.statistics(metric=metric, year_range=year_range, **key)
+    assert stats.keys() == expected_stats.keys()
+    for label, expected in expected_stats.items():
+        if expected is None:
+            assert stats[label] is None
+        else:
+            assert stats[label] == pytest.approx(expected, rel=1e-6)
+
+
+def test_statistics_without_pairs(table):
+    # DORADO covers state sectors only, and York County's fishing has no public QCEW values.
+    key = comparison_key("Maine", "York County", "Living Resources", "Fishing", "ME")
+    stats = table.statistics(metric="Employment", **key)
+    assert stats["DORADO (unsuppressed QCEW)"] is None
+    assert stats["Public QCEW data, no imputed values"] is None
+    assert stats["Open ENOW Estimate"] is not None
+
+
+def test_statistics_of_unknown_selection_are_none(table):
+    stats = table.statistics("County", "Sector", "Employment", geo="Nowhere County", state="ME")
+    assert all(value is None for value in stats.values())
@@ -0,0 +1,137 @@
+"""
+Tests of openenow.metrics.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from openenow.metrics import (
+    ERROR_METRIC_COLUMNS, grouped_error_metrics, mean_absolute_error, mean_percent_difference, root_mean_squared_error
+)
+
+ESTIMATE_COL = "Open_Employment"
+REFERENCE_COL = "oldENOW_Employment"
+
+# Fixed inputs with a pair missing on each side, and the values sklearn.metrics
+# gives for their complete pairs: mean_absolute_error, the square root of
+# mean_squared_error, and the app's percent difference over nonzero references.
+REFERENCE = [120.0, 0.0, 56.5, 3400.0, np.nan, 18.25, 900.0]
+ESTIMATE = [131.0, 4.0, 50.0, 3125.5, 77.0, np.nan, 1012.0]
+SKLEARN_MAE = 81.6
+SKLEARN_RMSE = 132.7203827601473
+EXPECTED_MPD = 0.5082892301463358
+
+
+def test_helpers_match_sklearn():
+    assert mean_absolute_error(REFERENCE, ESTIMATE) == pytest.approx(SKLEARN_MAE, rel=1e-12)
+    assert root_mean_squared_error(REFERENCE, ESTIMATE) == pytest.approx(SKLEARN_RMSE, rel=1e-12)
+    assert mean_percent_difference(REFERENCE, ESTIMATE) == pytest.approx(EXPECTED_MPD, rel=1e-12)
+
+
+def test_helpers_accept_series():
+    reference, estimate = pd.Series(REFERENCE), pd.Series(ESTIMATE, dtype="float32")
+    assert mean_absolute_error(reference, estimate) == pytest.approx(SKLEARN_MAE, rel=1e-6)
+    assert root_mean_squared_error(reference, estimate) == pytest.approx(SKLEARN_RMSE, rel=1e-6)
+
+
+@pytest.mark.parametrize("helper", [mean_absolute_error, root_mean_squared_error, mean_percent_difference])
+@pytest.mark.parametrize("reference, estimate", [
+    ([np.nan, np.nan], [np.nan, np.nan]),
+    ([1.0, np.nan], [np.nan, 2.0]),
+    ([], []),
+])
+def test_helpers_without_pairs_are_nan(helper, reference, estimate):
+    assert np.isnan(helper(reference, estimate))
+
+
+def test_percent_difference_of_zero_references_is_nan():
+    reference, estimate = [0.0, 0.0, np.nan], [3.0, 5.0, 1.0]
+    assert np.isnan(mean_percent_difference(reference, estimate))
+    # The other errors still count those pairs.
+    assert mean_absolute_error(reference, estimate) == pytest.approx(4.0)
+
+
+def error_frame():
+    """A small Error Analysis input with missing pairs, zero references and a group with no pairs."""
+    rng = np.random.default_rng(7)
+    rows = []
+    for year in (2018, 2019, 2020):
+        for state in ("ME", "NH", "WA"):
+            for sector in ("Living Resources", "Marine Construction", "Tourism & Recreation"):
+                for geo in (f"{state} County A", f"{state} County B"):
+                    reference = rng.uniform(10, 1000)
+                    rows.append({
+                        "Year": year, "state": state, "OceanSector": sector, "GeoName": geo,
+                        REFERENCE_COL: reference, ESTIMATE_COL: reference * rng.uniform(0.7, 1.3),
+                    })
+    df = pd.DataFrame(rows)
+    df.loc[::7, REFERENCE_COL] = np.nan
+    df.loc[3::11, ESTIMATE_COL] = np.nan
+    df.loc[5::9, REFERENCE_COL] = 0.0
+    # Every row of one county is missing its estimate, so the group drops out.
+    df.loc[df["GeoName"] == "WA County B", ESTIMATE_COL] = np.nan
+    df["OceanSector"] = df["OceanSector"].astype("category")
+    return df
+
+
+def loop_error_metrics(df, grouping_cols, estimate_col, reference_col):
+    """The per-group loop grouped_error_metrics replaced, with sklearn's MAE and MSE written out."""
+    results = []
+    for name, group_df in df.groupby(grouping_cols, observed=True):
+        group_df = group_df.dropna(subset=[reference_col, estimate_col])
+        if group_df.empty:
+            continue
+
+        valid_enow = group_df[group_df[reference_col] != 0]
+        mpd = 100 * (valid_enow[estimate_col] - valid_enow[reference_col]) / valid_enow[reference_col]
+        residual = group_df[estimate_col] - group_df[reference_col]
+
+        result_row = {
+            'X_Value': (group_df[reference_col].mean() + group_df[estimate_col].mean()) / 2,
+            'Original ENOW Value': group_df[reference_col].mean(),
+            'Open ENOW Estimate': group_df[estimate_col].mean(),
+            'Mean Percent Difference': mpd.mean() if not mpd.empty else np.nan,
+            'Mean Absolute Error': residual.abs().mean(),
+            'Root Mean Squared Error': np.sqrt((residual ** 2).mean())
+        }
+        for i, col in enumerate(grouping_cols):
+            result_row[col] = name[i]
+        results.append(result_row)
+    return pd.DataFrame(results)
+
+
+@pytest.mark.parametrize("grouping_vars", [
+    [], ["OceanSector"], ["Year"], ["state"], ["OceanSector", "Year"], ["Year", "state"],
+    ["OceanSector", "Year", "state"],
+])
+def test_grouped_error_metrics_matches_loop(grouping_vars):
+    df = error_frame()
+    grouping_cols = grouping_vars + ["GeoName"]
+    expected = loop_error_metrics(df, grouping_cols, ESTIMATE_COL, REFERENCE_COL)
+    result = grouped_error_metrics(df, grouping_cols, ESTIMATE_COL, REFERENCE_COL)
+
+    assert list(result.columns) == ERROR_METRIC_COLUMNS + grouping_cols
+    assert "WA County B" not in set(result["GeoName"])
+    keys = result[grouping_cols].astype(object).reset_index(drop=True)
+    pd.testing.assert_frame_equal(keys, expected[grouping_cols].astype(object), check_dtype=False)
+    pd.testing.assert_frame_equal(result[ERROR_METRIC_COLUMNS], expected[ERROR_METRIC_COLUMNS], rtol=1e-9)
+
+
+def test_grouped_error_metrics_zero_references():
+    df = pd.DataFrame({
+        "GeoName": ["A", "A", "B", "B"],
+        REFERENCE_COL: [0.0, 10.0, 0.0, 0.0],
+        ESTIMATE_COL: [5.0, 12.0, 1.0, 3.0],
+    })
+    result = grouped_error_metrics(df, ["GeoName"], ESTIMATE_COL, REFERENCE_COL).set_index("GeoName")
+    # Zero references count toward the errors but not the percent difference.
+    assert result.loc["A", "Mean Percent Difference"] == pytest.approx(20.0)
+    assert result.loc["A", "Mean Absolute Error"] == pytest.approx(3.5)
+    assert np.isnan(result.loc["B", "Mean Percent Difference"])
+    assert result.loc["B", "Root Mean Squared Error"] == pytest.approx(np.sqrt(5.0))
+
+
+def test_grouped_error_metrics_estimate_label():
+    result = grouped_error_metrics(error_frame(), ["GeoName"], ESTIMATE_COL, REFERENCE_COL, estimate_label="DORADO")
+    assert "DORADO" in result.columns
+    assert "Open ENOW Estimate" not in result.columns
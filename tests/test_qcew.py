@@ -0,0 +1,125 @@
+"""
+Tests of openenow.qcew on the QCEW fixture in tests/fixtures.
+
+The fixture has singlefile years on either side of the 2012 NAICS revision,
+with one suppressed cell, one federal-ownership row and one county
+(23019, Penobscot) that is not coastal. The 2011 file also lists 722511 and
+the 2012 file 722110, neither of which counts in that year.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from openenow.data import read_open_enow_csv
+from openenow.qcew import OUTPUT_COLUMNS, build_open_enow, naics_lookup, naics_table, read_counties
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+QCEW_DIR = os.path.join(FIXTURES, "qcew")
+COUNTIES_CSV = os.path.join(FIXTURES, "coastal_counties.csv")
+
+TOURISM = "Tourism and Recreation"
+FULL_SERVICE = "Full-Service Restaurants"
+
+
+@pytest.fixture(scope="module")
+def build(tmp_path_factory):
+    """Builds the fixture once; returns (output path, YearBuilds)."""
+    output = str(tmp_path_factory.mktemp("qcew") / "openENOWinput.csv")
+    builds = build_open_enow(QCEW_DIR, output, COUNTIES_CSV, workers=2, log=lambda msg: None)
+    return output, builds
+
+
+@pytest.fixture(scope="module")
+def rows(build):
+    return pd.read_csv(build[0])
+
+
+def total(rows, geo_type, geo_name, year, metric, industry=None):
+    """Returns the single sector (or industry) total of the Tourism and Recreation rows selected."""
+    match = rows[
+        (rows["geoType"] == geo_type) & (rows["geoName"] == geo_name) & (rows["year"] == year)
+        & (rows["enowSector"] == TOURISM)
+        & (rows["enowIndustry"] == industry if industry else rows["aggregation"] == "Sector")
+    ]
+    assert len(match) == 1
+    return match[metric].iloc[0]
+
+
+def test_naics_lookup_switches_codes_at_2012():
+    table = naics_table()
+    before, after = naics_lookup(table, 2011), naics_lookup(table, 2012)
+    assert before["722110"] == (TOURISM, FULL_SERVICE)
+    assert "722511" not in before
+    assert after["722511"] == (TOURISM, FULL_SERVICE)
+    assert "722110" not in after
+
+
+@pytest.mark.parametrize("naics, message", [("722110", "listed twice"), ("7221", "is part of 7221")])
+def test_naics_lookup_rejects_overlapping_codes(naics, message):
+    table = naics_table()
+    extra = pd.DataFrame([(naics, None, None, TOURISM, "Overlap")], columns=table.columns)
+    with pytest.raises(ValueError, match=message):
+        naics_lookup(pd.concat([table, extra], ignore_index=True), 2011)
+
+
+def test_read_counties_blank_region():
+    counties = read_counties(COUNTIES_CSV)
+    assert counties.loc["23005", "region"] == "North Atlantic"
+    assert pd.isna(counties.loc["53033", "region"])
+
+
+def test_build_counts(build):
+    _, builds = build
+    assert [b.year for b in builds] == [2011, 2012]
+    assert [b.suppressed for b in builds] == [1, 0]
+    # Only private rows of coastal counties with the year's codes are kept.
+    assert [b.cells for b in builds] == [5, 5]
+    assert [b.counties for b in builds] == [4, 4]
+
+
+def test_build_excludes_filtered_rows(rows):
+    assert list(rows.columns) == OUTPUT_COLUMNS
+    assert not rows["geoName"].str.contains("Penobscot").any()
+    # The suppressed cell was Rockingham's only Living Resources row.
+    nh = rows[rows["state"] == "NH"]
+    assert "Living Resources" not in set(nh["enowSector"])
+    # Federal ownership is left out of Cumberland's 2011 restaurants.
+    assert total(rows, "County", "Cumberland County, ME", 2011, "employment") == 2000
+
+
+def test_build_county_totals(rows):
+    assert total(rows, "County", "York County, ME", 2011, "employment") == 900
+    assert total(rows, "County", "York County, ME", 2012, "employment") == 1650
+    assert total(rows, "County", "York County, ME", 2012, "employment", FULL_SERVICE) == 950
+    assert total(rows, "County", "York County, ME", 2012, "wages", "Limited-Service Restaurants") == 10_000_000
+
+
+def test_build_state_totals(rows):
+    assert total(rows, "State", "Maine", 2011, "employment") == 2900
+    assert total(rows, "State", "Maine", 2012, "establishments") == 205
+    assert total(rows, "State", "Maine", 2012, "wages", FULL_SERVICE) == 60_000_000
+    assert total(rows, "State", "Washington", 2012, "employment") == 6100
+
+
+def test_build_region_totals(rows):
+    assert total(rows, "Region", "North Atlantic", 2011, "employment") == 4400
+    assert total(rows, "Region", "North Atlantic", 2012, "employment") == 5350
+    assert total(rows, "Region", "North Atlantic", 2012, "wages", FULL_SERVICE) == 92_000_000
+    region = rows[rows["geoType"] == "Region"]
+    assert set(region["geoName"]) == {"North Atlantic"}
+    assert region["state"].isna().all()
+
+
+def test_build_derived_metrics_empty_without_inputs(rows):
+    assert rows[["real_wages", "gdp", "rgdp"]].isna().all().all()
+
+
+def test_build_loads_in_app(build):
+    df = read_open_enow_csv(build[0])
+    assert len(df) == 41
+    assert set(df["GeoScale"].cat.categories) == {"County", "State", "Region"}
+    assert df["Year"].dtype == "int32"
+    maine = df[(df["GeoScale"] == "State") & (df["GeoName"] == "Maine") & (df["Year"] == 2012)
+               & (df["aggregation"] == "Sector")]
+    assert maine["Open_Employment"].tolist() == [3750]